@@ -0,0 +1,300 @@
+#!/usr/bin/python3
+"""
+Benchmarks das etapas da extração de paleta, com imagens sintéticas.
+
+Mede o tempo (mínimo e mediana de --repeat execuções) e o pico de memória
+(tracemalloc, em uma execução extra) de cada etapa:
+    decode    -> PNG e JPEG em memória para array RGB;
+    convert   -> convert_image na imagem inteira, por espaço de cor;
+    aggregate -> prepare_data (histograma de cores + conversão das cores únicas);
+    fit       -> fit_kmeans com a amostragem padrão, por motor de agrupamento;
+    stats     -> compute_result (w, d, score e demais estatísticas);
+    assign    -> kernels.assign: centróide mais próximo e distância de todos os pixels;
+    render    -> render_palette_image (a imagem de generate_palette);
+    total     -> engine.extract_palette de ponta a ponta.
+
+Uso, na raiz do repositório:
+    python3 benchmarks/bench_pipeline.py --output baseline.json
+    python3 benchmarks/bench_pipeline.py --output new.json --compare baseline.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import statistics
+import tracemalloc
+
+# permite rodar a partir do checkout, sem instalar o pacote
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+if os.path.isdir(SRC_DIR) and SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+import numpy as np
+from PIL import Image
+
+from synthetic import DISTRIBUTIONS, make_image
+import kmeans_color_palette.about as about
+from kmeans_color_palette import engine
+from kmeans_color_palette.modules.pipeline import (
+    convert_image,
+    prepare_data,
+    prepare_fit_data,
+    fit_kmeans,
+    compute_result,
+    palette_from_result
+)
+from kmeans_color_palette.modules.clustering import BACKENDS
+from kmeans_color_palette.modules.kernels import assign
+from kmeans_color_palette.modules.render import render_palette_image
+
+RESULTS_FORMAT = 1
+
+STAGES = ["decode", "convert", "aggregate", "fit", "stats", "assign", "render", "total"]
+DECODE_FORMATS = ["png", "jpeg"]
+
+DEFAULT_SIZES = [0.25, 1.0, 4.0]   # megapixels
+DEFAULT_BACKENDS = ["kmeans", "numpy"]
+DEFAULT_ANALYSIS_TYPE = "lab"      # espaço de aggregate, fit, stats e total
+DEFAULT_K = 6
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 1.25           # 25% mais lento (ou mais memória) que a referência é regressão
+MIN_TIME_DIFF = 0.005              # diferenças menores que 5 ms são ruído
+
+
+def measure(func, repeat=DEFAULT_REPEAT):
+    """
+    Executa func repeat vezes medindo o tempo e mais uma vez com o tracemalloc.
+    Retorna {"time_min", "time_median", "peak_bytes"}.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {"time_min": min(times), "time_median": statistics.median(times), "peak_bytes": peak}
+
+def encode_image(img, fmt):
+    buffer = io.BytesIO()
+    Image.fromarray(img).save(buffer, format=fmt.upper(), **({"quality": 90} if fmt == "jpeg" else {}))
+    return buffer.getvalue()
+
+def decode_image(data):
+    with Image.open(io.BytesIO(data)) as img:
+        return np.asarray(img.convert("RGB"))
+
+
+def bench_image(name, img, args, record):
+    """
+    Roda as etapas selecionadas em args.stages para uma imagem e chama
+    record(stage, variant, medidas) para cada medida.
+    """
+    t = args.analysis_type
+
+    if "decode" in args.stages:
+        for fmt in DECODE_FORMATS:
+            data = encode_image(img, fmt)
+            record("decode", fmt, measure(lambda: decode_image(data), args.repeat))
+
+    if "convert" in args.stages:
+        for space in args.color_spaces:
+            record("convert", space, measure(lambda: convert_image(img, space), args.repeat))
+
+    if "aggregate" in args.stages:
+        record("aggregate", t, measure(lambda: prepare_data(img, t), args.repeat))
+
+    # dados da amostragem padrão, usados no ajuste e nas estatísticas
+    data_np, weights = prepare_data(img, t)
+    fit_np, fit_weights = prepare_fit_data(img, data_np, weights, t)
+
+    if "fit" in args.stages:
+        for backend in args.backends:
+            record("fit", backend, measure(
+                lambda: fit_kmeans(data_np, fit_np, args.k, sample_weight=fit_weights, backend=backend),
+                args.repeat))
+
+    labels, centroids = fit_kmeans(data_np, fit_np, args.k, sample_weight=fit_weights)
+    result = compute_result(data_np, weights, labels, centroids, t)
+
+    if "stats" in args.stages:
+        record("stats", t, measure(lambda: compute_result(data_np, weights, labels, centroids, t), args.repeat))
+
+    if "assign" in args.stages:
+        pixels_np = convert_image(img, t)
+        record("assign", "kernel", measure(lambda: assign(pixels_np, centroids), args.repeat))
+        del pixels_np
+
+    if "render" in args.stages:
+        pil_image = Image.fromarray(img)
+        colors = [c["centroid"] for c in palette_from_result(result)]
+        record("render", "image", measure(lambda: render_palette_image(pil_image, colors), args.repeat))
+
+    if "total" in args.stages:
+        record("total", t, measure(
+            lambda: engine.extract_palette(img, k=args.k, analysis_type=t, cache=None),
+            args.repeat))
+
+
+def environment():
+    info = {
+        "package_version": about.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pillow": Image.__version__
+    }
+    try:
+        import sklearn
+        info["scikit-learn"] = sklearn.__version__
+    except ImportError:
+        info["scikit-learn"] = None
+    return info
+
+def run(args):
+    results = []
+
+    # aquecimento: importações preguiçosas (scikit-learn) fora das medidas
+    engine.extract_palette(make_image("clusters", 0.01), k=2, cache=None)
+
+    for mp in args.sizes:
+        for distribution in args.distributions:
+            img = make_image(distribution, mp, seed=args.seed)
+            megapixels = img.shape[0] * img.shape[1] / 1e6
+            name = f"{distribution}-{mp:g}MP"
+
+            def record(stage, variant, measures):
+                entry = {
+                    "image": name,
+                    "distribution": distribution,
+                    "megapixels": megapixels,
+                    "stage": stage,
+                    "variant": variant
+                }
+                entry.update(measures)
+                entry["peak_bytes_per_mp"] = measures["peak_bytes"] / megapixels
+                results.append(entry)
+                print(f"{name:16s} {stage:10s} {variant:8s} "
+                      f"{1000 * measures['time_median']:10.1f} ms {measures['peak_bytes'] / 1e6:9.1f} MB",
+                      file=sys.stderr, flush=True)
+
+            bench_image(name, img, args, record)
+
+    return {
+        "format": RESULTS_FORMAT,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "environment": environment(),
+        "params": {
+            "sizes": args.sizes,
+            "distributions": args.distributions,
+            "color_spaces": args.color_spaces,
+            "backends": args.backends,
+            "analysis_type": args.analysis_type,
+            "k": args.k,
+            "repeat": args.repeat,
+            "seed": args.seed
+        },
+        "results": results
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compara duas execuções pelas entradas (image, stage, variant) presentes em ambas.
+    Retorna a lista de regressões: tempo mediano ou pico de memória mais de
+    threshold vezes o da referência.
+    """
+    reference = {(r["image"], r["stage"], r["variant"]): r for r in baseline["results"]}
+    regressions = []
+    for entry in current["results"]:
+        base = reference.get((entry["image"], entry["stage"], entry["variant"]))
+        if base is None:
+            continue
+        for metric, min_diff in (("time_median", MIN_TIME_DIFF), ("peak_bytes", 1 << 20)):
+            old, new = base[metric], entry[metric]
+            if old > 0 and new > old * threshold and new - old > min_diff:
+                regressions.append({
+                    "image": entry["image"],
+                    "stage": entry["stage"],
+                    "variant": entry["variant"],
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                    "ratio": new / old
+                })
+    return regressions
+
+
+def parse_list(text, convert=str):
+    return [convert(item) for item in text.split(",") if item.strip()]
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="bench_pipeline.py",
+        description="Time and measure the memory of each palette extraction stage on synthetic images."
+    )
+    parser.add_argument("--sizes", type=lambda s: parse_list(s, float), default=DEFAULT_SIZES, help="image sizes in megapixels, comma separated (default: 0.25,1,4)")
+    parser.add_argument("--distributions", type=parse_list, default=DISTRIBUTIONS, help=f"color distributions (default: {','.join(DISTRIBUTIONS)})")
+    parser.add_argument("--color-spaces", type=parse_list, default=engine.ANALYSIS_TYPES, help="color spaces of the convert stage (default: all)")
+    parser.add_argument("--backends", type=parse_list, default=DEFAULT_BACKENDS, help=f"clustering backends of the fit stage, from {','.join(BACKENDS)} (default: kmeans,numpy)")
+    parser.add_argument("--stages", type=parse_list, default=STAGES, help=f"stages to run (default: {','.join(STAGES)})")
+    parser.add_argument("-s", "--analysis-type", default=DEFAULT_ANALYSIS_TYPE, choices=engine.ANALYSIS_TYPES, help="color space of the aggregate, fit, stats and total stages")
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help="number of colors")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed runs per measure")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic images")
+    parser.add_argument("--quick", action="store_true", help="only 0.25 MP images and one timed run")
+    parser.add_argument("-o", "--output", help="write the results as JSON (- = stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="JSON of a previous run; exit with 1 if a measure regressed")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="regression ratio for --compare (default: 1.25)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.quick:
+        args.sizes = [0.25]
+        args.repeat = 1
+
+    for name, values, allowed in (("stage", args.stages, STAGES),
+                                  ("distribution", args.distributions, DISTRIBUTIONS),
+                                  ("color space", args.color_spaces, engine.ANALYSIS_TYPES),
+                                  ("backend", args.backends, BACKENDS)):
+        unknown = [v for v in values if v not in allowed]
+        if unknown:
+            print(f"Unknown {name}: {', '.join(unknown)}", file=sys.stderr)
+            return 2
+
+    current = run(args)
+
+    if args.output == "-":
+        print(json.dumps(current, indent=2))
+    elif args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['image']} {r['stage']} {r['variant']} {r['metric']}: "
+                  f"{r['baseline']:.4g} -> {r['current']:.4g} (x{r['ratio']:.2f})", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare}.", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
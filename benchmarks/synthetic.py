@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+import numpy as np
+
+# Imagens sintéticas para os benchmarks: mesmo tamanho e semente geram sempre a mesma imagem.
+#   flat     -> 8 cores sólidas em blocos (poucas cores únicas, como ilustrações);
+#   clusters -> 8 cores com ruído gaussiano (como uma foto com poucas regiões);
+#   gradient -> gradientes suaves (muitas cores únicas, vizinhas parecidas);
+#   noise    -> ruído uniforme (pior caso: quase todos os pixels têm cor única).
+DISTRIBUTIONS = ["flat", "clusters", "gradient", "noise"]
+
+N_COLORS = 8
+BLOCKS = 6 # blocos por lado em flat e clusters
+
+
+def image_shape(megapixels):
+    """
+    (altura, largura) 3:4 com aproximadamente megapixels milhões de pixels.
+    """
+    height = max(1, int(round(np.sqrt(megapixels * 1e6 * 3 / 4))))
+    width = max(1, int(round(megapixels * 1e6 / height)))
+    return height, width
+
+def _block_labels(height, width, rng):
+    """
+    Mapa (H,W) de rótulos 0..N_COLORS-1 em BLOCKS x BLOCKS blocos retangulares.
+    """
+    grid = rng.integers(0, N_COLORS, size=(BLOCKS, BLOCKS))
+    rows = np.minimum(np.arange(height) * BLOCKS // height, BLOCKS - 1)
+    cols = np.minimum(np.arange(width) * BLOCKS // width, BLOCKS - 1)
+    return grid[rows[:, None], cols[None, :]]
+
+def make_image(distribution, megapixels, seed=0):
+    """
+    Gera uma imagem sintética HxWx3 uint8 (ver DISTRIBUTIONS).
+    """
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Distribuição '{distribution}' não suportada.")
+
+    rng = np.random.default_rng(seed)
+    height, width = image_shape(megapixels)
+
+    if distribution == "noise":
+        return rng.integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+
+    if distribution == "gradient":
+        y = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None]
+        x = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :]
+        img = np.empty((height, width, 3), dtype=np.uint8)
+        img[..., 0] = np.round(255.0 * x * np.ones_like(y))
+        img[..., 1] = np.round(255.0 * y * np.ones_like(x))
+        img[..., 2] = np.round(127.5 * (1.0 + np.sin(6.0 * (x + y))))
+        return img
+
+    palette = rng.integers(0, 256, size=(N_COLORS, 3))
+    img = palette[_block_labels(height, width, rng)].astype(np.float32)
+    if distribution == "clusters":
+        img += rng.normal(0.0, 12.0, size=img.shape).astype(np.float32)
+    return np.clip(np.round(img), 0, 255).astype(np.uint8)
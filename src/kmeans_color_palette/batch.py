@@ -0,0 +1,469 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import glob
+import json
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Este módulo não pode importar PyQt5: roda em servidores sem display.
+import kmeans_color_palette.about as about
+import kmeans_color_palette.modules.configure as configure
+from kmeans_color_palette.modules.clustering import BACKENDS, DEFAULT_BACKEND, backend_options_from_config
+from kmeans_color_palette.modules.sampling import SAMPLING_METHODS
+from kmeans_color_palette import engine
+from kmeans_color_palette.modules.imagecache import default_cache, DEFAULT_MAX_BYTES
+from kmeans_color_palette.modules.resultcache import get_default_cache, DEFAULT_MAX_BYTES as RESULT_CACHE_MAX_BYTES
+from kmeans_color_palette.modules import streaming
+from kmeans_color_palette.modules import collection
+from kmeans_color_palette.modules.instrument import Instrumentation, profile_file_path, stage_context
+from kmeans_color_palette.modules.progress import Progress, console_sink
+
+CONFIG_PATH = os.path.join(os.path.expanduser("~"),".config",about.__package__,"config.json")
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+SELECT_KEYS = ["w", "score"]
+
+
+def expand_inputs(inputs, recursive=False):
+    """
+    Expande arquivos, padrões glob e diretórios em uma lista ordenada de imagens.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            # em diretórios só entram arquivos com extensão de imagem
+            pattern = os.path.join(item, "**", "*") if recursive else os.path.join(item, "*")
+            candidates = [path for path in sorted(glob.glob(pattern, recursive=recursive))
+                          if path.lower().endswith(IMAGE_EXTENSIONS)]
+        elif glob.has_magic(item):
+            candidates = sorted(glob.glob(item, recursive=recursive))
+        else:
+            candidates = [item]
+
+        paths.extend(path for path in candidates if not os.path.isdir(path))
+
+    # remove repetidos mantendo a ordem
+    return list(dict.fromkeys(paths))
+
+def output_dir_for(image_path, output_root):
+    """
+    Diretório de saída de uma imagem: output_root/<nome da imagem sem extensão>.
+    """
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(output_root, name)
+
+def output_dirs(image_paths, output_root):
+    """
+    Diretório de saída de cada imagem, espelhando o caminho relativo à pasta comum
+    das entradas: com -r, a/img.png e b/img.png vão para output_root/a/img e output_root/b/img.
+    Nomes que ainda coincidem (img.png e img.jpg na mesma pasta) mantêm a extensão
+    e, se preciso, recebem um sufixo _2, _3, ...
+    Retorna um dicionário caminho -> diretório.
+    """
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in image_paths])
+    dirs = {}
+    used = set()
+    for path in image_paths:
+        relative = os.path.relpath(os.path.abspath(path), root)
+        name = os.path.splitext(relative)[0]
+        if name in used:
+            name = relative
+        base, n = name, 2
+        while name in used:
+            name = f"{base}_{n}"
+            n += 1
+        used.add(name)
+        dirs[path] = os.path.join(output_root, name)
+    return dirs
+
+def process_one(image_path, options, save_dir=None):
+    """
+    Processa uma imagem (executado em um processo do pool).
+    save_dir é o diretório de saída (padrão: output_dir_for em options["output_dir"]).
+    Retorna um dicionário serializável em JSON.
+    """
+    default_cache.set_max_bytes(options["image_cache_bytes"])
+
+    result_cache = None
+    if options["result_cache_bytes"] > 0:
+        result_cache = get_default_cache()
+        result_cache.set_max_bytes(options["result_cache_bytes"])
+        hits_before = result_cache.hits
+
+    inst = None
+    if options["timings"] or options["log_json"] or options["profile_dir"]:
+        inst = Instrumentation(
+            "batch",
+            info={"image": image_path, "analysis_type": options["analysis_type"]},
+            trace_memory=options["trace_memory"],
+            profile_path=profile_file_path(options["profile_dir"], os.path.basename(image_path)) if options["profile_dir"] else None,
+            log_path=options["log_json"]
+        )
+
+    progress = Progress(console_sink()) if options["progress"] else Progress()
+
+    with (inst.run() if inst is not None else contextlib.nullcontext()):
+        use_streaming = options["streaming"] or streaming.should_stream(image_path, options["streaming_min_megapixels"])
+
+        k = options["k"]
+        auto_k = None
+        if k == "auto":
+            # em streaming a amostra do auto K também é lida em faixas
+            with stage_context(inst, "auto_k"), progress.stage("auto K", 0.4) as p:
+                auto_k = engine.choose_k(
+                    image_path,
+                    analysis_type=options["analysis_type"],
+                    backend=options["backend"],
+                    backend_options=options["backend_options"],
+                    streaming=use_streaming,
+                    streaming_options=options["streaming_options"],
+                    progress=p,
+                    **options["auto_k"]
+                )
+            k = auto_k["k"]
+            progress = progress.stage("", 0.6)
+        if inst is not None:
+            inst.info["k"] = k
+
+        # rótulos do ajuste, reaproveitados na imagem quantizada; imagens lidas em streaming
+        # não são re-renderizadas (a imagem inteira não cabe na memória)
+        fit = []
+        quantized = options["quantized"] and options["output_dir"] and not use_streaming
+
+        palette = engine.extract_palette(
+            image_path,
+            k=k,
+            analysis_type=options["analysis_type"],
+            sampling_method=options["sampling_method"],
+            max_pixels=options["max_pixels"],
+            aggregate=options["aggregate"],
+            histogram_bits=options["histogram_bits"],
+            backend=options["backend"],
+            backend_options=options["backend_options"],
+            result_cache=result_cache,
+            streaming=use_streaming,
+            streaming_options=options["streaming_options"],
+            instrumentation=inst,
+            progress=progress,
+            labels_callback=(lambda *args: fit.append(args)) if quantized else None
+        )
+        selected = engine.select_colors(palette, options["top"], options["select_by"])
+
+        save_paths = None
+        if options["output_dir"]:
+            if save_dir is None:
+                save_dir = output_dir_for(image_path, options["output_dir"])
+            with stage_context(inst, "render"):
+                save_paths = engine.save_palette(save_dir, image_path, selected, png=not options["no_png"],
+                                                 **options["render_options"])
+                if quantized:
+                    quantized_path = engine.save_quantized_png(save_dir, image_path, selected, options["analysis_type"],
+                                                               dither=options["dither"], fit=fit[0] if fit else None)
+
+    colors = []
+    for c in palette:
+        r, g, b = c["centroid"]
+        colors.append({"r": r, "g": g, "b": b, "w": c["w"], "d": c["d"], "score": c["score"]})
+
+    result = {
+        "image": image_path,
+        "k": k,
+        "analysis_type": options["analysis_type"],
+        "colors": colors,
+        "selected": engine.palette_to_json(selected),
+        "cached": result_cache is not None and result_cache.hits > hits_before,
+        "streaming": use_streaming
+    }
+    if auto_k is not None:
+        result["auto_k"] = auto_k
+
+    if save_paths is not None:
+        json_path, png_path = save_paths
+        result["json"] = json_path
+        if png_path:
+            result["png"] = png_path
+        if quantized:
+            result["quantized_png"] = quantized_path
+
+    if options["timings"]:
+        timings = inst.to_dict()
+        result["timings"] = {key: timings[key] for key in ("wall", "cpu", "peak_memory", "memory_source", "stages")}
+        result["timings_summary"] = inst.summary()
+
+    return result
+
+def process_collection(paths, options, jobs):
+    """
+    Uma única paleta para todas as imagens (--collection), salva em OUTPUT_DIR/collection/.
+    Os histogramas das imagens são calculados em jobs processos.
+    Retorna um dicionário serializável em JSON.
+    """
+    progress = Progress(console_sink()) if options["progress"] else Progress()
+    result = engine.extract_collection_palette(
+        paths,
+        k=options["k"],
+        analysis_type=options["analysis_type"],
+        n_jobs=jobs,
+        sampling_method=options["sampling_method"],
+        max_pixels=options["max_pixels"],
+        backend=options["backend"],
+        backend_options=options["backend_options"],
+        progress=progress,
+        **options["collection_options"]
+    )
+    palette = result["palette"]
+    selected = engine.select_colors(palette, options["top"], options["select_by"])
+
+    colors = []
+    for c in palette:
+        r, g, b = c["centroid"]
+        colors.append({"r": r, "g": g, "b": b, "w": c["w"], "d": c["d"], "score": c["score"], "coverage": c["coverage"]})
+
+    line = {
+        "collection": len(paths),
+        "k": options["k"],
+        "analysis_type": options["analysis_type"],
+        "colors": colors,
+        "selected": engine.palette_to_json(selected),
+        "images": result["images"]
+    }
+
+    if options["output_dir"]:
+        save_dir = os.path.join(options["output_dir"], "collection")
+        json_path, png_path, collection_path = engine.save_collection_palette(
+            save_dir, result, selected, png=not options["no_png"], **options["render_options"])
+        line["json"] = json_path
+        line["collection_json"] = collection_path
+        if png_path:
+            line["png"] = png_path
+
+    return line
+
+def k_value(text):
+    """
+    Tipo do argumento -k: um inteiro ou "auto".
+    """
+    if text == "auto":
+        return text
+    try:
+        return int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError("must be an integer or 'auto'")
+
+def parse_k_range(text):
+    """
+    Converte "MIN:MAX" em (MIN, MAX); levanta ValueError se o intervalo for inválido.
+    """
+    k_min, k_max = (int(v) for v in text.split(":"))
+    if k_min < 1 or k_max < k_min:
+        raise ValueError(text)
+    return k_min, k_max
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog=f"{about.__program_name__} batch",
+        description="Extract color palettes from images without a graphical interface."
+    )
+    parser.add_argument("inputs", nargs="+", help="image files, glob patterns or directories")
+    parser.add_argument("-r", "--recursive", action="store_true", help="search directories and ** patterns recursively")
+    parser.add_argument("-k", "--k", type=k_value, default=5, help="number of clusters or 'auto' (default: 5)")
+    parser.add_argument("--auto-k-method", default=None, choices=engine.AUTO_K_METHODS, help="criterion used by -k auto (default: config.json or elbow)")
+    parser.add_argument("--k-range", default=None, metavar="MIN:MAX", help="candidates of -k auto (default: config.json or 2:10)")
+    parser.add_argument("-s", "--space", default="rgb", choices=engine.ANALYSIS_TYPES, help="color space used in the clustering (default: rgb)")
+    parser.add_argument("--backend", default=None, choices=BACKENDS, help="clustering backend (default: config.json or kmeans)")
+    parser.add_argument("--top", type=int, default=0, help="number of colors written to the palette, 0 = all (default: 0)")
+    parser.add_argument("--select-by", default="w", choices=SELECT_KEYS, help="rule used to choose the top colors (default: w)")
+    parser.add_argument("--sampling", default=None, choices=SAMPLING_METHODS, help="pixel sampling before the fit (default: config.json or random)")
+    parser.add_argument("--max-pixels", type=int, default=None, help="maximum number of pixels used in the fit, 0 = all (default: config.json or 200000)")
+    parser.add_argument("-o", "--output-dir", default=None, help="write color_palette.json/.png in OUTPUT_DIR/<image name>/")
+    parser.add_argument("--no-png", action="store_true", help="do not write color_palette.png")
+    parser.add_argument("--bar-height", type=int, default=None, help="height of the color bar in color_palette.png, 0 = image only (default: config.json or 50)")
+    parser.add_argument("--labels", action="store_true", help="write the hex code on each swatch")
+    parser.add_argument("--swatch-only", action="store_true", help="color_palette.png contains only the swatches, without the image")
+    parser.add_argument("--quantized", action="store_true", help="also write color_palette_quantized.png, the image redrawn with the selected colors")
+    parser.add_argument("--dither", action="store_true", help="use Floyd-Steinberg dithering in color_palette_quantized.png")
+    parser.add_argument("--jsonl", default=None, help="write one JSON line per image in this file ('-' = stdout)")
+    parser.add_argument("--streaming", action="store_true", help="read every image in strips, with memory bounded by the strip size (default: only images above streaming_min_megapixels)")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the result cache (~/.cache/kmeans_color_palette)")
+    parser.add_argument("--timings", action="store_true", help="print the time of each stage and add it to the JSON lines")
+    parser.add_argument("--trace-memory", action="store_true", help="measure the peak memory of each stage with tracemalloc, slower (default: config.json or the process peak RSS)")
+    parser.add_argument("--log-json", default=None, metavar="FILE", help="append one JSON line with the stage timings of each image to FILE")
+    parser.add_argument("--progress", action="store_true", help="show a progress bar on stderr: for each image with -j 1, or for the whole --collection")
+    parser.add_argument("--profile", default=None, metavar="DIR", help="write a cProfile dump (.prof) of each image in DIR")
+    parser.add_argument("--collection", action="store_true", help="one palette for all the inputs, written to OUTPUT_DIR/collection/")
+    parser.add_argument("-j", "--jobs", type=int, default=0, help="number of worker processes, 0 = number of CPUs (default: 0)")
+    return parser
+
+def options_from_args(args):
+    """
+    Junta os argumentos da linha de comando com o config.json (se existir).
+    Os argumentos têm prioridade.
+    """
+    config = configure.load_config(CONFIG_PATH)
+
+    if args.k_range is not None:
+        k_min, k_max = parse_k_range(args.k_range)
+    else:
+        k_min = config.get("auto_k_min", engine.DEFAULT_K_MIN)
+        k_max = config.get("auto_k_max", engine.DEFAULT_K_MAX)
+    k_range = (k_min, k_max + 1)
+
+    return {
+        "k": args.k,
+        "auto_k": {
+            "k_values": list(range(*k_range)),
+            "method": args.auto_k_method or config.get("auto_k_method", engine.DEFAULT_AUTO_K_METHOD),
+            "sample_size": config.get("auto_k_sample_size", engine.DEFAULT_SAMPLE_SIZE),
+            "n_jobs": 1 # as imagens já são processadas em paralelo
+        },
+        "analysis_type": args.space,
+        "backend": args.backend or config.get("clustering_backend", DEFAULT_BACKEND),
+        "backend_options": backend_options_from_config(config),
+        "sampling_method": args.sampling or config.get("sampling_method", engine.DEFAULT_SAMPLING_METHOD),
+        # 0 é um valor válido (sem amostragem): só None cai no config.json
+        "max_pixels": args.max_pixels if args.max_pixels is not None else config.get("max_pixels", engine.DEFAULT_MAX_PIXELS),
+        "aggregate": config.get("color_aggregation", engine.DEFAULT_AGGREGATE),
+        "histogram_bits": config.get("histogram_bits", engine.DEFAULT_HISTOGRAM_BITS),
+        "streaming": args.streaming,
+        "streaming_min_megapixels": config.get("streaming_min_megapixels", streaming.DEFAULT_STREAMING_MIN_MEGAPIXELS),
+        "streaming_options": {
+            "method": config.get("streaming_method", streaming.DEFAULT_STREAMING_METHOD),
+            "histogram_bits": config.get("streaming_histogram_bits", streaming.DEFAULT_STREAMING_BITS),
+            "strip_pixels": config.get("streaming_strip_pixels", streaming.DEFAULT_STRIP_PIXELS),
+            "max_decode_pixels": config.get("streaming_max_decode_pixels", streaming.DEFAULT_MAX_DECODE_PIXELS)
+        },
+        "collection_options": {
+            "histogram_bits": config.get("collection_histogram_bits", collection.DEFAULT_COLLECTION_BITS),
+            "max_decode_pixels": config.get("collection_max_decode_pixels", collection.DEFAULT_COLLECTION_MAX_DECODE_PIXELS)
+        },
+        "timings": args.timings,
+        "trace_memory": args.trace_memory or config.get("instrumentation_trace_memory", False),
+        "progress": args.progress,
+        "log_json": os.path.abspath(args.log_json) if args.log_json else None,
+        "profile_dir": os.path.abspath(args.profile) if args.profile else None,
+        "top": args.top,
+        "select_by": args.select_by,
+        "output_dir": args.output_dir,
+        "no_png": args.no_png,
+        "quantized": args.quantized,
+        "dither": args.dither,
+        "image_cache_bytes": int(config.get("image_cache_mb", DEFAULT_MAX_BYTES / (1024 * 1024)) * 1024 * 1024),
+        "result_cache_bytes": 0 if args.no_cache or not config.get("result_cache", True) else
+                              int(config.get("result_cache_mb", RESULT_CACHE_MAX_BYTES / (1024 * 1024)) * 1024 * 1024),
+        "render_options": {
+            # 0 é um valor válido (só a imagem, sem barra): só None cai no config.json
+            "bar_height": args.bar_height if args.bar_height is not None else config.get("palette_bar_height", engine.DEFAULT_BAR_HEIGHT),
+            "labels": args.labels or config.get("palette_labels", False),
+            "swatch_only": args.swatch_only or config.get("palette_swatch_only", False),
+            "swatch_width": config.get("palette_swatch_width", engine.DEFAULT_SWATCH_WIDTH)
+        }
+    }
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if not args.output_dir and not args.jsonl:
+        parser.error("use --output-dir and/or --jsonl")
+
+    if args.k != "auto" and args.k < 1:
+        parser.error("-k must be at least 1")
+
+    if args.collection and args.k == "auto":
+        parser.error("-k auto is not supported with --collection")
+
+    if args.bar_height is not None and (args.bar_height < 0 or (args.bar_height == 0 and args.swatch_only)):
+        parser.error("--bar-height must be at least 0, and at least 1 with --swatch-only")
+
+    if args.dither and not args.quantized:
+        parser.error("--dither requires --quantized")
+
+    if args.quantized and (not args.output_dir or args.collection):
+        parser.error("--quantized requires --output-dir and a single-image run (not --collection)")
+
+    if args.k_range is not None:
+        try:
+            parse_k_range(args.k_range)
+        except ValueError:
+            parser.error("--k-range must be MIN:MAX with 1 <= MIN <= MAX")
+
+    paths = expand_inputs(args.inputs, recursive=args.recursive)
+    if not paths:
+        print("No images found.", file=sys.stderr)
+        return 1
+
+    options = options_from_args(args)
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    jobs = min(jobs, len(paths))
+
+    if args.jsonl == "-":
+        jsonl_file = sys.stdout
+    elif args.jsonl:
+        jsonl_file = open(args.jsonl, "w", encoding="utf-8")
+    else:
+        jsonl_file = None
+
+    if args.collection:
+        try:
+            line = process_collection(paths, options, jobs)
+        except Exception as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            line = None
+        if jsonl_file is not None:
+            if line is not None:
+                jsonl_file.write(json.dumps(line) + "\n")
+            if jsonl_file is not sys.stdout:
+                jsonl_file.close()
+        if line is None:
+            return 1
+        print(f"{len(paths)} images -> " + " ".join("#{r:02x}{g:02x}{b:02x}".format(**c) for c in line["selected"]),
+              file=sys.stderr)
+        return 0
+
+    if options["progress"] and jobs > 1:
+        # as barras de processos diferentes se misturariam no stderr:
+        # com vários processos o progresso são as linhas [n/N] de cada imagem concluída
+        options["progress"] = False
+        print("WARNING: --progress shows per-image bars only with -j 1", file=sys.stderr)
+
+    save_dirs = output_dirs(paths, args.output_dir) if args.output_dir else {}
+    for path, save_dir in save_dirs.items():
+        if os.path.basename(save_dir) != os.path.splitext(os.path.basename(path))[0]:
+            print(f"WARNING: {path} has the same name as another input, writing to {save_dir}", file=sys.stderr)
+
+    failures = 0
+    cached = 0
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(process_one, path, options, save_dirs.get(path)): path for path in paths}
+            for n, future in enumerate(as_completed(futures), start=1):
+                path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failures += 1
+                    print(f"[{n}/{len(paths)}] ERROR {path}: {e}", file=sys.stderr)
+                    continue
+
+                cached += result["cached"]
+                print(f"[{n}/{len(paths)}] {path}" + (" (cached)" if result["cached"] else ""), file=sys.stderr)
+                if "timings_summary" in result:
+                    print(f"    {result.pop('timings_summary')}", file=sys.stderr)
+                if jsonl_file is not None:
+                    jsonl_file.write(json.dumps(result) + "\n")
+                    jsonl_file.flush()
+    finally:
+        if jsonl_file is not None and jsonl_file is not sys.stdout:
+            jsonl_file.close()
+
+    if options["result_cache_bytes"] > 0:
+        print(f"Result cache: {cached} hits, {len(paths) - failures - cached} misses", file=sys.stderr)
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,30 @@
+#!/usr/bin/python3
+
+import sys
+
+# Subcomandos que rodam sem interface gráfica (não importam PyQt5).
+SUBCOMMANDS = {
+    "batch": "kmeans_color_palette.batch",
+    "serve": "kmeans_color_palette.serve",
+    "video": "kmeans_color_palette.video"
+}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        import importlib
+        module = importlib.import_module(SUBCOMMANDS[sys.argv[1]])
+        sys.exit(module.main(sys.argv[2:]))
+
+    profiler = None
+    if "--profile-startup" in sys.argv:
+        from kmeans_color_palette.modules.startup import StartupProfiler
+        profiler = StartupProfiler()
+
+    from kmeans_color_palette.program import main as gui_main
+    if profiler: profiler.mark("kmeans_color_palette.program (PyQt5)", "import")
+
+    gui_main(profiler)
+
+if __name__ == "__main__":
+    main()
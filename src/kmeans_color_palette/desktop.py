@@ -16,6 +16,29 @@ def update_desktop_database(desktop_path):
     except FileNotFoundError:
         print("The command 'update-desktop-database' was not found. Verify that the package 'desktop-file-utils' is installed.")
 
+def desktop_file_path(desktop_path, program_name=None):
+    if program_name is None:
+        program_name = about.__program_name__
+    return os.path.expanduser(os.path.join(desktop_path,f"{program_name}.desktop"))
+
+def desktop_directory_path(directory_name = "ResearchTools"):
+    path = os.path.join("~",".local","share","desktop-directories",f"{directory_name}.directory")
+    return os.path.expanduser(path)
+
+def desktop_menu_path(basename = "research-tools"):
+    path = os.path.join("~",".config","menus","applications-merged",f"{basename}.menu")
+    return os.path.expanduser(path)
+
+def desktop_integration_missing(desktop_path):
+    """
+    True se algum dos arquivos de integração (.desktop, .directory, .menu) não existir.
+    Apenas verifica a existência, não escreve nada nem chama processos externos.
+    """
+    paths = [   desktop_file_path(desktop_path),
+                desktop_directory_path(),
+                desktop_menu_path()]
+    return not all(os.path.exists(path) for path in paths)
+
 def create_desktop_file(desktop_path, overwrite=False, program_name=None):
     base_dir_path = os.path.dirname(os.path.abspath(__file__))
     icon_path = os.path.join(base_dir_path, 'icons', 'logo.png')
@@ -41,7 +64,7 @@ Keywords=organizer;python;
 Encoding=UTF-8
 StartupWMClass={about.__package__}
 """
-    path = os.path.expanduser(os.path.join(desktop_path,f"{__program_name}.desktop"))
+    path = desktop_file_path(desktop_path, __program_name)
     
     if not os.path.exists(path) or overwrite == True: 
         os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -65,8 +88,7 @@ Comment={comment}
 Icon={icon}
 """
     
-    path = os.path.join("~",".local","share","desktop-directories",f"{directory_name}.directory")
-    path = os.path.expanduser(path)
+    path = desktop_directory_path(directory_name)
     
     if not os.path.exists(path) or overwrite == True:  # Evita sobrescrever
         os.makedirs(os.path.dirname(path), exist_ok=True)
@@ -91,8 +113,7 @@ def create_desktop_menu(directory_name = "ResearchTools",
     </Menu>
 </Menu>
 """
-    path = os.path.join("~",".config","menus","applications-merged",f"{basename}.menu")
-    path = os.path.expanduser(path)
+    path = desktop_menu_path(basename)
     
     if not os.path.exists(path) or overwrite == True:  # Evita sobrescrever
         os.makedirs(os.path.dirname(path), exist_ok=True)
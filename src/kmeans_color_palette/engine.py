@@ -0,0 +1,517 @@
+#!/usr/bin/python3
+
+import os
+import json
+
+import numpy as np
+from PIL import Image
+
+from kmeans_color_palette.modules.pipeline import (
+    ProcessCanceled,
+    DEFAULT_SAMPLING_METHOD,
+    DEFAULT_MAX_PIXELS,
+    DEFAULT_AGGREGATE,
+    DEFAULT_HISTOGRAM_BITS,
+    prepare_data,
+    prepare_fit_data,
+    fit_kmeans,
+    compute_result,
+    palette_from_result
+)
+from kmeans_color_palette.modules.clustering import DEFAULT_BACKEND
+from kmeans_color_palette.modules.kexplore import KExplorer
+from kmeans_color_palette.modules.streaming import streaming_result, sample_pixels
+from kmeans_color_palette.modules.video import (
+    DEFAULT_SAMPLE_FPS,
+    DEFAULT_MAX_SIDE,
+    DEFAULT_SCENE_THRESHOLD,
+    video_palettes
+)
+from kmeans_color_palette.modules.collection import (
+    DEFAULT_COLLECTION_BITS,
+    DEFAULT_COLLECTION_MAX_DECODE_PIXELS,
+    collection_palette
+)
+from kmeans_color_palette.modules.autok import (
+    AUTO_K_METHODS,
+    DEFAULT_AUTO_K_METHOD,
+    DEFAULT_K_MIN,
+    DEFAULT_K_MAX,
+    DEFAULT_SAMPLE_SIZE,
+    evaluation_sample,
+    select_k
+)
+from kmeans_color_palette.modules.render import (
+    render_palette_image,
+    render_timeline_image,
+    DEFAULT_BAR_HEIGHT,
+    DEFAULT_SWATCH_WIDTH,
+    DEFAULT_TIMELINE_HEIGHT,
+    DEFAULT_COLUMN_WIDTH
+)
+from kmeans_color_palette.modules.recolor import Recolorer
+from kmeans_color_palette.modules.imagecache import default_cache
+from kmeans_color_palette.modules.resultcache import get_default_cache
+from kmeans_color_palette.modules.memory import array_bytes
+from kmeans_color_palette.modules.instrument import stage_context
+from kmeans_color_palette.modules.progress import as_progress
+
+ANALYSIS_TYPES = ["rgb", "lab", "hsl", "oklab", "luv"]
+
+
+def load_image_array(image, cache=default_cache):
+    """
+    Carrega uma imagem como numpy array HxWx3 uint8 (RGB).
+    Aceita um caminho (str ou os.PathLike), uma PIL.Image ou um numpy array
+    (HxW em tons de cinza, HxWx3 RGB ou HxWx4 RGBA; uint8, ou float em 0-1).
+    Caminhos são lidos através do cache de imagens decodificadas (cache=None desativa);
+    nesse caso o array retornado é somente leitura.
+    """
+    if isinstance(image, (str, os.PathLike)):
+        if cache is not None:
+            return cache.get(image)
+        with Image.open(image) as img:
+            return np.asarray(img.convert("RGB"))
+
+    if isinstance(image, Image.Image):
+        return np.asarray(image if image.mode == "RGB" else image.convert("RGB"))
+
+    if isinstance(image, np.ndarray):
+        arr = image
+        if arr.dtype != np.uint8:
+            if np.issubdtype(arr.dtype, np.floating) and arr.size > 0 and arr.max() <= 1.0:
+                arr = arr * 255.0
+            arr = np.clip(np.round(arr), 0, 255).astype(np.uint8)
+        if arr.ndim == 2:
+            arr = np.stack((arr, arr, arr), axis=-1)
+        if arr.ndim != 3 or arr.shape[2] not in (3, 4):
+            raise ValueError("O array da imagem precisa ter forma HxW, HxWx3 ou HxWx4.")
+        return arr[:, :, :3]
+
+    raise TypeError(f"Tipo de imagem não suportado: {type(image).__name__}")
+
+def load_image(image, cache=default_cache):
+    """
+    Carrega uma imagem como PIL.Image em RGB (ver load_image_array).
+    """
+    if isinstance(image, Image.Image):
+        return image if image.mode == "RGB" else image.convert("RGB")
+    return Image.fromarray(np.ascontiguousarray(load_image_array(image, cache)), "RGB")
+
+def extract_palette( image,
+                     k=5,
+                     analysis_type="rgb",
+                     sampling_method=DEFAULT_SAMPLING_METHOD,
+                     max_pixels=DEFAULT_MAX_PIXELS,
+                     aggregate=DEFAULT_AGGREGATE,
+                     histogram_bits=DEFAULT_HISTOGRAM_BITS,
+                     backend=DEFAULT_BACKEND,
+                     backend_options=None,
+                     progress=None,
+                     progress_callback=None,
+                     is_canceled=None,
+                     cache=default_cache,
+                     result_cache=None,
+                     streaming=False,
+                     streaming_options=None,
+                     memory_callback=None,
+                     labels_callback=None,
+                     instrumentation=None):
+    """
+    Extrai a paleta de uma imagem: leitura, conversão de cor, K-means e cálculo de w, d, score.
+
+    image            -> caminho, PIL.Image ou numpy array (ver load_image).
+    k                -> número de clusters.
+    analysis_type    -> espaço de cor do agrupamento (ver ANALYSIS_TYPES).
+    aggregate e histogram_bits controlam o agrupamento de cores repetidas (ver pipeline.prepare_data).
+    sampling_method e max_pixels controlam quantos pixels entram no ajuste (ver pipeline.prepare_fit_data).
+    backend e backend_options escolhem o motor de agrupamento (ver pipeline.fit_kmeans).
+    progress é um modules.progress.Progress (ou uma subetapa de um), atualizado durante
+    as etapas decode, convert, fit e stats, com frequência limitada.
+    progress_callback(value, maximum) é a forma antiga: sem progress, recebe o mesmo
+    progresso com value entre 0 e maximum.
+    is_canceled() é consultado entre as etapas; se retornar True levanta ProcessCanceled.
+    cache é o cache de imagens decodificadas usado quando image é um caminho.
+    result_cache é um modules.resultcache.ResultCache (ou True para o cache padrão em
+    ~/.cache/kmeans_color_palette); se a mesma imagem já foi processada com os mesmos
+    parâmetros o resultado salvo é retornado sem rodar o K-means.
+    streaming=True lê a imagem (caminho ou array) em faixas, sem montar a matriz de todos os pixels;
+    streaming_options vai para modules.streaming.streaming_result (method, histogram_bits,
+    strip_pixels, max_decode_pixels). sampling_method, max_pixels, aggregate e histogram_bits
+    não são usados nesse modo.
+    memory_callback(stage, nbytes, n_pixels) é chamado ao fim das etapas "image", "data",
+    "fit" e "labels" com os bytes dos arrays do pipeline vivos naquele momento e o número
+    de pixels da imagem (ver modules.memory.MemoryReport).
+    instrumentation é um modules.instrument.Instrumentation que recebe o tempo e a memória
+    das etapas cache, decode, convert, fit e stats.
+    labels_callback(data_np, labels, rgb_centroids) recebe, depois do ajuste, as linhas de
+    dados (as cores únicas, com aggregate), o cluster de cada uma e a cor de cada cluster,
+    para reaproveitar os rótulos (ver quantize_image). Não é chamado com streaming nem
+    quando o resultado vem do cache.
+
+    Com menos cores únicas que k (logos, cores chapadas) a paleta tem menos de k cores.
+
+    Retorna uma lista de dicionários, ordenada por w (maior primeiro), com
+    centroid (r,g,b), hex, w, d, score, variance, max_d, silhouette e pixels.
+    """
+    if analysis_type not in ANALYSIS_TYPES:
+        raise ValueError(f"Espaço de cor '{analysis_type}' não suportado.")
+
+    progress = as_progress(progress, progress_callback)
+
+    def check_canceled():
+        if is_canceled is not None and is_canceled():
+            raise ProcessCanceled()
+
+    if result_cache is True:
+        result_cache = get_default_cache()
+
+    cache_key = None
+    if result_cache is not None:
+        params = {
+            "k": k,
+            "analysis_type": analysis_type,
+            "sampling_method": sampling_method,
+            "max_pixels": max_pixels,
+            "aggregate": aggregate,
+            "histogram_bits": histogram_bits,
+            "backend": backend,
+            "backend_options": backend_options or {}
+        }
+        if streaming:
+            params["streaming"] = streaming_options or {}
+        with stage_context(instrumentation, "cache"):
+            cache_key = result_cache.make_key(image, params)
+            result = result_cache.get(cache_key)
+        if result is not None:
+            progress.finish()
+            return palette_from_result(result)
+
+    if streaming:
+        result = streaming_result(image, k, analysis_type,
+                                  backend=backend, backend_options=backend_options,
+                                  progress=progress, is_canceled=is_canceled,
+                                  instrumentation=instrumentation,
+                                  **(streaming_options or {}))
+        if cache_key is not None:
+            with stage_context(instrumentation, "cache"):
+                result_cache.put(cache_key, result)
+        return palette_from_result(result)
+
+    # pesos aproximados de cada etapa na barra de progresso
+    with stage_context(instrumentation, "decode"), progress.stage("decode", 0.1):
+        img = load_image_array(image, cache)
+    n_pixels = img.shape[0] * img.shape[1]
+
+    def report_memory(stage, *arrays):
+        if memory_callback is not None:
+            memory_callback(stage, array_bytes(*arrays), n_pixels)
+
+    report_memory("image", img)
+    check_canceled()
+
+    with stage_context(instrumentation, "convert"), progress.stage("convert", 0.3) as p:
+        img_np, weights = prepare_data(img, analysis_type, aggregate, histogram_bits, progress=p)
+    report_memory("data", img, img_np, weights)
+    with stage_context(instrumentation, "fit"):
+        fit_np, fit_weights = prepare_fit_data(img, img_np, weights, analysis_type, sampling_method, max_pixels, aggregate, histogram_bits)
+    report_memory("fit", img, img_np, weights, fit_np, fit_weights)
+    check_canceled()
+
+    # --- K-means ---
+    # com as cores agregadas pode haver menos linhas que K (logos, cores chapadas):
+    # a paleta fica com menos cores
+    K = min(k, len(fit_np))
+    with stage_context(instrumentation, "fit"), progress.stage("fit", 0.4):
+        labels, centroids = fit_kmeans(img_np, fit_np, K, sample_weight=fit_weights,
+                                       backend=backend, backend_options=backend_options)
+    report_memory("labels", img, img_np, weights, fit_np, fit_weights, labels)
+    check_canceled()
+
+    # --- Calcular w, d, score ---
+    with stage_context(instrumentation, "stats"), progress.stage("stats", 0.2) as p:
+        result = compute_result(img_np, weights, labels, centroids, analysis_type, progress=p)
+    check_canceled()
+
+    if labels_callback is not None:
+        labels_callback(img_np, labels, result["rgb_centroids"])
+
+    if cache_key is not None:
+        with stage_context(instrumentation, "cache"):
+            result_cache.put(cache_key, result)
+
+    # --- Montar a paleta ---
+    palette = palette_from_result(result)
+    progress.finish()
+
+    return palette
+
+def explore_k( image,
+               k_values,
+               analysis_type="rgb",
+               sampling_method=DEFAULT_SAMPLING_METHOD,
+               max_pixels=DEFAULT_MAX_PIXELS,
+               aggregate=DEFAULT_AGGREGATE,
+               histogram_bits=DEFAULT_HISTOGRAM_BITS,
+               backend=DEFAULT_BACKEND,
+               backend_options=None,
+               progress=None,
+               progress_callback=None,
+               is_canceled=None,
+               cache=default_cache):
+    """
+    Ajusta uma faixa de K (por exemplo range(2, 11)) em um único job, preparando os dados
+    uma vez e partindo cada K do ajuste anterior (ver modules.kexplore.KExplorer).
+    Os parâmetros são os de extract_palette.
+
+    Retorna o KExplorer: explorer.palette(k) dá a paleta de cada K (mais K podem ser
+    ajustados depois, de forma incremental) e explorer.inertia_curve() a curva do cotovelo.
+    """
+    if analysis_type not in ANALYSIS_TYPES:
+        raise ValueError(f"Espaço de cor '{analysis_type}' não suportado.")
+
+    explorer = KExplorer(load_image_array(image, cache),
+                         analysis_type=analysis_type,
+                         sampling_method=sampling_method,
+                         max_pixels=max_pixels,
+                         aggregate=aggregate,
+                         histogram_bits=histogram_bits,
+                         backend=backend,
+                         backend_options=backend_options)
+    explorer.fit_range(k_values, progress=as_progress(progress, progress_callback), is_canceled=is_canceled)
+    return explorer
+
+def choose_k( image,
+              k_values=None,
+              method=DEFAULT_AUTO_K_METHOD,
+              analysis_type="rgb",
+              sample_size=DEFAULT_SAMPLE_SIZE,
+              backend=DEFAULT_BACKEND,
+              backend_options=None,
+              n_jobs=0,
+              streaming=False,
+              streaming_options=None,
+              progress=None,
+              progress_callback=None,
+              is_canceled=None,
+              cache=default_cache):
+    """
+    Escolhe K automaticamente (ver modules.autok.select_k).
+    Os candidatos k_values (padrão 2..10) são ajustados em paralelo sobre uma amostra
+    aleatória de sample_size pixels e avaliados pelo método: "elbow", "silhouette" ou "bic".
+    Com streaming=True a amostra é tirada faixa a faixa (ver modules.streaming.sample_pixels,
+    com strip_pixels e max_decode_pixels de streaming_options), sem carregar a imagem inteira.
+
+    Retorna o dicionário de select_k: k escolhido, method, k_values, inertia, silhouette e bic.
+    A paleta final é obtida com extract_palette(image, k=resultado["k"], ...).
+    """
+    if analysis_type not in ANALYSIS_TYPES:
+        raise ValueError(f"Espaço de cor '{analysis_type}' não suportado.")
+
+    if streaming:
+        options = streaming_options or {}
+        pixels = sample_pixels(image, sample_size,
+                               **{key: options[key] for key in ("strip_pixels", "max_decode_pixels") if key in options})
+    else:
+        pixels = load_image_array(image, cache)
+    X = evaluation_sample(pixels, analysis_type, sample_size)
+    return select_k(X, k_values, method=method, backend=backend, backend_options=backend_options,
+                    n_jobs=n_jobs, progress=as_progress(progress, progress_callback), is_canceled=is_canceled)
+
+def extract_video_palettes( source,
+                            k=5,
+                            analysis_type="rgb",
+                            sample_fps=DEFAULT_SAMPLE_FPS,
+                            max_side=DEFAULT_MAX_SIDE,
+                            scene_threshold=DEFAULT_SCENE_THRESHOLD,
+                            segment_seconds=0,
+                            warm_start=True,
+                            progress=None,
+                            progress_callback=None,
+                            is_canceled=None,
+                            **options):
+    """
+    Paletas de um vídeo (arquivo lido com OpenCV) ou de uma sequência de imagens
+    (diretório, padrão glob ou lista de caminhos), por quadro amostrado e por cena
+    (ver modules.video.video_palettes).
+
+    sample_fps       -> quadros analisados por segundo (<= 0: todos).
+    max_side         -> lado maior dos quadros no ajuste.
+    scene_threshold  -> sensibilidade do corte de cena (0 a 1; 0 = uma única cena).
+    segment_seconds  -> > 0 troca a detecção de cenas por segmentos de duração fixa.
+    warm_start       -> cada quadro parte dos centróides do quadro anterior da cena.
+    options          -> sampling_method, max_pixels, aggregate, histogram_bits, backend,
+                        backend_options e prefetch_depth.
+
+    Retorna o dicionário {fps, frames, scenes}; frames e scenes trazem paletas no
+    formato de extract_palette (render_timeline_image desenha a linha do tempo).
+    """
+    if analysis_type not in ANALYSIS_TYPES:
+        raise ValueError(f"Espaço de cor '{analysis_type}' não suportado.")
+
+    return video_palettes(source, k, analysis_type,
+                          sample_fps=sample_fps,
+                          max_side=max_side,
+                          scene_threshold=scene_threshold,
+                          segment_seconds=segment_seconds,
+                          warm_start=warm_start,
+                          progress=as_progress(progress, progress_callback),
+                          is_canceled=is_canceled,
+                          **options)
+
+def extract_collection_palette( images,
+                                k=5,
+                                analysis_type="rgb",
+                                histogram_bits=DEFAULT_COLLECTION_BITS,
+                                n_jobs=0,
+                                max_decode_pixels=DEFAULT_COLLECTION_MAX_DECODE_PIXELS,
+                                progress=None,
+                                progress_callback=None,
+                                is_canceled=None,
+                                **options):
+    """
+    Uma paleta única para uma coleção de imagens (lista de caminhos), ver
+    modules.collection.collection_palette.
+
+    histogram_bits     -> bits por canal dos histogramas de cada imagem.
+    n_jobs             -> processos que calculam os histogramas (0 = número de CPUs).
+    max_decode_pixels  -> imagens maiores são reduzidas antes do histograma (0 = sem limite).
+    options            -> sampling_method, max_pixels, backend, backend_options, strip_pixels e
+                          mp_context (contexto do multiprocessing dos processos, ver
+                          modules.collection.iter_histograms).
+
+    Retorna {palette, images}: a paleta no formato de extract_palette (com "coverage" em
+    cada cor) e, para cada imagem, as frações w e share de cada cor da paleta.
+    """
+    if analysis_type not in ANALYSIS_TYPES:
+        raise ValueError(f"Espaço de cor '{analysis_type}' não suportado.")
+
+    return collection_palette(images, k, analysis_type,
+                              bits=histogram_bits,
+                              n_jobs=n_jobs,
+                              max_decode_pixels=max_decode_pixels,
+                              progress=as_progress(progress, progress_callback),
+                              is_canceled=is_canceled,
+                              **options)
+
+def quantize_image(image, colors, analysis_type="rgb", dither=False, fit=None, cache=default_cache):
+    """
+    A imagem re-renderizada só com as cores dadas (imagem quantizada / posterizada):
+    cada pixel recebe a cor mais próxima no espaço analysis_type, ou, com dither=True,
+    o pontilhado de Floyd–Steinberg em RGB (ver modules.recolor.Recolorer).
+
+    colors -> a paleta inteira ou parte dela (entradas de paleta ou tuplas (r,g,b)).
+    fit    -> (data_np, labels, rgb_centroids) recebidos por labels_callback de
+              extract_palette na mesma imagem; evita rotular as cores de novo.
+
+    Retorna uma PIL.Image RGB.
+    """
+    recolorer = Recolorer(load_image_array(image, cache), analysis_type, fit=fit)
+    return Image.fromarray(recolorer.render(colors, dither=dither), "RGB")
+
+def select_colors(palette, top=0, key="w"):
+    """
+    Ordena as cores pela chave (w ou score), da maior para a menor,
+    e retorna as 'top' primeiras (todas se top <= 0).
+    """
+    ordered = sorted(palette, key=lambda c: c[key], reverse=True)
+    if top and top > 0:
+        ordered = ordered[:top]
+    return ordered
+
+def palette_to_json(palette):
+    """
+    Converte uma paleta (entradas com "centroid") ou uma lista de tuplas (r,g,b)
+    para a lista [{"r":..,"g":..,"b":..}] usada em color_palette.json.
+    """
+    colors = [c["centroid"] if isinstance(c, dict) else c for c in palette]
+    return [{"r": int(r), "g": int(g), "b": int(b)} for r, g, b in colors]
+
+def save_palette_json(save_dir, palette):
+    """
+    Salva as cores em save_dir/color_palette.json.
+    Retorna o caminho do arquivo.
+    """
+    json_path = os.path.join(save_dir,"color_palette.json")
+    with open(json_path, "w") as f:
+        json.dump(palette_to_json(palette), f, indent=2)
+    return json_path
+
+def save_palette_png(save_dir, image, palette, bar_height=DEFAULT_BAR_HEIGHT, labels=False, swatch_only=False, swatch_width=DEFAULT_SWATCH_WIDTH):
+    """
+    Salva em save_dir/color_palette.png a imagem original com uma barra
+    das cores embaixo (ver modules.render.render_palette_image).
+    Com swatch_only=True salva só a barra e image pode ser None.
+    Retorna o caminho do arquivo.
+    """
+    selected_colors = [tuple(c.values()) for c in palette_to_json(palette)]
+
+    img = None if swatch_only else load_image_array(image)
+    new_img = render_palette_image(img, selected_colors, bar_height=bar_height, labels=labels,
+                                   swatch_only=swatch_only, swatch_width=swatch_width)
+
+    png_path = os.path.join(save_dir,"color_palette.png")
+    new_img.save(png_path)
+    return png_path
+
+def save_quantized_png(save_dir, image, palette, analysis_type="rgb", dither=False, fit=None):
+    """
+    Salva em save_dir/color_palette_quantized.png a imagem re-renderizada com as
+    cores de palette (ver quantize_image).
+    Retorna o caminho do arquivo.
+    """
+    png_path = os.path.join(save_dir, "color_palette_quantized.png")
+    quantize_image(image, palette, analysis_type, dither=dither, fit=fit).save(png_path)
+    return png_path
+
+def save_video_palettes(save_dir, result, timeline=True, height=DEFAULT_TIMELINE_HEIGHT, column_width=DEFAULT_COLUMN_WIDTH):
+    """
+    Salva o resultado de extract_video_palettes em save_dir/video_palette.json e
+    (opcionalmente) a linha do tempo em save_dir/video_timeline.png.
+    Retorna (json_path, png_path); png_path é None se timeline=False.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    json_path = os.path.join(save_dir, "video_palette.json")
+    with open(json_path, "w") as f:
+        json.dump(result, f, indent=2)
+
+    png_path = None
+    if timeline:
+        png_path = os.path.join(save_dir, "video_timeline.png")
+        render_timeline_image(result["frames"], result["scenes"], height=height, column_width=column_width).save(png_path)
+    return json_path, png_path
+
+def save_collection_palette(save_dir, result, palette=None, png=True, **render_options):
+    """
+    Salva o resultado de extract_collection_palette em save_dir: color_palette.json e
+    color_palette.png (só a barra de cores) com as cores de palette (padrão: toda a paleta
+    da coleção) e collection.json com a paleta completa e a contribuição de cada imagem.
+    Retorna (json_path, png_path, collection_path); png_path é None se png=False.
+    """
+    render_options["swatch_only"] = True
+    json_path, png_path = save_palette(save_dir, None, result["palette"] if palette is None else palette,
+                                       png=png, **render_options)
+    return json_path, png_path, save_collection_json(save_dir, result)
+
+def save_collection_json(save_dir, result):
+    """
+    Salva o resultado de extract_collection_palette em save_dir/collection.json.
+    Retorna o caminho do arquivo.
+    """
+    palette = [{key: value for key, value in c.items() if key != "checkbox"} for c in result["palette"]]
+    collection_path = os.path.join(save_dir, "collection.json")
+    with open(collection_path, "w") as f:
+        json.dump({"palette": palette, "images": result["images"]}, f, indent=2)
+    return collection_path
+
+def save_palette(save_dir, image, palette, png=True, **render_options):
+    """
+    Salva color_palette.json e (opcionalmente) color_palette.png em save_dir,
+    os mesmos arquivos gerados pelo botão "Generate palette".
+    render_options são repassados para save_palette_png (bar_height, labels, ...).
+    Retorna (json_path, png_path); png_path é None se png=False.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    json_path = save_palette_json(save_dir, palette)
+    png_path = save_palette_png(save_dir, image, palette, **render_options) if png else None
+    return json_path, png_path
@@ -0,0 +1,191 @@
+#!/usr/bin/python3
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from kmeans_color_palette.modules.pipeline import ProcessCanceled, convert_image
+from kmeans_color_palette.modules.sampling import sample_indices
+from kmeans_color_palette.modules.clustering import DEFAULT_BACKEND, create_backend, thread_limits
+from kmeans_color_palette.modules.progress import Progress
+
+AUTO_K_METHODS = ["elbow", "silhouette", "bic"]
+
+DEFAULT_AUTO_K_METHOD = "elbow"
+DEFAULT_K_MIN = 2
+DEFAULT_K_MAX = 10
+DEFAULT_SAMPLE_SIZE = 20000     # pixels usados nos ajustes candidatos
+DEFAULT_SILHOUETTE_SIZE = 2000  # pixels usados na silhueta (matriz de distâncias m x m)
+
+
+def elbow_index(k_values, inertia):
+    """
+    Índice do cotovelo da curva inércia x K: o ponto mais distante, abaixo,
+    da reta entre o primeiro e o último ponto da curva normalizada (kneedle).
+    """
+    k = np.asarray(k_values, dtype=np.float64)
+    y = np.asarray(inertia, dtype=np.float64)
+    if len(k) < 3 or y[0] <= y[-1]:
+        return 0
+    x = (k - k[0]) / (k[-1] - k[0])
+    y = (y - y[-1]) / (y[0] - y[-1])
+    return int(np.argmax((1.0 - x) - y))
+
+def pairwise_distances(X):
+    """
+    Matriz (m,m) das distâncias euclidianas entre as linhas de X.
+    """
+    sq = np.einsum("ij,ij->i", X, X)
+    d2 = sq[:, None] - 2.0 * (X @ X.T) + sq[None, :]
+    np.maximum(d2, 0, out=d2)
+    return np.sqrt(d2)
+
+def silhouette_score(distances, labels, K):
+    """
+    Silhueta média exata de um conjunto de pontos, dada sua matriz de distâncias.
+    Pontos sozinhos no cluster têm silhueta 0.
+    """
+    onehot = np.zeros((len(labels), K))
+    onehot[np.arange(len(labels)), labels] = 1.0
+    counts = onehot.sum(axis=0)
+
+    # soma das distâncias de cada ponto a cada cluster
+    sums = distances @ onehot
+    rows = np.arange(len(labels))
+    own = counts[labels]
+
+    a = np.where(own > 1, sums[rows, labels] / np.maximum(own - 1, 1), 0.0)
+    mean_other = np.where(counts[None, :] > 0, sums / np.maximum(counts[None, :], 1), np.inf)
+    mean_other[rows, labels] = np.inf
+    b = mean_other.min(axis=1)
+
+    denom = np.maximum(a, b)
+    sil = np.where((own > 1) & np.isfinite(b) & (denom > 0), (b - a) / np.where(denom > 0, denom, 1.0), 0.0)
+    return float(sil.mean())
+
+def bic_score(X, labels, centroids):
+    """
+    BIC de um modelo de misturas gaussianas esféricas com variância comum
+    (como no X-means): log-verossimilhança - p/2 log(n). Maior é melhor.
+    """
+    n, dim = X.shape
+    K = len(centroids)
+    if n <= K:
+        return -np.inf
+
+    diff = X - centroids[labels]
+    inertia = float(np.einsum("ij,ij->", diff, diff))
+    variance = inertia / (dim * (n - K))
+    if variance <= 0:
+        return np.inf
+
+    counts = np.bincount(labels, minlength=K).astype(np.float64)
+    counts = counts[counts > 0]
+    log_likelihood = (np.sum(counts * np.log(counts)) - n * np.log(n)
+                      - n * dim / 2.0 * np.log(2.0 * np.pi * variance)
+                      - dim * (n - K) / 2.0)
+    n_params = (K - 1) + K * dim + 1
+    return float(log_likelihood - n_params / 2.0 * np.log(n))
+
+def evaluation_sample(img, analysis_type, sample_size=DEFAULT_SAMPLE_SIZE, seed=42):
+    """
+    Amostra aleatória de pixels da imagem (HxWx3 uint8), convertida para analysis_type.
+    Retorna uma matriz (m,3) float64.
+    """
+    rgb = np.asarray(img, dtype=np.uint8).reshape(-1, 3)
+    idx = sample_indices(len(rgb), sample_size, method="random", seed=seed)
+    if idx is not None:
+        rgb = rgb[idx]
+    return convert_image(rgb, analysis_type, dtype=np.float64)
+
+def select_k( X,
+              k_values=None,
+              method=DEFAULT_AUTO_K_METHOD,
+              backend=DEFAULT_BACKEND,
+              backend_options=None,
+              n_jobs=0,
+              silhouette_size=DEFAULT_SILHOUETTE_SIZE,
+              random_state=42,
+              progress=None,
+              is_canceled=None):
+    """
+    Escolhe K avaliando os candidatos k_values em X (matriz (m,3), normalmente uma amostra).
+
+    method          -> "elbow" (cotovelo da inércia), "silhouette" (maior silhueta em uma
+                       amostra de silhouette_size pontos) ou "bic" (maior BIC gaussiano).
+    n_jobs          -> ajustes candidatos em paralelo (threads; 0 = número de CPUs).
+                       Com mais de um job cada ajuste usa uma única thread BLAS/OpenMP.
+    progress        -> modules.progress.Progress, avança a cada candidato ajustado.
+    is_canceled() é consultado antes de cada candidato; se retornar True levanta ProcessCanceled.
+
+    Retorna um dicionário com k (o escolhido), method, k_values e as listas
+    inertia, silhouette e bic (uma entrada por candidato), para justificar a escolha.
+    """
+    if method not in AUTO_K_METHODS:
+        raise ValueError(f"Método de escolha de K '{method}' não suportado.")
+
+    X = np.asarray(X, dtype=np.float64)
+    if k_values is None:
+        k_values = range(DEFAULT_K_MIN, DEFAULT_K_MAX + 1)
+    # K acima do número de linhas distintas (logos, cores chapadas) não tem o que separar
+    n_distinct = len(np.unique(X, axis=0))
+    k_values = sorted(set(min(int(k), n_distinct) for k in k_values if k >= 1))
+    if not k_values:
+        raise ValueError("Nenhum K candidato válido.")
+
+    n_jobs = n_jobs if n_jobs and n_jobs > 0 else (os.cpu_count() or 1)
+    n_jobs = min(n_jobs, len(k_values))
+
+    options = dict(backend_options or {})
+    if n_jobs > 1:
+        # os limites de threadpoolctl valem para o processo inteiro: são aplicados uma vez,
+        # nesta thread, em volta de todos os ajustes (ver abaixo), e não em cada thread,
+        # que os restauraria na ordem em que terminasse
+        options["n_threads"] = 0
+
+    rng = np.random.default_rng(random_state)
+    sil_idx = rng.choice(len(X), size=min(silhouette_size, len(X)), replace=False)
+    distances = pairwise_distances(X[sil_idx])
+
+    total_steps = len(k_values)
+    if progress is None:
+        progress = Progress()
+
+    def evaluate(k):
+        if is_canceled is not None and is_canceled():
+            raise ProcessCanceled()
+        kmeans = create_backend(backend, k, random_state=random_state, **options)
+        kmeans.fit(X)
+        labels = np.asarray(kmeans.labels_)
+        centroids = np.asarray(kmeans.cluster_centers_, dtype=np.float64)
+        scores = {
+            "inertia": float(kmeans.inertia_),
+            "silhouette": silhouette_score(distances, labels[sil_idx], k) if k > 1 else 0.0,
+            "bic": bic_score(X, labels, centroids)
+        }
+        progress.advance(1, total_steps)
+        return scores
+
+    progress.update(0, total_steps)
+
+    if n_jobs > 1:
+        with thread_limits(1), ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            results = list(executor.map(evaluate, k_values))
+    else:
+        results = [evaluate(k) for k in k_values]
+
+    report = {
+        "method": method,
+        "k_values": k_values,
+        "inertia": [r["inertia"] for r in results],
+        "silhouette": [r["silhouette"] for r in results],
+        "bic": [r["bic"] for r in results]
+    }
+
+    if method == "elbow":
+        best = elbow_index(k_values, report["inertia"])
+    else:
+        best = int(np.argmax(report[method]))
+    report["k"] = k_values[best]
+    return report
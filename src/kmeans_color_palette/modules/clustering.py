@@ -0,0 +1,304 @@
+#!/usr/bin/python3
+
+import contextlib
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from kmeans_color_palette.modules.kernels import DEFAULT_CHUNK_SIZE, assign, min_sq_distances
+
+BACKENDS = ["kmeans", "minibatch", "numpy"]
+
+DEFAULT_BACKEND = "kmeans"
+DEFAULT_BACKEND_OPTIONS = {
+    "n_init": "auto",
+    "max_iter": 300,
+    "tol": 1e-4,
+    "n_threads": 0,          # 0 = deixar a biblioteca decidir
+    "algorithm": "lloyd",    # somente para "kmeans": "lloyd" ou "elkan"
+    "batch_size": 4096       # somente para "minibatch"
+}
+
+
+def thread_limits(n_threads):
+    """
+    Context manager que limita as threads BLAS/OpenMP durante o ajuste.
+    Com n_threads <= 0, ou sem threadpoolctl instalado, não faz nada.
+    """
+    if not n_threads or n_threads <= 0:
+        return contextlib.nullcontext()
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return contextlib.nullcontext()
+    return threadpool_limits(limits=int(n_threads))
+
+def as_float_matrix(X):
+    """
+    Matriz de dados em ponto flutuante, sem cópia quando já é float32 ou float64
+    (outros tipos, como uint8, viram float32).
+    """
+    X = np.asarray(X)
+    if X.dtype not in (np.float32, np.float64):
+        X = X.astype(np.float32)
+    return X
+
+
+class ClusteringBackend(ABC):
+    """
+    Interface comum dos motores de agrupamento.
+    Após fit(), ficam disponíveis cluster_centers_ (Kx3), labels_ (N,) e inertia_.
+    fit(X, sample_weight, init) aceita centróides iniciais (Kx3) em init; nesse caso
+    o ajuste parte deles (uma única inicialização) em vez do k-means++.
+    """
+    name = None
+
+    def __init__(self, n_clusters, n_init="auto", max_iter=300, tol=1e-4, n_threads=0, random_state=42, **kwargs):
+        self.n_clusters = n_clusters
+        self.n_init = n_init
+        self.max_iter = max_iter
+        self.tol = tol
+        self.n_threads = n_threads
+        self.random_state = random_state
+
+        self.cluster_centers_ = None
+        self.labels_ = None
+        self.inertia_ = None
+
+    @abstractmethod
+    def fit(self, X, sample_weight=None, init=None):
+        """Ajusta os K clusters em X (Nx3); retorna self."""
+
+    @abstractmethod
+    def predict(self, X):
+        """Rótulo (índice do centróide mais próximo) de cada linha de X."""
+
+
+class SklearnBackend(ClusteringBackend):
+    """
+    Base para os motores do scikit-learn; o sklearn só é importado no fit.
+    """
+    @abstractmethod
+    def make_estimator(self, init=None):
+        """Estimador do scikit-learn configurado (init: centróides iniciais ou None)."""
+
+    def init_options(self, init):
+        """Argumentos init e n_init do estimador."""
+        if init is None:
+            return {"init": "k-means++", "n_init": self.n_init}
+        return {"init": np.asarray(init, dtype=np.float64), "n_init": 1}
+
+    def fit(self, X, sample_weight=None, init=None):
+        with thread_limits(self.n_threads):
+            self.estimator = self.make_estimator(init).fit(as_float_matrix(X), sample_weight=sample_weight)
+        self.cluster_centers_ = self.estimator.cluster_centers_
+        self.labels_ = self.estimator.labels_
+        self.inertia_ = self.estimator.inertia_
+        return self
+
+    def predict(self, X):
+        with thread_limits(self.n_threads):
+            return self.estimator.predict(as_float_matrix(X))
+
+
+class KMeansBackend(SklearnBackend):
+    """sklearn.cluster.KMeans completo (lloyd ou elkan)."""
+    name = "kmeans"
+
+    def __init__(self, n_clusters, algorithm="lloyd", **kwargs):
+        super().__init__(n_clusters, **kwargs)
+        self.algorithm = algorithm
+
+    def make_estimator(self, init=None):
+        from sklearn.cluster import KMeans
+        return KMeans(n_clusters=self.n_clusters,
+                      **self.init_options(init),
+                      max_iter=self.max_iter,
+                      tol=self.tol,
+                      algorithm=self.algorithm,
+                      random_state=self.random_state)
+
+
+class MiniBatchKMeansBackend(SklearnBackend):
+    """sklearn.cluster.MiniBatchKMeans, para imagens enormes ou fluxo contínuo."""
+    name = "minibatch"
+
+    def __init__(self, n_clusters, batch_size=4096, **kwargs):
+        super().__init__(n_clusters, **kwargs)
+        self.batch_size = batch_size
+
+    def make_estimator(self, init=None):
+        from sklearn.cluster import MiniBatchKMeans
+        return MiniBatchKMeans(n_clusters=self.n_clusters,
+                               **self.init_options(init),
+                               max_iter=self.max_iter,
+                               tol=self.tol,
+                               batch_size=self.batch_size,
+                               random_state=self.random_state)
+
+
+class NumpyKMeansBackend(ClusteringBackend):
+    """
+    K-means de Lloyd em NumPy puro, com inicialização k-means++ ponderada.
+    Não importa o scikit-learn; as distâncias usam os kernels em blocos de modules.kernels
+    (produtos matriciais float32, BLAS).
+    """
+    name = "numpy"
+
+    # linhas processadas por vez no cálculo de distâncias
+    chunk_size = DEFAULT_CHUNK_SIZE
+
+    def _assign(self, X, centers):
+        """Retorna (labels, menor distância quadrada) processando X em blocos."""
+        return assign(X, centers, chunk_size=self.chunk_size)
+
+    def _init_centers(self, X, weights, rng):
+        """
+        Inicialização k-means++ ponderada pelos pesos das amostras.
+        Só o vetor (N,) das menores distâncias fica vivo; cada novo centro é comparado
+        com X em blocos.
+        """
+        n = len(X)
+        centers = np.empty((self.n_clusters, X.shape[1]), dtype=np.float64)
+        centers[0] = X[rng.choice(n, p=weights / weights.sum())]
+        closest = min_sq_distances(X, centers[:1], self.chunk_size)
+        for k in range(1, self.n_clusters):
+            prob = closest * weights
+            total = prob.sum()
+            if total <= 0:
+                idx = rng.integers(n)
+            else:
+                idx = rng.choice(n, p=prob / total)
+            centers[k] = X[idx]
+            np.minimum(closest, min_sq_distances(X, centers[k:k+1], self.chunk_size), out=closest)
+        return centers
+
+    def _lloyd(self, X, weights, centers):
+        """Iterações de Lloyd; retorna (centers, labels, inertia)."""
+        K = self.n_clusters
+        tol = self.tol * np.mean(np.var(X, axis=0))
+        for _ in range(self.max_iter):
+            labels, min_dist = self._assign(X, centers)
+
+            # somas por cluster acumuladas em blocos: sem temporários float64 do tamanho de X
+            sums = np.zeros(centers.shape)
+            counts = np.zeros(K)
+            for start in range(0, len(X), self.chunk_size):
+                stop = min(start + self.chunk_size, len(X))
+                lab, wt = labels[start:stop], weights[start:stop]
+                counts += np.bincount(lab, weights=wt, minlength=K)
+                for ch in range(X.shape[1]):
+                    sums[:, ch] += np.bincount(lab, weights=wt * X[start:stop, ch], minlength=K)
+
+            new_centers = centers.copy()
+            filled = counts > 0
+            new_centers[filled] = sums[filled] / counts[filled, None]
+
+            # clusters vazios recebem os pontos mais distantes
+            empty = np.flatnonzero(~filled)
+            if len(empty) > 0:
+                far = np.argsort(min_dist)[::-1][:len(empty)]
+                new_centers[empty] = X[far]
+
+            shift = np.sum((new_centers - centers) ** 2)
+            centers = new_centers
+            if shift <= tol:
+                break
+
+        labels, min_dist = self._assign(X, centers)
+        inertia = float(np.sum(min_dist * weights))
+        return centers, labels, inertia
+
+    def fit(self, X, sample_weight=None, init=None):
+        X = as_float_matrix(X)
+        weights = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        rng = np.random.default_rng(self.random_state)
+
+        n_init = 1 if self.n_init == "auto" or init is not None else int(self.n_init)
+
+        best = None
+        with thread_limits(self.n_threads):
+            for _ in range(n_init):
+                if init is not None:
+                    centers = np.array(init, dtype=np.float64)
+                else:
+                    centers = self._init_centers(X, weights, rng)
+                result = self._lloyd(X, weights, centers)
+                if best is None or result[2] < best[2]:
+                    best = result
+
+        self.cluster_centers_, self.labels_, self.inertia_ = best
+        return self
+
+    def predict(self, X):
+        with thread_limits(self.n_threads):
+            labels, _ = assign(X, self.cluster_centers_, distances=False, chunk_size=self.chunk_size)
+        return labels
+
+
+def split_centers(X, centers, labels, sample_weight=None):
+    """
+    Centróides iniciais para K+1 clusters a partir de um ajuste com K:
+    o cluster de maior distorção (soma ponderada das distâncias quadradas)
+    é dividido em dois ao longo do seu eixo principal, c ± sqrt(λ)·v.
+    Se esse cluster não tiver variância, o ponto mais distante do seu centróide vira o novo centro.
+    Retorna um array (K+1)x3.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    centers = np.asarray(centers, dtype=np.float64)
+    K = len(centers)
+    weights = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+
+    diff = X - centers[labels]
+    dist = np.einsum("ij,ij->i", diff, diff) * weights
+    distortion = np.bincount(labels, weights=dist, minlength=K)
+    worst = int(np.argmax(distortion))
+
+    members = labels == worst
+    new_centers = np.vstack((centers, centers[worst]))
+    if np.count_nonzero(members) > 1:
+        cov = np.cov(X[members].T, aweights=weights[members])
+        eigval, eigvec = np.linalg.eigh(cov)
+        if eigval[-1] > 0:
+            offset = np.sqrt(eigval[-1]) * eigvec[:, -1]
+            new_centers[worst] = centers[worst] + offset
+            new_centers[K] = centers[worst] - offset
+            return new_centers
+
+    new_centers[K] = X[np.argmax(dist)]
+    return new_centers
+
+
+BACKEND_CLASSES = {
+    "kmeans": KMeansBackend,
+    "minibatch": MiniBatchKMeansBackend,
+    "numpy": NumpyKMeansBackend
+}
+
+def create_backend(name, n_clusters, random_state=42, **options):
+    """
+    Cria o motor de agrupamento pelo nome (ver BACKENDS).
+    options aceita n_init, max_iter, tol, n_threads, algorithm e batch_size;
+    valores ausentes usam DEFAULT_BACKEND_OPTIONS.
+    """
+    if name not in BACKEND_CLASSES:
+        raise ValueError(f"Motor de agrupamento '{name}' não suportado.")
+
+    merged = dict(DEFAULT_BACKEND_OPTIONS)
+    merged.update({key: value for key, value in options.items() if value is not None})
+    return BACKEND_CLASSES[name](n_clusters, random_state=random_state, **merged)
+
+def backend_options_from_config(config):
+    """
+    Extrai do config.json os parâmetros do motor de agrupamento.
+    Chaves ausentes são ignoradas (usam DEFAULT_BACKEND_OPTIONS).
+    """
+    keys = {
+        "n_init": "n_init",
+        "max_iter": "max_iter",
+        "tol": "tol",
+        "n_threads": "n_threads",
+        "algorithm": "kmeans_algorithm",
+        "batch_size": "minibatch_batch_size"
+    }
+    return {option: config[key] for option, key in keys.items() if key in config}
@@ -0,0 +1,190 @@
+#!/usr/bin/python3
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from kmeans_color_palette.modules.pipeline import (
+    ProcessCanceled,
+    DEFAULT_SAMPLING_METHOD,
+    DEFAULT_MAX_PIXELS,
+    convert_image,
+    prepare_fit_data,
+    fit_kmeans,
+    compute_result,
+    palette_from_result
+)
+from kmeans_color_palette.modules.histogram import OnlineColorHistogram, pack_colors
+from kmeans_color_palette.modules.clustering import DEFAULT_BACKEND
+from kmeans_color_palette.modules.streaming import StripReader, DEFAULT_STRIP_PIXELS
+from kmeans_color_palette.modules.progress import Progress
+
+DEFAULT_COLLECTION_BITS = 6                      # bits por canal dos histogramas das imagens
+DEFAULT_COLLECTION_MAX_DECODE_PIXELS = 4 * 1000 * 1000 # imagens maiores são reduzidas antes do histograma
+COVERAGE_MIN_W = 0.01                            # fração mínima de uma imagem para a cor "aparecer" nela
+CANCEL_POLL_SECONDS = 0.1                        # intervalo de consulta a is_canceled enquanto os processos leem
+
+
+def image_histogram(path, bits=DEFAULT_COLLECTION_BITS, strip_pixels=DEFAULT_STRIP_PIXELS,
+                    max_decode_pixels=DEFAULT_COLLECTION_MAX_DECODE_PIXELS):
+    """
+    Reduz uma imagem a um histograma de cores compacto (roda nos processos do pool).
+    A imagem é lida em faixas (ver streaming.StripReader), então a memória não depende
+    do seu tamanho além de max_decode_pixels.
+    Retorna {path, colors, counts, pixels}: cor média (uint8) e número de pixels de cada
+    bin não vazio, e o total de pixels lidos.
+    """
+    reader = StripReader(path, strip_pixels, max_decode_pixels)
+    histogram = OnlineColorHistogram(bits)
+    for rgb in reader:
+        histogram.add(rgb)
+    colors, counts = histogram.result()
+    return {"path": os.fspath(path), "colors": colors, "counts": counts, "pixels": int(counts.sum())}
+
+def iter_histograms(paths, bits=DEFAULT_COLLECTION_BITS, n_jobs=0, is_canceled=None, mp_context=None, **options):
+    """
+    Gera os resultados de image_histogram de cada caminho, na ordem em que ficam prontos.
+    n_jobs processos (0 = número de CPUs; 1 = no próprio processo), criados com mp_context
+    (padrão do multiprocessing se None; use multiprocessing.get_context("spawn") quando o
+    processo tem outras threads, como a GUI: fork copia só a thread que chama).
+    Erros de leitura são levantados como estão; is_canceled() é consultado a cada imagem e,
+    com vários processos, a cada CANCEL_POLL_SECONDS enquanto as imagens são lidas.
+    """
+    n_jobs = n_jobs if n_jobs and n_jobs > 0 else (os.cpu_count() or 1)
+    n_jobs = min(n_jobs, len(paths))
+
+    def check_canceled():
+        if is_canceled is not None and is_canceled():
+            raise ProcessCanceled()
+
+    if n_jobs <= 1:
+        for path in paths:
+            check_canceled()
+            yield image_histogram(path, bits, **options)
+        return
+
+    executor = ProcessPoolExecutor(max_workers=n_jobs, mp_context=mp_context)
+    canceled = False
+    pending = set()
+    try:
+        pending = {executor.submit(image_histogram, path, bits, **options) for path in paths}
+        while pending:
+            done, pending = wait(pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            check_canceled()
+            for future in done:
+                yield future.result()
+    except ProcessCanceled:
+        canceled = True
+        raise
+    finally:
+        # erro ou cancelamento: as imagens ainda na fila não são lidas (à mão: cancel_futures
+        # do shutdown só existe no Python 3.9+); no cancelamento também não se espera pelas
+        # imagens que já estão sendo lidas
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=not canceled)
+
+def collection_palette( paths,
+                        k=5,
+                        analysis_type="rgb",
+                        bits=DEFAULT_COLLECTION_BITS,
+                        n_jobs=0,
+                        sampling_method=DEFAULT_SAMPLING_METHOD,
+                        max_pixels=DEFAULT_MAX_PIXELS,
+                        backend=DEFAULT_BACKEND,
+                        backend_options=None,
+                        strip_pixels=DEFAULT_STRIP_PIXELS,
+                        max_decode_pixels=DEFAULT_COLLECTION_MAX_DECODE_PIXELS,
+                        mp_context=None,
+                        progress=None,
+                        is_canceled=None):
+    """
+    Uma única paleta para um conjunto de imagens.
+
+    1. histogramas: cada imagem é reduzida, em paralelo (n_jobs processos criados com
+       mp_context, ver iter_histograms), a um histograma
+       de bits por canal (ver image_histogram); os histogramas são somados num único
+       OnlineColorHistogram à medida que ficam prontos.
+    2. ajuste: o K-means (backend) é ajustado nas cores do histograma somado, ponderadas
+       pelas contagens; com mais de max_pixels cores elas são amostradas (sampling_method;
+       "downscale" não se aplica e vira "random").
+    3. estatísticas: w, d, score, ... são calculados sobre o histograma somado, e os rótulos
+       dos seus bins dão a contribuição de cada imagem.
+
+    A memória depende do tamanho dos histogramas (2**(3*bits) bins no total mais os bins
+    não vazios de cada imagem), não do número total de pixels.
+
+    Retorna {palette, images}:
+        palette -> lista no formato de engine.extract_palette, com "coverage" em cada cor:
+                   fração das imagens em que a cor ocupa pelo menos COVERAGE_MIN_W dos pixels;
+        images  -> lista de {path, pixels, w, share}, na ordem de paths; w[i] é a fração dos
+                   pixels da imagem na cor i da paleta e share[i] a fração dos pixels da cor i
+                   que vêm da imagem.
+    """
+    paths = [os.fspath(p) for p in paths]
+    if not paths:
+        raise ValueError("Nenhuma imagem na coleção.")
+    if progress is None:
+        progress = Progress()
+
+    merged = OnlineColorHistogram(bits)
+    per_image = {}
+
+    # --- histogramas em paralelo, somados à medida que chegam ---
+    with progress.stage("histograms", 0.6) as p:
+        for n, hist in enumerate(iter_histograms(paths, bits, n_jobs, is_canceled, mp_context,
+                                                 strip_pixels=strip_pixels,
+                                                 max_decode_pixels=max_decode_pixels), 1):
+            merged.add_histogram(hist["colors"], hist["counts"])
+            # só os códigos e contagens ficam guardados para as contribuições (uint32 quando cabe)
+            image_counts = hist["counts"]
+            if image_counts.max() < (1 << 32):
+                image_counts = image_counts.astype(np.uint32)
+            per_image[hist["path"]] = (pack_colors(hist["colors"], bits), image_counts)
+            p.update(n, len(paths))
+
+    colors, counts = merged.result()
+    data_np = convert_image(colors, analysis_type)
+    K = min(k, len(colors))
+
+    # --- ajuste único no histograma somado ---
+    with progress.stage("fit", 0.3):
+        if sampling_method == "downscale":
+            sampling_method = "random"
+        fit_np, fit_weights = prepare_fit_data(None, data_np, counts, analysis_type, sampling_method, max_pixels)
+        labels, centroids = fit_kmeans(data_np, fit_np, K, sample_weight=fit_weights,
+                                       backend=backend, backend_options=backend_options)
+    if is_canceled is not None and is_canceled():
+        raise ProcessCanceled()
+
+    with progress.stage("stats", 0.1) as p:
+        result = compute_result(data_np, counts, labels, centroids, analysis_type, progress=p)
+
+        # rótulo de cada bin do histograma somado, indexado pelo código da cor
+        lut = np.zeros(1 << (3 * bits), dtype=np.int32)
+        lut[pack_colors(colors, bits)] = labels
+        # mesma ordem de palette_from_result (w decrescente, estável)
+        order = np.argsort(-np.asarray(result["w"]), kind="stable")
+        cluster_pixels = np.maximum(np.asarray(result["counts"], dtype=np.float64), 1.0)
+
+        images = []
+        present = np.zeros(K, dtype=np.int64)
+        for path in paths:
+            codes, image_counts = per_image[path]
+            pixels = np.bincount(lut[codes], weights=image_counts, minlength=K)
+            total = max(float(pixels.sum()), 1.0)
+            present += pixels / total >= COVERAGE_MIN_W
+            images.append({
+                "path": path,
+                "pixels": int(image_counts.sum()),
+                "w": [float(v) for v in pixels[order] / total],
+                "share": [float(v) for v in pixels[order] / cluster_pixels[order]]
+            })
+
+    palette = palette_from_result(result)
+    for color, i in zip(palette, order):
+        color["coverage"] = float(present[i] / len(paths))
+    progress.finish()
+
+    return {"palette": palette, "images": images}
@@ -1,7 +1,6 @@
 #!/usr/bin/python3
 
 import colorsys
-import cv2
 import numpy as np
 
 def rgb_to_hex(rgb):
@@ -34,8 +33,10 @@ def rgb_to_lab(r, g, b):
     """
     Converte uma cor de RGB para CIELAB.
     Entrada: r, g, b (0-255)
-    Saída: L, a, b (valores Lab)
+    Saída: L, a, b (valores Lab de 8 bits do OpenCV)
+    Para arrays e precisão de ponto flutuante use modules.colorspace.rgb_to_lab_array.
     """
+    import cv2
     rgb = np.array([[[r, g, b]]], dtype=np.uint8)  # precisa de forma (1,1,3)
     lab = cv2.cvtColor(rgb, cv2.COLOR_RGB2LAB)
     return lab[0, 0, 0], lab[0, 0, 1], lab[0, 0, 2]
@@ -46,9 +47,163 @@ def lab_to_rgb(L, a, b):
     Converte uma cor de CIELAB para RGB.
     Entrada: L, a, b (valores Lab como retornados pela função anterior)
     Saída: r, g, b (0-255)
+    Para arrays e precisão de ponto flutuante use modules.colorspace.lab_to_rgb_array.
     """
+    import cv2
     lab = np.array([[[L, a, b]]], dtype=np.uint8)  # precisa de forma (1,1,3)
     rgb = cv2.cvtColor(lab, cv2.COLOR_LAB2RGB)
     return rgb[0, 0, 0], rgb[0, 0, 1], rgb[0, 0, 2]
 
 
+################################################################################
+# Conversões vetorizadas (arrays inteiros)
+################################################################################
+
+def _as_unit_rgb(rgb, dtype=np.float64):
+    """
+    Converte um array (...,3) de RGB (0-255) para floats em (0-1).
+    """
+    rgb = np.asarray(rgb)
+    if rgb.shape[-1] != 3:
+        raise ValueError("O array de cores precisa ter a última dimensão igual a 3.")
+    return rgb.astype(dtype, copy=False) / 255.0
+
+
+def rgb_to_hls_array(rgb, dtype=np.float64):
+    """
+    Versão vetorizada de colorsys.rgb_to_hls.
+    Entrada: array (...,3) com RGB (0-255), por exemplo (N,3) ou (H,W,3).
+    Retorna: array (...,3) com H (0-1), L (0-1), S (0-1).
+    """
+    rgb_ = _as_unit_rgb(rgb, dtype)
+    r, g, b = rgb_[..., 0], rgb_[..., 1], rgb_[..., 2]
+
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    sumc = maxc + minc
+    rangec = maxc - minc
+    l = sumc / 2.0
+
+    gray = rangec == 0
+    safe_range = np.where(gray, 1.0, rangec)
+
+    # mesma regra de colorsys: denominador depende de l
+    denom = np.where(l <= 0.5, sumc, 2.0 - sumc)
+    s = np.where(gray, 0.0, rangec / np.where(gray, 1.0, denom))
+
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+
+    h = np.where(r == maxc, bc - gc,
+        np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0.0, (h / 6.0) % 1.0)
+
+    return np.stack((h, l, s), axis=-1).astype(dtype, copy=False)
+
+
+def _hls_channel(m1, m2, hue):
+    """
+    Equivalente vetorizado de colorsys._v.
+    """
+    hue = hue % 1.0
+    return np.where(hue < 1.0/6.0, m1 + (m2 - m1) * hue * 6.0,
+           np.where(hue < 0.5, m2,
+           np.where(hue < 2.0/3.0, m1 + (m2 - m1) * (2.0/3.0 - hue) * 6.0, m1)))
+
+
+def hls_to_rgb_array(hls, dtype=np.float64):
+    """
+    Versão vetorizada de colorsys.hls_to_rgb.
+    Entrada: array (...,3) com H (0-1), L (0-1), S (0-1).
+    Retorna: array (...,3) com RGB em floats (0-1).
+    """
+    hls = np.asarray(hls, dtype=dtype)
+    h, l, s = hls[..., 0], hls[..., 1], hls[..., 2]
+
+    m2 = np.where(l <= 0.5, l * (1.0 + s), l + s - (l * s))
+    m1 = 2.0 * l - m2
+
+    rgb = np.stack((_hls_channel(m1, m2, h + 1.0/3.0),
+                    _hls_channel(m1, m2, h),
+                    _hls_channel(m1, m2, h - 1.0/3.0)), axis=-1)
+
+    gray = (s == 0.0)[..., None]
+    return np.where(gray, l[..., None], rgb).astype(dtype, copy=False)
+
+
+def rgb_to_hsl_array(rgb, dtype=np.float64):
+    """
+    Versão vetorizada de rgb_to_hsl.
+    Entrada: array (...,3) com RGB (0-255).
+    Retorna: array (...,3) com H (0-360), S (0-1), L (0-1).
+    """
+    hls = rgb_to_hls_array(rgb, dtype)
+    hsl = hls[..., [0, 2, 1]]
+    hsl[..., 0] *= 360.0
+    return hsl
+
+
+def hsl_to_rgb_array(hsl):
+    """
+    Versão vetorizada de hsl_to_rgb, útil para converter todos os centróides.
+    Entrada: array (...,3) com H (0-360), S (0-1), L (0-1).
+    Retorna: array (...,3) de inteiros RGB (0-255).
+    """
+    hsl = np.asarray(hsl, dtype=np.float64)
+    hls = np.stack((hsl[..., 0] / 360.0, hsl[..., 2], hsl[..., 1]), axis=-1)
+    return np.round(hls_to_rgb_array(hls) * 255.0).astype(int)
+
+
+def rgb_to_hsv_array(rgb, dtype=np.float64):
+    """
+    Versão vetorizada de colorsys.rgb_to_hsv.
+    Entrada: array (...,3) com RGB (0-255).
+    Retorna: array (...,3) com H (0-1), S (0-1), V (0-1).
+    """
+    rgb_ = _as_unit_rgb(rgb, dtype)
+    r, g, b = rgb_[..., 0], rgb_[..., 1], rgb_[..., 2]
+
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    rangec = maxc - minc
+    v = maxc
+
+    gray = rangec == 0
+    safe_range = np.where(gray, 1.0, rangec)
+    s = np.where(gray, 0.0, rangec / np.where(maxc == 0, 1.0, maxc))
+
+    rc = (maxc - r) / safe_range
+    gc = (maxc - g) / safe_range
+    bc = (maxc - b) / safe_range
+
+    h = np.where(r == maxc, bc - gc,
+        np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(gray, 0.0, (h / 6.0) % 1.0)
+
+    return np.stack((h, s, v), axis=-1).astype(dtype, copy=False)
+
+
+def hsv_to_rgb_array(hsv, dtype=np.float64):
+    """
+    Versão vetorizada de colorsys.hsv_to_rgb.
+    Entrada: array (...,3) com H (0-1), S (0-1), V (0-1).
+    Retorna: array (...,3) com RGB em floats (0-1).
+    """
+    hsv = np.asarray(hsv, dtype=dtype)
+    h, s, v = hsv[..., 0], hsv[..., 1], hsv[..., 2]
+
+    i = np.floor(h * 6.0)
+    f = (h * 6.0) - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i.astype(int) % 6
+
+    r = np.choose(i, (v, q, p, p, t, v))
+    g = np.choose(i, (t, v, v, q, p, p))
+    b = np.choose(i, (p, p, t, v, v, q))
+
+    rgb = np.stack((r, g, b), axis=-1)
+    gray = (s == 0.0)[..., None]
+    return np.where(gray, v[..., None], rgb).astype(dtype, copy=False)
@@ -0,0 +1,197 @@
+#!/usr/bin/python3
+
+import numpy as np
+
+from kmeans_color_palette.modules.color import rgb_to_hsl_array, hsl_to_rgb_array
+
+# Conversões vetorizadas entre sRGB (0-255) e espaços perceptuais, em ponto flutuante.
+# As conversões diretas processam os pixels em blocos (chunk_size linhas por vez) e
+# podem escrever em um array de saída já alocado (out), inclusive o próprio array
+# de entrada quando ele é float32 (conversão no lugar).
+# As inversas convertem todos os centróides de uma vez e retornam RGB inteiro (0-255).
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# sRGB linear -> XYZ (D65) e o branco de referência D65
+RGB_TO_XYZ = np.array([[0.4124564, 0.3575761, 0.1804375],
+                       [0.2126729, 0.7151522, 0.0721750],
+                       [0.0193339, 0.1191920, 0.9503041]])
+XYZ_TO_RGB = np.linalg.inv(RGB_TO_XYZ)
+WHITE_D65 = np.array([0.95047, 1.0, 1.08883])
+
+# OKLab (Björn Ottosson, 2020)
+OKLAB_M1 = np.array([[0.4122214708, 0.5363325363, 0.0514459929],
+                     [0.2119034982, 0.6806995451, 0.1073969566],
+                     [0.0883024619, 0.2817188376, 0.6299787005]])
+OKLAB_M2 = np.array([[0.2104542553, 0.7936177850, -0.0040720468],
+                     [1.9779984951, -2.4285922050, 0.4505937099],
+                     [0.0259040371, 0.7827717662, -0.8086757660]])
+OKLAB_M1_INV = np.linalg.inv(OKLAB_M1)
+OKLAB_M2_INV = np.linalg.inv(OKLAB_M2)
+
+# OKLab é multiplicado por 100 (L em 0-100) para que as distâncias tenham
+# a mesma ordem de grandeza das do CIELAB
+OKLAB_SCALE = 100.0
+
+_EPSILON = (6.0 / 29.0) ** 3
+_KAPPA = 3.0 * (6.0 / 29.0) ** 2
+
+# u', v' do branco de referência (CIELUV)
+_WHITE_U = 4.0 * WHITE_D65[0] / (WHITE_D65[0] + 15.0 * WHITE_D65[1] + 3.0 * WHITE_D65[2])
+_WHITE_V = 9.0 * WHITE_D65[1] / (WHITE_D65[0] + 15.0 * WHITE_D65[1] + 3.0 * WHITE_D65[2])
+
+
+def _srgb_to_linear_float(c):
+    """Remove a curva gama do sRGB (c em 0-1)."""
+    return np.where(c <= 0.04045, c / 12.92, ((c + 0.055) / 1.055) ** 2.4)
+
+# tabela para entradas uint8: evita a potência em cada pixel
+SRGB_TO_LINEAR_LUT = _srgb_to_linear_float(np.arange(256) / 255.0).astype(np.float32)
+
+
+def srgb_to_linear(rgb, dtype=np.float32):
+    """
+    RGB (0-255) para sRGB linear (0-1). Entradas uint8 usam uma tabela de 256 valores.
+    """
+    rgb = np.asarray(rgb)
+    if rgb.dtype == np.uint8:
+        return SRGB_TO_LINEAR_LUT.astype(dtype, copy=False)[rgb]
+    return _srgb_to_linear_float(rgb.astype(dtype, copy=False) / 255.0).astype(dtype, copy=False)
+
+def linear_to_rgb255(linear):
+    """
+    sRGB linear (0-1) para RGB inteiro (0-255), com arredondamento e saturação.
+    """
+    linear = np.clip(np.asarray(linear, dtype=np.float64), 0.0, 1.0)
+    srgb = np.where(linear <= 0.0031308, 12.92 * linear, 1.055 * linear ** (1.0 / 2.4) - 0.055)
+    return np.clip(np.round(srgb * 255.0), 0, 255).astype(int)
+
+def _f_lab(t):
+    return np.where(t > _EPSILON, np.cbrt(t), t / _KAPPA + 4.0 / 29.0)
+
+def _f_lab_inv(t):
+    return np.where(t > 6.0 / 29.0, t ** 3, _KAPPA * (t - 4.0 / 29.0))
+
+
+################################################################################
+# Transformações de um bloco (N,3)
+################################################################################
+
+def _rgb_to_lab_block(rgb, dtype):
+    xyz = srgb_to_linear(rgb, dtype) @ (RGB_TO_XYZ / WHITE_D65[:, None]).T.astype(dtype)
+    f = _f_lab(xyz)
+    return np.stack((116.0 * f[:, 1] - 16.0,
+                     500.0 * (f[:, 0] - f[:, 1]),
+                     200.0 * (f[:, 1] - f[:, 2])), axis=-1)
+
+def _rgb_to_oklab_block(rgb, dtype):
+    lms = np.cbrt(srgb_to_linear(rgb, dtype) @ OKLAB_M1.T.astype(dtype))
+    return lms @ (OKLAB_SCALE * OKLAB_M2).T.astype(dtype)
+
+def _rgb_to_luv_block(rgb, dtype):
+    xyz = srgb_to_linear(rgb, dtype) @ RGB_TO_XYZ.T.astype(dtype)
+    L = 116.0 * _f_lab(xyz[:, 1] / WHITE_D65[1]) - 16.0
+    denom = xyz[:, 0] + 15.0 * xyz[:, 1] + 3.0 * xyz[:, 2]
+    safe = np.where(denom > 0, denom, 1.0)
+    u = np.where(denom > 0, 4.0 * xyz[:, 0] / safe, _WHITE_U)
+    v = np.where(denom > 0, 9.0 * xyz[:, 1] / safe, _WHITE_V)
+    return np.stack((L, 13.0 * L * (u - _WHITE_U), 13.0 * L * (v - _WHITE_V)), axis=-1)
+
+def _rgb_to_hsl_block(rgb, dtype):
+    return rgb_to_hsl_array(rgb, dtype)
+
+def _convert_chunked(rgb, block_func, dtype=np.float32, chunk_size=DEFAULT_CHUNK_SIZE, out=None):
+    """
+    Aplica block_func em blocos de chunk_size linhas de rgb (...,3),
+    escrevendo em out (alocado se None). out pode ser o próprio rgb se ele for do tipo dtype.
+    """
+    rgb = np.asarray(rgb)
+    shape = rgb.shape
+    if shape[-1] != 3:
+        raise ValueError("O array de cores precisa ter a última dimensão igual a 3.")
+
+    flat = rgb.reshape(-1, 3)
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    out_flat = out.reshape(-1, 3)
+
+    for start in range(0, len(flat), chunk_size):
+        stop = min(start + chunk_size, len(flat))
+        out_flat[start:stop] = block_func(flat[start:stop], dtype)
+    return out
+
+
+################################################################################
+# API: RGB (0-255) <-> espaço de cor
+################################################################################
+
+def rgb_to_lab_array(rgb, dtype=np.float32, chunk_size=DEFAULT_CHUNK_SIZE, out=None):
+    """
+    RGB (0-255), array (...,3), para CIELAB (D65): L (0-100), a e b (aprox. -128 a 127).
+    """
+    return _convert_chunked(rgb, _rgb_to_lab_block, dtype, chunk_size, out)
+
+def lab_to_rgb_array(lab):
+    """
+    CIELAB (D65), array (...,3), para RGB inteiro (0-255). Usado para todos os centróides de uma vez.
+    """
+    lab = np.asarray(lab, dtype=np.float64)
+    fy = (lab[..., 0] + 16.0) / 116.0
+    f = np.stack((fy + lab[..., 1] / 500.0, fy, fy - lab[..., 2] / 200.0), axis=-1)
+    xyz = _f_lab_inv(f) * WHITE_D65
+    return linear_to_rgb255(xyz @ XYZ_TO_RGB.T)
+
+def rgb_to_oklab_array(rgb, dtype=np.float32, chunk_size=DEFAULT_CHUNK_SIZE, out=None):
+    """
+    RGB (0-255), array (...,3), para OKLab multiplicado por OKLAB_SCALE: L (0-100), a e b (aprox. -40 a 40).
+    """
+    return _convert_chunked(rgb, _rgb_to_oklab_block, dtype, chunk_size, out)
+
+def oklab_to_rgb_array(oklab):
+    """
+    OKLab (multiplicado por OKLAB_SCALE), array (...,3), para RGB inteiro (0-255).
+    """
+    oklab = np.asarray(oklab, dtype=np.float64) / OKLAB_SCALE
+    lms = (oklab @ OKLAB_M2_INV.T) ** 3
+    return linear_to_rgb255(lms @ OKLAB_M1_INV.T)
+
+def rgb_to_luv_array(rgb, dtype=np.float32, chunk_size=DEFAULT_CHUNK_SIZE, out=None):
+    """
+    RGB (0-255), array (...,3), para CIELUV (D65): L (0-100), u e v.
+    """
+    return _convert_chunked(rgb, _rgb_to_luv_block, dtype, chunk_size, out)
+
+def luv_to_rgb_array(luv):
+    """
+    CIELUV (D65), array (...,3), para RGB inteiro (0-255).
+    """
+    luv = np.asarray(luv, dtype=np.float64)
+    L = luv[..., 0]
+    dark = L <= 0
+    safe_L = np.where(dark, 1.0, L)
+    u = luv[..., 1] / (13.0 * safe_L) + _WHITE_U
+    v = luv[..., 2] / (13.0 * safe_L) + _WHITE_V
+    safe_v = np.where(v != 0, v, 1e-12)
+
+    Y = _f_lab_inv((L + 16.0) / 116.0) * WHITE_D65[1]
+    X = Y * 9.0 * u / (4.0 * safe_v)
+    Z = Y * (12.0 - 3.0 * u - 20.0 * v) / (4.0 * safe_v)
+    xyz = np.where(dark[..., None], 0.0, np.stack((X, Y, Z), axis=-1))
+    return linear_to_rgb255(xyz @ XYZ_TO_RGB.T)
+
+def rgb_to_hsl_chunked(rgb, dtype=np.float32, chunk_size=DEFAULT_CHUNK_SIZE, out=None):
+    """
+    RGB (0-255), array (...,3), para HSL: H (0-360), S (0-1), L (0-1).
+    Mesmo resultado de color.rgb_to_hsl_array, mas em blocos: os temporários
+    da conversão têm o tamanho de um bloco e não da imagem.
+    """
+    return _convert_chunked(rgb, _rgb_to_hsl_block, dtype, chunk_size, out)
+
+
+# espaço -> (RGB para o espaço, espaço para RGB)
+COLOR_SPACES = {
+    "lab": (rgb_to_lab_array, lab_to_rgb_array),
+    "oklab": (rgb_to_oklab_array, oklab_to_rgb_array),
+    "luv": (rgb_to_luv_array, luv_to_rgb_array),
+    "hsl": (rgb_to_hsl_chunked, hsl_to_rgb_array)
+}
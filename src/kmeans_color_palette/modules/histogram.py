@@ -0,0 +1,159 @@
+#!/usr/bin/python3
+
+import numpy as np
+
+# Acima deste número de bins o histograma denso (bincount) gasta memória demais
+# e é melhor usar np.unique.
+MAX_DENSE_BINS = 1 << 24
+
+# pixels empacotados por vez no histograma denso: blocos grandes diluem o custo fixo
+# dos bincount de n_bins posições (4M pixels: 16 MB de códigos por bloco)
+DEFAULT_CHUNK_SIZE = 1 << 22
+
+
+def pack_colors(rgb, bits=8):
+    """
+    Empacota cada cor RGB (0-255) em um único inteiro, mantendo os 'bits' bits
+    mais significativos de cada canal.
+    Entrada: array (N,3) de uint8.
+    Retorna: array (N,) de int32 com valores em [0, 2**(3*bits)).
+    """
+    rgb = np.asarray(rgb)
+    shift = 8 - bits
+    # operações no lugar: um único array int32 em vez de um int64 por canal
+    codes = (rgb[:, 0] >> shift).astype(np.int32)
+    codes <<= bits
+    codes |= rgb[:, 1] >> shift
+    codes <<= bits
+    codes |= rgb[:, 2] >> shift
+    return codes
+
+def unpack_colors(codes):
+    """
+    Inverso de pack_colors com bits=8: array (M,) de códigos para (M,3) uint8.
+    """
+    codes = np.asarray(codes)
+    colors = np.empty((len(codes), 3), dtype=np.uint8)
+    colors[:, 0] = codes >> 16
+    colors[:, 1] = (codes >> 8) & 0xFF
+    colors[:, 2] = codes & 0xFF
+    return colors
+
+def color_histogram(rgb, bits=8, return_inverse=False, progress=None):
+    """
+    Agrupa os pixels (N,3) RGB em bins de cor com contagem.
+    Com bits=8 cada bin é uma cor única (sem perda); com menos bits as cores são
+    quantizadas e cada bin é representado pela cor média dos seus pixels.
+
+    Retorna (colors, counts) ou (colors, counts, inverse), onde:
+        colors  -> array (M,3) de uint8 com a cor de cada bin;
+        counts  -> array (M,) de int64 com o número de pixels de cada bin;
+        inverse -> array (N,) com o índice do bin de cada pixel.
+    progress (modules.progress.Progress) avança bloco a bloco no histograma denso.
+    """
+    if bits < 1 or bits > 8:
+        raise ValueError("bits precisa estar entre 1 e 8.")
+
+    rgb = np.asarray(rgb, dtype=np.uint8).reshape(-1, 3)
+    n_bins = 1 << (3 * bits)
+    dense = n_bins <= MAX_DENSE_BINS and len(rgb) >= n_bins // 8
+
+    if dense and not return_inverse:
+        # histograma denso acumulado em blocos: os códigos nunca existem para a imagem inteira
+        histogram = OnlineColorHistogram(bits)
+        for start in range(0, len(rgb), DEFAULT_CHUNK_SIZE):
+            histogram.add(rgb[start:start + DEFAULT_CHUNK_SIZE])
+            if progress is not None:
+                progress.update(start + DEFAULT_CHUNK_SIZE, len(rgb))
+        return histogram.result()
+
+    codes = pack_colors(rgb, bits)
+    if dense:
+        # histograma denso: O(N), sem ordenação
+        counts_full = np.bincount(codes, minlength=n_bins)
+        present = np.flatnonzero(counts_full)
+        counts = counts_full[present]
+        lookup = np.zeros(n_bins, dtype=np.int32)
+        lookup[present] = np.arange(len(present), dtype=np.int32)
+        inverse = lookup[codes]
+    else:
+        present, inverse, counts = np.unique(codes, return_inverse=True, return_counts=True)
+        inverse = inverse.reshape(-1)
+    del codes
+
+    if bits == 8:
+        colors = unpack_colors(present)
+    else:
+        # cor média de cada bin
+        colors = np.empty((len(counts), 3), dtype=np.uint8)
+        for ch in range(3):
+            sums = np.bincount(inverse, weights=rgb[:, ch], minlength=len(counts))
+            colors[:, ch] = np.round(sums / counts).astype(np.uint8)
+
+    if return_inverse:
+        return colors, counts, inverse
+    return colors, counts
+
+class OnlineColorHistogram:
+    """
+    Histograma de cores acumulado bloco a bloco, para imagens lidas em streaming.
+    Usa um histograma denso de 2**(3*bits) bins (bits=6: 262144 bins, cerca de 8 MB),
+    com a soma de cada canal para representar cada bin pela cor média dos seus pixels
+    (com bits=8 a cor de cada bin é exata e as somas não são guardadas).
+    A memória não depende do tamanho da imagem.
+    """
+    def __init__(self, bits=6):
+        if bits < 1 or bits > 8:
+            raise ValueError("bits precisa estar entre 1 e 8.")
+        self.bits = bits
+        n_bins = 1 << (3 * bits)
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+        self.sums = None if bits == 8 else np.zeros((3, n_bins), dtype=np.float64)
+
+    def add(self, rgb):
+        """
+        Acumula os pixels (N,3) ou (H,W,3) RGB uint8.
+        """
+        rgb = np.asarray(rgb, dtype=np.uint8).reshape(-1, 3)
+        codes = pack_colors(rgb, self.bits)
+        n_bins = len(self.counts)
+        if len(codes) >= n_bins // 8:
+            # bloco grande (mesmo limite do histograma denso de color_histogram): um bincount
+            # por acumulador; cada um cria um temporário de n_bins posições, mas é bem mais
+            # rápido por pixel que o add.at
+            self.counts += np.bincount(codes, minlength=n_bins)
+            if self.sums is not None:
+                for ch in range(3):
+                    self.sums[ch] += np.bincount(codes, weights=rgb[:, ch], minlength=n_bins)
+        else:
+            # bloco pequeno perto do número de bins (bits=8 com as faixas do streaming):
+            # add.at acumula no lugar, sem zerar n_bins posições para poucos pixels
+            np.add.at(self.counts, codes, 1)
+            if self.sums is not None:
+                for ch in range(3):
+                    np.add.at(self.sums[ch], codes, rgb[:, ch])
+
+    def add_histogram(self, colors, counts):
+        """
+        Acumula um histograma já calculado (colors (M,3) uint8 e counts (M,), como o retornado
+        por result ou color_histogram): cada cor conta counts[j] pixels.
+        Usado para juntar os histogramas de várias imagens sem revisitar os pixels.
+        """
+        colors = np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+        counts = np.asarray(counts, dtype=np.int64)
+        codes = pack_colors(colors, self.bits)
+        np.add.at(self.counts, codes, counts)
+        if self.sums is not None:
+            for ch in range(3):
+                np.add.at(self.sums[ch], codes, colors[:, ch] * counts.astype(np.float64))
+
+    def result(self):
+        """
+        Retorna (colors, counts) como color_histogram: cor média (uint8) e número de pixels de cada bin não vazio.
+        """
+        present = np.flatnonzero(self.counts)
+        counts = self.counts[present]
+        if self.sums is None:
+            return unpack_colors(present), counts
+        colors = np.round(self.sums[:, present] / counts).T.astype(np.uint8)
+        return colors, counts
@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def decode_image(path):
+    """
+    Decodifica um arquivo de imagem para um array HxWx3 uint8 (RGB).
+    """
+    with Image.open(path) as img:
+        return np.asarray(img.convert("RGB"))
+
+class ImageCache:
+    """
+    Cache LRU de imagens decodificadas, compartilhado entre preview, processamento e exportação.
+    A chave é o caminho absoluto; se mtime ou tamanho do arquivo mudarem a imagem é decodificada de novo.
+    Os arrays retornados são somente leitura (não copie, apenas leia).
+    É seguro usar a partir de várias threads.
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict() # path -> (assinatura, array)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    @staticmethod
+    def _signature(path):
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _evict(self):
+        while self._entries and self._bytes > self.max_bytes:
+            _, (_, arr) = self._entries.popitem(last=False)
+            self._bytes -= arr.nbytes
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1].nbytes
+
+    def get(self, path):
+        """
+        Retorna o array HxWx3 uint8 (somente leitura) da imagem em 'path'.
+        """
+        key = os.path.abspath(path)
+        signature = self._signature(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._remove(key)
+            self.misses += 1
+
+        # decodifica fora do lock para não bloquear outras threads
+        arr = decode_image(key)
+        arr.flags.writeable = False
+
+        with self._lock:
+            if arr.nbytes <= self.max_bytes:
+                self._remove(key)
+                self._entries[key] = (signature, arr)
+                self._bytes += arr.nbytes
+                self._evict()
+        return arr
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# cache padrão do processo
+default_cache = ImageCache()
@@ -0,0 +1,202 @@
+#!/usr/bin/python3
+
+import os
+import sys
+import json
+import time
+import datetime
+import threading
+import contextlib
+import tracemalloc
+
+try:
+    import resource
+except ImportError: # Windows
+    resource = None
+
+# Etapas de um job, na ordem em que aparecem no resumo.
+STAGES = ["cache", "auto_k", "decode", "convert", "fit", "stats", "render", "save"]
+
+_log_lock = threading.Lock()
+
+
+def peak_rss_bytes():
+    """
+    Pico de memória residente do processo em bytes (None sem o módulo resource).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Instrumentation:
+    """
+    Registra tempo de relógio, tempo de CPU e memória de cada etapa de um job
+    (decode, convert, fit, stats, render, ...).
+
+    O job roda dentro de run() e cada etapa dentro de stage(nome):
+
+        inst = Instrumentation("process_image", info={"image": path})
+        with inst.run():
+            with inst.stage("decode"):
+                ...
+        print(inst.summary())
+
+    trace_memory -> True mede o pico de memória de cada etapa com o tracemalloc (mais lento);
+                    False registra o pico de memória residente do processo ao fim da etapa.
+    profile_path -> se não for None, o job roda sob o cProfile e as estatísticas
+                    são gravadas nesse arquivo (abrir com pstats ou snakeviz).
+    log_path     -> se não for None, ao fim do job uma linha JSON com o resumo é
+                    acrescentada nesse arquivo.
+    """
+    def __init__(self, name="", info=None, trace_memory=False, profile_path=None, log_path=None):
+        self.name = name
+        self.info = dict(info or {})
+        self.trace_memory = trace_memory
+        self.profile_path = profile_path
+        self.log_path = log_path
+        self.records = []  # dicionários com stage, wall, cpu (segundos) e memory (bytes ou None)
+        self.wall = 0.0
+        self.cpu = 0.0
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def run(self):
+        """
+        Envolve o job inteiro: liga o tracemalloc e o cProfile quando pedidos,
+        mede o total e, no fim, grava o perfil e a linha do log.
+        """
+        started_tracing = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+
+        profiler = None
+        if self.profile_path:
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # outro profiler já está ativo (por exemplo, em outra thread)
+                profiler = None
+
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield self
+        finally:
+            self.wall = time.perf_counter() - wall0
+            self.cpu = time.process_time() - cpu0
+            if profiler is not None:
+                profiler.disable()
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.profile_path)), exist_ok=True)
+                    profiler.dump_stats(self.profile_path)
+                except OSError:
+                    self.profile_path = None
+            if started_tracing:
+                tracemalloc.stop()
+            if self.log_path:
+                self.write_log(self.log_path)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Mede uma etapa. Etapas repetidas com o mesmo nome são somadas no resumo.
+        """
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            record = {
+                "stage": name,
+                "wall": time.perf_counter() - wall0,
+                "cpu": time.process_time() - cpu0,
+                "memory": tracemalloc.get_traced_memory()[1] if tracing else peak_rss_bytes()
+            }
+            with self._lock:
+                self.records.append(record)
+
+    def stages(self):
+        """
+        Etapas somadas por nome, na ordem de STAGES (as demais no fim):
+        lista de (nome, wall, cpu, memory).
+        """
+        totals = {}
+        with self._lock:
+            for r in self.records:
+                wall, cpu, memory = totals.get(r["stage"], (0.0, 0.0, None))
+                if r["memory"] is not None:
+                    memory = r["memory"] if memory is None else max(memory, r["memory"])
+                totals[r["stage"]] = (wall + r["wall"], cpu + r["cpu"], memory)
+        order = {name: i for i, name in enumerate(STAGES)}
+        names = sorted(totals, key=lambda name: order.get(name, len(STAGES)))
+        return [(name,) + totals[name] for name in names]
+
+    def peak_memory(self):
+        values = [memory for _, _, _, memory in self.stages() if memory is not None]
+        return max(values) if values else None
+
+    def summary(self):
+        """
+        Resumo de uma linha, por exemplo:
+        "decode 0.12 s, convert 0.30 s, fit 1.20 s, stats 0.40 s (total 2.02 s, CPU 3.10 s, peak RSS 152 MB)".
+        Sem trace_memory o pico é o do processo inteiro (ru_maxrss), não o do job: "peak RSS".
+        """
+        parts = [f"{name} {wall:.2f} s" for name, wall, _, _ in self.stages()]
+        details = [f"total {self.wall:.2f} s", f"CPU {self.cpu:.2f} s"]
+        peak = self.peak_memory()
+        if peak is not None:
+            label = "peak" if self.trace_memory else "peak RSS"
+            details.append(f"{label} {peak / 1e6:.0f} MB")
+        return ", ".join(parts) + " (" + ", ".join(details) + ")"
+
+    def to_dict(self):
+        data = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "job": self.name
+        }
+        data.update(self.info)
+        data["wall"] = self.wall
+        data["cpu"] = self.cpu
+        data["peak_memory"] = self.peak_memory()
+        data["memory_source"] = "tracemalloc" if self.trace_memory else "rss"
+        data["stages"] = [{"stage": name, "wall": wall, "cpu": cpu, "memory": memory}
+                          for name, wall, cpu, memory in self.stages()]
+        if self.profile_path:
+            data["profile"] = os.path.abspath(self.profile_path)
+        return data
+
+    def write_log(self, path):
+        """
+        Acrescenta uma linha JSON com to_dict() no arquivo path.
+        Erros de escrita são ignorados: o log não pode derrubar o job.
+        """
+        line = json.dumps(self.to_dict(), default=str)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with _log_lock, open(path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+        except OSError:
+            pass
+
+
+def profile_file_path(directory, name):
+    """
+    Caminho de um arquivo de perfil em directory, com data e hora no nome.
+    """
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+    return os.path.join(directory, f"{stamp}-{name}.prof")
+
+def stage_context(instrumentation, name):
+    """
+    instrumentation.stage(name), ou um contexto vazio quando instrumentation é None.
+    """
+    if instrumentation is None:
+        return contextlib.nullcontext()
+    return instrumentation.stage(name)
@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+
+import numpy as np
+
+# linhas processadas por vez; limita os temporários a chunk_size x K
+DEFAULT_CHUNK_SIZE = 65536
+
+# precisão dos produtos matriciais das distâncias
+KERNEL_DTYPE = np.float32
+
+
+def row_sq_norms(X):
+    """
+    ||x||^2 de cada linha de X (n,d), na precisão de X.
+    """
+    return np.einsum("ij,ij->i", X, X)
+
+def prepare_centers(centers, dtype=KERNEL_DTYPE):
+    """
+    Termos dos centróides usados em todos os blocos, calculados uma vez:
+    (centers (K,d), -2 centers^T (d,K) contíguo e ||c||^2 (K,)), na precisão dtype.
+    """
+    centers = np.ascontiguousarray(centers, dtype=dtype)
+    return centers, np.ascontiguousarray(-2.0 * centers.T, dtype=dtype), row_sq_norms(centers)
+
+def partial_sq_distances(X, neg2_ct, c_sq, out=None):
+    """
+    -2 x.c + ||c||^2 de cada linha de um bloco X (n,d) a cada centróide: a distância
+    quadrada sem o termo ||x||^2, que não muda o centróide mais próximo.
+    Um único produto matricial (BLAS, multithread) em vez de um temporário (n,K,d);
+    neg2_ct e c_sq vêm de prepare_centers. out (n,K) opcional é reutilizado entre blocos.
+    """
+    out = np.matmul(X, neg2_ct, out=out)
+    out += c_sq
+    return out
+
+def row_min(dist):
+    """
+    Menor valor de cada linha de dist (n,K).
+    Com K pequeno, np.minimum coluna a coluna é bem mais rápido que dist.min(axis=1).
+    """
+    best = dist[:, 0].copy()
+    for k in range(1, dist.shape[1]):
+        np.minimum(best, dist[:, k], out=best)
+    return best
+
+def own_sq_distances(X, centers, labels):
+    """
+    ||x - c[label]||^2 exato de cada linha (sem o cancelamento da forma expandida).
+    """
+    diff = X - np.take(centers, labels, axis=0)
+    return row_sq_norms(diff)
+
+def assign( X,
+            centers,
+            distances=True,
+            squared=True,
+            chunk_size=DEFAULT_CHUNK_SIZE,
+            dtype=KERNEL_DTYPE):
+    """
+    Centróide mais próximo de cada linha de X (N,d).
+
+    As distâncias são calculadas bloco a bloco (chunk_size linhas) como ||x||^2 - 2 x.c + ||c||^2,
+    com produtos matriciais em dtype (float32 por padrão), então a memória extra fica limitada
+    a chunk_size x K além das saídas. Os blocos em outro tipo (uint8, float64) são convertidos
+    um de cada vez.
+
+    Retorna (labels, dist): labels (N,) int32 e, com distances=True, a distância (quadrada se
+    squared=True) de cada linha ao seu centróide, calculada diretamente pela diferença;
+    senão dist é None.
+    """
+    X = np.asarray(X)
+    centers, neg2_ct, c_sq = prepare_centers(centers, dtype)
+    n = len(X)
+
+    labels = np.empty(n, dtype=np.int32)
+    dist = np.empty(n, dtype=dtype) if distances else None
+    buffer = np.empty((min(chunk_size, n), len(centers)), dtype=dtype)
+
+    for start in range(0, n, chunk_size):
+        stop = min(start + chunk_size, n)
+        block = X[start:stop].astype(dtype, copy=False)
+        partial = partial_sq_distances(block, neg2_ct, c_sq, out=buffer[:stop - start])
+        lab = partial.argmin(axis=1)
+        labels[start:stop] = lab
+        if distances:
+            dist[start:stop] = own_sq_distances(block, centers, lab)
+
+    if distances and not squared:
+        np.sqrt(dist, out=dist)
+    return labels, dist
+
+def min_sq_distances(X, centers, chunk_size=DEFAULT_CHUNK_SIZE, dtype=KERNEL_DTYPE):
+    """
+    Menor distância quadrada de cada linha de X a um dos centróides (ver assign).
+    """
+    return assign(X, centers, chunk_size=chunk_size, dtype=dtype)[1]
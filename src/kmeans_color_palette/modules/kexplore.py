@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+
+import threading
+
+import numpy as np
+
+from kmeans_color_palette.modules.pipeline import (
+    ProcessCanceled,
+    DEFAULT_SAMPLING_METHOD,
+    DEFAULT_MAX_PIXELS,
+    DEFAULT_AGGREGATE,
+    DEFAULT_HISTOGRAM_BITS,
+    prepare_data,
+    prepare_fit_data,
+    compute_result,
+    palette_from_result
+)
+from kmeans_color_palette.modules.clustering import DEFAULT_BACKEND, create_backend, split_centers
+from kmeans_color_palette.modules.kernels import assign
+from kmeans_color_palette.modules.progress import Progress
+
+
+class KExplorer:
+    """
+    Exploração incremental de K para uma imagem.
+
+    Os dados preparados (conversão de cor, agregação, amostragem) são calculados
+    uma única vez e mantidos em memória junto com os ajustes já feitos.
+    O ajuste de K parte do ajuste de K-1 (o cluster de maior distorção é dividido,
+    ver clustering.split_centers), então percorrer 3, 4, 5, 6... custa uma preparação
+    e alguns refinamentos curtos em vez de um K-means completo por valor.
+    O menor K pedido sem ajuste anterior usa a inicialização normal do motor.
+
+    img é o array HxWx3 uint8 (RGB) da imagem; os demais parâmetros são os de
+    engine.extract_palette.
+    """
+    def __init__(   self,
+                    img,
+                    analysis_type="rgb",
+                    sampling_method=DEFAULT_SAMPLING_METHOD,
+                    max_pixels=DEFAULT_MAX_PIXELS,
+                    aggregate=DEFAULT_AGGREGATE,
+                    histogram_bits=DEFAULT_HISTOGRAM_BITS,
+                    backend=DEFAULT_BACKEND,
+                    backend_options=None,
+                    random_state=42):
+        self.img = img
+        self.analysis_type = analysis_type
+        self.sampling_method = sampling_method
+        self.max_pixels = max_pixels
+        self.aggregate = aggregate
+        self.histogram_bits = histogram_bits
+        self.backend = backend
+        self.backend_options = backend_options or {}
+        self.random_state = random_state
+
+        self.data_np = None
+        self.fits = {}    # K -> (centróides, rótulos de fit_np)
+        self.results = {} # K -> arrays de pipeline.compute_result
+        self._lock = threading.Lock()
+
+    def prepare(self):
+        """
+        Prepara os dados (só na primeira chamada).
+        """
+        if self.data_np is not None:
+            return
+        self.data_np, self.weights = prepare_data(self.img, self.analysis_type, self.aggregate, self.histogram_bits)
+        self.fit_np, self.fit_weights = prepare_fit_data(self.img, self.data_np, self.weights, self.analysis_type,
+                                                         self.sampling_method, self.max_pixels,
+                                                         self.aggregate, self.histogram_bits)
+
+    def _warm_start(self, k):
+        """
+        Centróides iniciais para K a partir do maior ajuste anterior com menos de K clusters,
+        dividindo clusters até chegar em K; None se não houver ajuste anterior.
+        """
+        previous = [j for j in self.fits if j < k]
+        if not previous:
+            return None
+
+        j = max(previous)
+        centers, labels = self.fits[j]
+        centers = split_centers(self.fit_np, centers, labels, self.fit_weights)
+        # com mais de um passo de distância, rotula de novo após cada divisão
+        while len(centers) < k:
+            labels, _ = assign(self.fit_np, centers, distances=False)
+            centers = split_centers(self.fit_np, centers, labels, self.fit_weights)
+        return centers
+
+    def fit(self, k):
+        """
+        Ajusta K clusters (se ainda não ajustado) e retorna os arrays do resultado.
+        Com menos linhas de dados que K (poucas cores únicas) o resultado é o do maior
+        K possível, com menos cores.
+        """
+        # K já ajustado: leitura sem o lock, para a GUI não esperar um ajuste em andamento
+        # em outra thread (cada resultado é gravado uma vez e não muda depois)
+        result = self.results.get(k)
+        if result is not None:
+            return result
+
+        with self._lock:
+            if k in self.results:
+                return self.results[k]
+
+            self.prepare()
+            k_fit = min(k, len(self.fit_np))
+            for j in self.results:
+                if min(j, len(self.fit_np)) == k_fit:
+                    self.results[k] = self.results[j]
+                    return self.results[k]
+
+            init = self._warm_start(k_fit)
+            kmeans = create_backend(self.backend, k_fit, random_state=self.random_state, **self.backend_options)
+            kmeans.fit(self.fit_np, sample_weight=self.fit_weights, init=init)
+
+            fit_labels = kmeans.labels_
+            if self.fit_np is self.data_np:
+                labels = fit_labels
+            else:
+                labels = kmeans.predict(self.data_np)
+
+            self.fits[k_fit] = (np.asarray(kmeans.cluster_centers_, dtype=np.float64), fit_labels)
+            self.results[k] = compute_result(self.data_np, self.weights, labels, kmeans.cluster_centers_, self.analysis_type)
+            return self.results[k]
+
+    def fit_range(self, k_values, progress=None, is_canceled=None):
+        """
+        Ajusta todos os K de k_values em ordem crescente, cada um partindo do anterior.
+        progress (modules.progress.Progress) avança na preparação dos dados e a cada K;
+        is_canceled() é consultado antes de cada K, como em engine.extract_palette.
+        Retorna a lista [(K, inertia), ...] (ver inertia_curve).
+        """
+        k_values = sorted(set(int(k) for k in k_values))
+        if progress is None:
+            progress = Progress()
+
+        # a preparação dos dados pesa como um ajuste
+        job = progress.stage("", 1.0, total_weight=len(k_values) + 1)
+        with self._lock, job.stage("prepare"):
+            self.prepare()
+
+        for k in k_values:
+            if is_canceled is not None and is_canceled():
+                raise ProcessCanceled()
+            with job.stage(f"K={k}"):
+                self.fit(k)
+
+        return self.inertia_curve()
+
+    def palette(self, k):
+        """
+        Paleta de K cores (ajusta se preciso), no mesmo formato de engine.extract_palette.
+        Com has(k) não bloqueia; senão o ajuste roda na thread que chamou (na GUI,
+        os K ainda não ajustados vão para um ExploreKWorker).
+        """
+        return palette_from_result(self.fit(k))
+
+    def has(self, k):
+        return k in self.results
+
+    def inertia_curve(self):
+        """
+        Lista [(K, inertia), ...] dos K já ajustados, para escolher K pelo cotovelo.
+        A inércia é a soma ponderada das distâncias quadradas em todos os pixels.
+        """
+        return [(k, float(self.results[k]["inertia"])) for k in sorted(self.results)]
@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+
+import numpy as np
+
+# Etapas informadas ao memory_callback de engine.extract_palette, na ordem:
+#   image  -> imagem decodificada (HxWx3 uint8);
+#   data   -> matriz de dados no espaço da análise (cores únicas com aggregate) e pesos;
+#   fit    -> amostra usada no ajuste do K-means (vazia se for a própria matriz de dados);
+#   labels -> rótulo de cada linha da matriz de dados.
+MEMORY_STAGES = ["image", "data", "fit", "labels"]
+
+
+def array_bytes(*arrays):
+    """
+    Bytes ocupados pelos arrays, contando uma única vez cada buffer
+    (views do mesmo array e entradas None não somam).
+    """
+    seen = set()
+    total = 0
+    for arr in arrays:
+        if arr is None:
+            continue
+        arr = np.asarray(arr)
+        base = arr
+        while isinstance(base.base, np.ndarray):
+            base = base.base
+        if id(base) in seen:
+            continue
+        seen.add(id(base))
+        total += base.nbytes
+    return total
+
+
+class MemoryReport:
+    """
+    Hook de instrumentação para engine.extract_palette(memory_callback=...).
+    Guarda, para cada etapa, os bytes dos arrays do pipeline vivos ao fim dela
+    e o número de pixels da imagem, para relatar o custo por megapixel.
+    """
+    def __init__(self):
+        self.n_pixels = 0
+        self.stages = {}
+
+    def __call__(self, stage, nbytes, n_pixels):
+        self.stages[stage] = nbytes
+        self.n_pixels = n_pixels
+
+    @property
+    def peak(self):
+        return max(self.stages.values(), default=0)
+
+    def bytes_per_megapixel(self):
+        """
+        Dicionário etapa -> bytes por megapixel, mais "peak".
+        """
+        if self.n_pixels <= 0:
+            return {}
+        scale = 1e6 / self.n_pixels
+        report = {stage: nbytes * scale for stage, nbytes in self.stages.items()}
+        report["peak"] = self.peak * scale
+        return report
+
+    def summary(self):
+        """
+        Texto de uma linha com o pico e o custo por megapixel de cada etapa, em MB.
+        """
+        per_mp = self.bytes_per_megapixel()
+        parts = [f"{stage} {per_mp[stage] / 1e6:.1f}" for stage in MEMORY_STAGES if stage in per_mp]
+        return f"peak {self.peak / 1e6:.1f} MB ({per_mp.get('peak', 0) / 1e6:.1f} MB/MP; " + ", ".join(parts) + ")"
@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+
+import numpy as np
+
+from kmeans_color_palette.modules.color import rgb_to_hex
+from kmeans_color_palette.modules.sampling import sample_indices, downscale_image
+from kmeans_color_palette.modules.histogram import color_histogram
+from kmeans_color_palette.modules.colorspace import COLOR_SPACES
+from kmeans_color_palette.modules.clustering import create_backend, DEFAULT_BACKEND
+from kmeans_color_palette.modules.stats import cluster_statistics
+
+DEFAULT_SAMPLING_METHOD = "random"
+DEFAULT_MAX_PIXELS = 200000
+DEFAULT_AGGREGATE = True
+DEFAULT_HISTOGRAM_BITS = 8
+
+# linhas convertidas entre duas atualizações de progresso em convert_image
+PROGRESS_BLOCK = 1 << 20
+
+
+class ProcessCanceled(Exception):
+    """Levantada quando o processamento é cancelado pelo usuário."""
+    pass
+
+
+def centroids_to_rgb(centroids, analysis_type):
+    """
+    Converte todos os centróides (Kx3) para RGB de uma vez.
+    Retorna uma lista de tuplas (r,g,b) com inteiros.
+    """
+    centroids = np.asarray(centroids)
+
+    if analysis_type in COLOR_SPACES:
+        rgb_centroids = COLOR_SPACES[analysis_type][1](centroids)
+    else:
+        rgb_centroids = centroids  # rgb e fallback
+
+    return [tuple(map(int, c)) for c in rgb_centroids]
+
+def create_color_data(rgb_centroid, w, d, score, extra=None):
+    """
+    Monta o dicionário de dados de cor a partir de um centróide já em RGB.
+    extra pode trazer métricas adicionais do cluster (variance, max_d, silhouette).
+    """
+    data = {
+        "centroid": rgb_centroid,
+        "hex": rgb_to_hex(rgb_centroid),
+        "w": w,
+        "d": d,
+        "score": score
+    }
+    if extra:
+        data.update(extra)
+    return data
+
+def convert_image(img, analysis_type="rgb", dtype=np.float32, out=None, progress=None):
+    """
+    Converte uma imagem PIL ou numpy array (HxWx3 ou Nx3) para o espaço de cor desejado.
+    Retorna uma matriz Nx3 do tipo dtype para clustering.
+    A conversão é feita em blocos (ver modules.colorspace), direto no array de saída:
+    a única alocação do tamanho da imagem é a matriz retornada (12 bytes por pixel em
+    float32), que pode ser um buffer já alocado passado em out.
+    O float32 é mantido pelos motores de agrupamento, que não voltam a copiar os dados.
+    Com um progress (modules.progress.Progress) ativo a conversão avança em blocos de
+    PROGRESS_BLOCK linhas, relatando cada bloco.
+    """
+    rgb = np.asarray(img).reshape(-1, 3)
+
+    if progress is not None and progress.enabled and len(rgb) > PROGRESS_BLOCK:
+        if out is None:
+            out = np.empty(rgb.shape, dtype=dtype)
+        for start in range(0, len(rgb), PROGRESS_BLOCK):
+            stop = min(start + PROGRESS_BLOCK, len(rgb))
+            convert_image(rgb[start:stop], analysis_type, dtype, out[start:stop])
+            progress.update(stop, len(rgb))
+        return out
+
+    if analysis_type == "rgb":
+        if out is None:
+            return rgb.astype(dtype)
+        out[...] = rgb
+        return out
+
+    elif analysis_type in COLOR_SPACES:
+        return COLOR_SPACES[analysis_type][0](rgb, dtype=dtype, out=out)
+
+    else:
+        raise ValueError(f"Espaço de cor '{analysis_type}' não suportado.")
+
+def prepare_data(img, analysis_type="rgb", aggregate=DEFAULT_AGGREGATE, histogram_bits=DEFAULT_HISTOGRAM_BITS, progress=None):
+    """
+    Monta a matriz Nx3 de dados no espaço analysis_type e os pesos de cada linha.
+    Com aggregate=True os pixels repetidos são agrupados em bins de cor
+    (ver color_histogram) e cada linha passa a ter como peso o número de pixels
+    do bin; a conversão de cor é feita apenas nas cores únicas.
+    Retorna (data_np, weights), com weights=None quando não há agregação.
+    progress (modules.progress.Progress) acompanha o histograma e a conversão.
+    """
+    if not aggregate:
+        return convert_image(img, analysis_type=analysis_type, progress=progress), None
+
+    rgb = np.asarray(img, dtype=np.uint8).reshape(-1, 3)
+    # o histograma percorre todos os pixels; a conversão só as cores únicas
+    colors, counts = color_histogram(rgb, bits=histogram_bits,
+                                     progress=progress.stage("histogram", 0.8) if progress is not None else None)
+    data_np = convert_image(colors, analysis_type=analysis_type,
+                            progress=progress.stage("convert", 0.2) if progress is not None else None)
+    return data_np, counts
+
+def prepare_fit_data(img, data_np, weights=None, analysis_type="rgb", sampling_method=DEFAULT_SAMPLING_METHOD, max_pixels=DEFAULT_MAX_PIXELS, aggregate=DEFAULT_AGGREGATE, histogram_bits=DEFAULT_HISTOGRAM_BITS):
+    """
+    Seleciona os dados usados para ajustar o K-means.
+    img é a imagem PIL em RGB; data_np e weights são a saída de prepare_data.
+    Com "downscale" a imagem é reduzida antes de preparar os dados; com "random"
+    ou "stratified" no máximo max_pixels linhas de data_np são amostradas
+    (mantendo os respectivos pesos).
+    Retorna (fit_np, fit_weights).
+    """
+    if sampling_method in (None, "none"):
+        return data_np, weights
+
+    if sampling_method == "downscale":
+        small = downscale_image(img, max_pixels)
+        if small is img:
+            return data_np, weights
+        return prepare_data(small, analysis_type, aggregate, histogram_bits)
+
+    idx = sample_indices(len(data_np), max_pixels, method=sampling_method)
+    if idx is None:
+        return data_np, weights
+    return data_np[idx], (weights[idx] if weights is not None else None)
+
+def fit_kmeans(data_np, fit_np, K, sample_weight=None, random_state=42, backend=DEFAULT_BACKEND, backend_options=None, init=None):
+    """
+    Ajusta o K-means em fit_np e rotula todas as linhas de data_np.
+    Quando fit_np é uma amostra, os rótulos vêm de um predict (centróide mais próximo).
+    backend escolhe o motor de agrupamento e backend_options seus parâmetros
+    (ver modules.clustering.create_backend).
+    init são centróides iniciais opcionais (Kx3), para partir de um ajuste anterior.
+    Retorna (labels, centroids).
+    """
+    kmeans = create_backend(backend, K, random_state=random_state, **(backend_options or {}))
+    kmeans.fit(fit_np, sample_weight=sample_weight, init=init)
+    if fit_np is data_np:
+        labels = kmeans.labels_
+    else:
+        labels = kmeans.predict(data_np)
+    return labels, kmeans.cluster_centers_
+
+def compute_result(data_np, weights, labels, centroids, analysis_type, progress=None):
+    """
+    Calcula os arrays do resultado de um ajuste: centroids (espaço da análise),
+    rgb_centroids, counts (pixels por cluster), w, d, score, variance, max_d e silhouette.
+    Cada linha de data_np representa weights[j] pixels (1 sem agregação).
+    É o mesmo dicionário guardado no cache de resultados.
+    progress (modules.progress.Progress) avança com o cálculo das estatísticas.
+    """
+    stats = cluster_statistics(data_np, labels, centroids, weights, progress=progress)
+    return result_from_stats(stats, centroids, analysis_type)
+
+def result_from_stats(stats, centroids, analysis_type):
+    """
+    Monta o dicionário de compute_result a partir das estatísticas
+    (modules.stats.cluster_statistics ou ClusterStatsAccumulator.result) e dos centróides.
+    """
+    result = {key: stats[key] for key in ("w", "d", "score", "variance", "max_d", "silhouette")}
+    result["centroids"] = np.asarray(centroids)
+    result["rgb_centroids"] = np.asarray(centroids_to_rgb(centroids, analysis_type), dtype=np.uint8)
+    result["counts"] = np.round(stats["counts"]).astype(np.int64)
+    result["inertia"] = np.float64(stats["inertia"])
+    return result
+
+def palette_from_result(result):
+    """
+    Monta a lista de cores (ordenada por w) a partir dos arrays de compute_result.
+    """
+    palette = []
+    for i in range(len(result["w"])):
+        extra = {key: float(result[key][i]) for key in ("variance", "max_d", "silhouette")}
+        extra["pixels"] = int(result["counts"][i])
+        rgb_centroid = tuple(int(v) for v in result["rgb_centroids"][i])
+        palette.append(
+            create_color_data(rgb_centroid, float(result["w"][i]), float(result["d"][i]), float(result["score"][i]), extra)
+        )
+    palette.sort(key=lambda c: c["w"], reverse=True)
+    return palette
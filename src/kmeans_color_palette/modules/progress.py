@@ -0,0 +1,197 @@
+#!/usr/bin/python3
+
+import sys
+import time
+import threading
+
+DEFAULT_RATE = 30.0       # no máximo 30 atualizações por segundo no destino
+DEFAULT_MAXIMUM = 1000    # resolução dos destinos inteiros (QProgressBar, progress_callback)
+
+
+class _ProgressState:
+    """
+    Estado compartilhado por um progresso e todas as suas subetapas:
+    destino, fração já relatada e hora da última atualização.
+    """
+    def __init__(self, sink, rate):
+        self.sink = sink
+        self.min_interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.fraction = 0.0
+        self.last_time = None
+        self.last_fraction = None
+        self.last_label = None
+
+    def report(self, fraction, label):
+        now = time.monotonic()
+        with self.lock:
+            # o progresso nunca volta, mesmo com threads relatando fora de ordem
+            if fraction < self.fraction:
+                fraction = self.fraction
+            self.fraction = fraction
+            if self.last_fraction is not None:
+                if self.last_fraction >= 1.0:
+                    return
+                # o fim do job e a troca de etapa são sempre relatados; o resto respeita o intervalo
+                if fraction < 1.0 and label == self.last_label and (
+                        fraction == self.last_fraction or now - self.last_time < self.min_interval):
+                    return
+            self.last_time = now
+            self.last_fraction = fraction
+            self.last_label = label
+            self.sink(fraction, label)
+
+
+class Progress:
+    """
+    Progresso de um job, com subetapas aninhadas e pesos, relatado a um destino (sink).
+
+    sink(fraction, label) recebe a fração concluída do job (0 a 1) e o nome da etapa.
+    As chamadas ao destino são limitadas a rate por segundo (a chegada a 1.0 e a troca
+    de etapa sempre são relatadas) e são seguras entre threads. Sem destino tudo é ignorado a custo quase zero.
+
+    Cada progresso ocupa um intervalo da barra do job; stage(label, weight) cria uma
+    subetapa que ocupa weight/total_weight desse intervalo, logo após a subetapa anterior:
+
+        progress = Progress(console_sink())
+        with progress.stage("convert", 0.2) as p:
+            for i in range(n):
+                ...
+                p.update(i + 1, n)
+        with progress.stage("fit", 0.8):
+            ...
+    """
+    def __init__(self, sink=None, rate=DEFAULT_RATE, total_weight=1.0, label="",
+                 _state=None, _start=0.0, _span=1.0):
+        self._state = _state if _state is not None else _ProgressState(sink, rate)
+        self._start = _start
+        self._span = _span
+        self.total_weight = total_weight
+        self.label = label
+        self._cursor = 0.0 # peso já ocupado pelas subetapas
+        self._done = 0
+        self._total = None
+
+    @property
+    def enabled(self):
+        """False quando não há destino: quem relata pode pular cálculos de progresso."""
+        return self._state.sink is not None
+
+    def stage(self, label, weight=1.0, total_weight=1.0):
+        """
+        Cria a próxima subetapa, com weight/self.total_weight deste intervalo.
+        total_weight é a soma dos pesos das subetapas da nova etapa.
+        Pode ser usada como context manager: ao sair sem erro a etapa é concluída.
+        """
+        with self._state.lock:
+            start = self._start + self._span * min(self._cursor, self.total_weight) / self.total_weight
+            self._cursor += weight
+            end = self._start + self._span * min(self._cursor, self.total_weight) / self.total_weight
+        return Progress(total_weight=total_weight, label=label or self.label,
+                        _state=self._state, _start=start, _span=end - start)
+
+    def update(self, done, total=None):
+        """
+        Informa que done de total unidades desta etapa estão prontas.
+        """
+        if self._state.sink is None:
+            return
+        if total is not None:
+            self._total = total
+        fraction = min(1.0, done / self._total) if self._total else 0.0
+        self._state.report(self._start + self._span * fraction, self.label)
+
+    def advance(self, n=1, total=None):
+        """
+        Soma n unidades prontas (seguro entre threads, por exemplo um ajuste por thread).
+        """
+        if self._state.sink is None:
+            return
+        with self._state.lock:
+            self._done += n
+            done = self._done
+        self.update(done, total)
+
+    def finish(self):
+        """
+        Marca esta etapa como concluída.
+        """
+        if self._state.sink is None:
+            return
+        self._state.report(self._start + self._span, self.label)
+
+    def __enter__(self):
+        if self._state.sink is not None:
+            self._state.report(self._start, self.label)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.finish()
+        return False
+
+
+def as_progress(progress=None, progress_callback=None):
+    """
+    Progress a usar em uma função da API: o progress recebido, um adaptador para o
+    antigo progress_callback(value, maximum), ou um progresso sem destino.
+    """
+    if progress is not None:
+        return progress
+    if progress_callback is not None:
+        return Progress(callback_sink(progress_callback))
+    return Progress()
+
+
+################################################################################
+# Destinos
+################################################################################
+
+def callback_sink(callback, maximum=DEFAULT_MAXIMUM):
+    """
+    Destino que chama callback(value, maximum) com value inteiro entre 0 e maximum
+    (o formato de progress_callback e de QProgressBar.setValue/setMaximum).
+    """
+    def sink(fraction, label):
+        callback(int(round(fraction * maximum)), maximum)
+    return sink
+
+class ConsoleSink:
+    """
+    Barra de progresso de uma linha no terminal (stderr).
+    """
+    def __init__(self, stream=None, width=30):
+        self.stream = stream if stream is not None else sys.stderr
+        self.width = width
+
+    def __call__(self, fraction, label):
+        filled = int(round(fraction * self.width))
+        bar = "#" * filled + "." * (self.width - filled)
+        end = "\n" if fraction >= 1.0 else ""
+        self.stream.write(f"\r[{bar}] {100.0 * fraction:5.1f}% {label:<12}{end}")
+        self.stream.flush()
+
+class TqdmSink:
+    """
+    Destino que atualiza uma barra do tqdm (precisa do pacote tqdm).
+    """
+    def __init__(self, maximum=DEFAULT_MAXIMUM, **tqdm_options):
+        from tqdm import tqdm
+        self.maximum = maximum
+        self.bar = tqdm(total=maximum, **tqdm_options)
+
+    def __call__(self, fraction, label):
+        value = int(round(fraction * self.maximum))
+        self.bar.set_description(label, refresh=False)
+        self.bar.update(value - self.bar.n)
+        if fraction >= 1.0:
+            self.bar.close()
+
+def console_sink(**options):
+    """
+    TqdmSink se o tqdm estiver instalado, senão ConsoleSink.
+    """
+    try:
+        return TqdmSink(**options)
+    except ImportError:
+        return ConsoleSink(**options)
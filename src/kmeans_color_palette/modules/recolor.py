@@ -0,0 +1,128 @@
+#!/usr/bin/python3
+
+import numpy as np
+
+from kmeans_color_palette.modules.pipeline import convert_image
+from kmeans_color_palette.modules.histogram import color_histogram
+from kmeans_color_palette.modules.kernels import assign, prepare_centers, partial_sq_distances
+
+# pesos da difusão de erro de Floyd–Steinberg: (dy, dx, peso)
+FLOYD_STEINBERG = ((0, 1, 7 / 16), (1, -1, 3 / 16), (1, 0, 5 / 16), (1, 1, 1 / 16))
+
+
+def as_palette_array(colors):
+    """
+    Cores da paleta como array (M,3) uint8; aceita tuplas (r,g,b) ou entradas com "centroid".
+    """
+    colors = [c["centroid"] if isinstance(c, dict) else c for c in colors]
+    return np.asarray(colors, dtype=np.uint8).reshape(-1, 3)
+
+def floyd_steinberg(rgb, palette_rgb):
+    """
+    Pontilhado de Floyd–Steinberg: cada pixel recebe a cor mais próxima (em RGB) de
+    palette_rgb (M,3) e o erro é espalhado para os vizinhos ainda não processados.
+
+    O pixel (y,x) só depende de (y,x-1) e de (y-1,x-1..x+1), então todos os pixels com o
+    mesmo x + 2y são independentes: a imagem é percorrida nessas diagonais, cada uma
+    processada de uma vez com numpy (W + 2H passos em vez de W*H). O resultado é o mesmo
+    da varredura linha a linha.
+
+    Retorna (H,W) int32 com o índice da cor de cada pixel.
+    """
+    rgb = np.asarray(rgb)
+    h, w = rgb.shape[:2]
+    # uma coluna de margem de cada lado e uma linha embaixo: o erro cai fora da imagem sem testes
+    work = np.zeros((h + 1, w + 2, 3), dtype=np.float32)
+    work[:h, 1:w + 1] = rgb
+    labels = np.empty((h, w), dtype=np.int32)
+
+    palette = palette_rgb.astype(np.float32)
+    centers, neg2_ct, c_sq = prepare_centers(palette)
+
+    for t in range(w + 2 * (h - 1)):
+        y0 = max(0, (t - w + 2) // 2)
+        y1 = min(h - 1, t // 2)
+        ys = np.arange(y0, y1 + 1)
+        xs = t - 2 * ys + 1 # coluna em work
+
+        value = work[ys, xs]
+        np.clip(value, 0, 255, out=value)
+        lab = partial_sq_distances(value, neg2_ct, c_sq).argmin(axis=1)
+        labels[ys, xs - 1] = lab
+        error = value - np.take(palette, lab, axis=0)
+        for dy, dx, weight in FLOYD_STEINBERG:
+            work[ys + dy, xs + dx] += error * weight
+
+    return labels
+
+
+class Recolorer:
+    """
+    Re-renderiza uma imagem com as cores de uma paleta (imagem quantizada / posterizada).
+
+    As cores únicas da imagem e o índice de cada pixel nelas (color_histogram com bits=8)
+    são calculados uma vez, assim como a conversão das cores únicas para analysis_type.
+    Cada render só rotula as cores únicas pela cor mais próxima da paleta (kernels.assign)
+    e aplica aos pixels uma tabela de cores (LUT), sem passar de novo por todos os pixels
+    no espaço da análise; isso permite atualizar o preview a cada cor marcada.
+
+    fit é opcional: (data_np, labels, rgb_centroids) do ajuste da mesma imagem com cores
+    agregadas (ver engine.extract_palette, labels_callback). Quando a paleta pedida é a do
+    ajuste, os rótulos dele são usados diretamente; data_np evita a conversão das cores.
+    """
+    def __init__(self, image, analysis_type="rgb", fit=None):
+        rgb = np.asarray(image, dtype=np.uint8)
+        self.rgb = rgb
+        self.shape = rgb.shape[:2]
+        self.analysis_type = analysis_type
+
+        self.colors, _, self.inverse = color_histogram(rgb.reshape(-1, 3), bits=8, return_inverse=True)
+
+        self.fit_labels = None
+        self.fit_colors = None
+        if fit is not None and len(fit[0]) == len(self.colors):
+            # mesmas cores únicas, na mesma ordem: os dados e rótulos do ajuste valem aqui
+            data_np, labels, rgb_centroids = fit
+            self.data_np = data_np
+            self.fit_labels = np.asarray(labels)
+            self.fit_colors = as_palette_array(rgb_centroids)
+        else:
+            self.data_np = convert_image(self.colors, analysis_type)
+
+    def color_labels(self, palette_rgb):
+        """
+        Índice em palette_rgb (M,3) da cor mais próxima de cada cor única da imagem,
+        no espaço analysis_type. Reaproveita os rótulos do ajuste quando possível.
+        """
+        if self.fit_labels is not None and len(palette_rgb) == len(self.fit_colors):
+            order = {tuple(c): i for i, c in enumerate(palette_rgb.tolist())}
+            mapping = [order.get(tuple(c)) for c in self.fit_colors.tolist()]
+            if None not in mapping:
+                return np.asarray(mapping, dtype=np.int32)[self.fit_labels]
+
+        centroids = convert_image(palette_rgb, self.analysis_type)
+        return assign(self.data_np, centroids, distances=False)[0]
+
+    def labels(self, colors, dither=False):
+        """
+        (H,W) int32 com o índice da cor de colors de cada pixel.
+        Com dither=True usa Floyd–Steinberg em RGB (ver floyd_steinberg).
+        """
+        palette_rgb = as_palette_array(colors)
+        if dither:
+            return floyd_steinberg(self.rgb, palette_rgb)
+        return np.take(self.color_labels(palette_rgb), self.inverse).reshape(self.shape)
+
+    def render(self, colors, dither=False):
+        """
+        Imagem (H,W,3) uint8 com cada pixel trocado pela sua cor de colors
+        (tuplas (r,g,b) ou entradas de paleta; por exemplo só as cores marcadas).
+        """
+        palette_rgb = as_palette_array(colors)
+        if len(palette_rgb) == 0:
+            raise ValueError("A paleta precisa ter pelo menos uma cor.")
+        if dither:
+            return np.take(palette_rgb, floyd_steinberg(self.rgb, palette_rgb), axis=0)
+        # LUT cor única -> cor da paleta, aplicada aos pixels
+        lut = np.take(palette_rgb, self.color_labels(palette_rgb), axis=0)
+        return np.take(lut, self.inverse, axis=0).reshape(self.shape + (3,))
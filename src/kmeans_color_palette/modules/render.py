@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from kmeans_color_palette.modules.color import rgb_to_hex
+
+DEFAULT_BAR_HEIGHT = 50
+DEFAULT_SWATCH_WIDTH = 100
+DEFAULT_TIMELINE_HEIGHT = 120   # altura da faixa de quadros da linha do tempo
+DEFAULT_COLUMN_WIDTH = 4        # largura de cada quadro na linha do tempo
+
+
+def text_color_for(rgb):
+    """
+    Preto ou branco, o que tiver mais contraste com a cor de fundo.
+    """
+    r, g, b = rgb
+    luminance = 0.299 * r + 0.587 * g + 0.114 * b
+    return (0, 0, 0) if luminance > 140 else (255, 255, 255)
+
+def draw_swatches(canvas, colors, top, height):
+    """
+    Pinta as faixas de cor no canvas (array HxWx3) a partir da linha 'top',
+    dividindo a largura igualmente entre as cores. Usa fatias do numpy.
+    Retorna a lista de (x0, x1) de cada faixa.
+    """
+    w = canvas.shape[1]
+    step = w / len(colors)
+    bounds = []
+    for i, c in enumerate(colors):
+        x0 = int(i * step)
+        x1 = int((i + 1) * step)
+        canvas[top:top + height, x0:x1] = c
+        bounds.append((x0, x1))
+    return bounds
+
+def draw_labels(img, colors, bounds, top, height):
+    """
+    Escreve o código hexadecimal de cada cor centralizado na sua faixa.
+    """
+    draw = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+    for c, (x0, x1) in zip(colors, bounds):
+        text = rgb_to_hex(c)
+        left, upper, right, lower = draw.textbbox((0, 0), text, font=font)
+        tw, th = right - left, lower - upper
+        if tw > x1 - x0 or th > height:
+            continue # faixa pequena demais para o texto
+        x = x0 + (x1 - x0 - tw) // 2 - left
+        y = top + (height - th) // 2 - upper
+        draw.text((x, y), text, fill=text_color_for(c), font=font)
+
+def render_palette_image(img, colors, bar_height=DEFAULT_BAR_HEIGHT, labels=False, swatch_only=False, swatch_width=DEFAULT_SWATCH_WIDTH):
+    """
+    Monta a imagem da paleta.
+
+    img          -> PIL.Image RGB (pode ser None se swatch_only=True).
+    colors       -> lista de tuplas (r,g,b).
+    bar_height   -> altura da barra de cores em pixels.
+    labels       -> escreve o código hexadecimal em cada faixa.
+    swatch_only  -> gera apenas a barra, sem a imagem; cada cor ocupa swatch_width pixels.
+
+    Retorna uma PIL.Image.
+    """
+    colors = [tuple(int(v) for v in c) for c in colors]
+
+    if swatch_only:
+        canvas = np.full((bar_height, swatch_width * len(colors), 3), 255, dtype=np.uint8)
+        top = 0
+    else:
+        img_np = np.asarray(img, dtype=np.uint8)
+        h, w = img_np.shape[:2]
+        canvas = np.full((h + bar_height, w, 3), 255, dtype=np.uint8)
+        canvas[:h] = img_np
+        top = h
+
+    bounds = draw_swatches(canvas, colors, top, bar_height)
+
+    new_img = Image.fromarray(canvas, "RGB")
+    if labels:
+        draw_labels(new_img, colors, bounds, top, bar_height)
+    return new_img
+
+def draw_stacked_column(canvas, palette, x0, x1, top, height):
+    """
+    Pinta uma coluna (x0:x1) com as cores da paleta empilhadas de cima para baixo,
+    cada uma com altura proporcional ao seu w.
+    """
+    total = sum(c["w"] for c in palette) or 1.0
+    y = float(top)
+    for c in sorted(palette, key=lambda c: c["w"], reverse=True):
+        y1 = y + height * c["w"] / total
+        canvas[int(round(y)):int(round(y1)), x0:x1] = c["centroid"]
+        y = y1
+    canvas[int(round(y)):top + height, x0:x1] = palette[0]["centroid"] if palette else 255
+
+def render_timeline_image(frames, scenes, height=DEFAULT_TIMELINE_HEIGHT, column_width=DEFAULT_COLUMN_WIDTH,
+                          scene_height=None):
+    """
+    Monta a linha do tempo das paletas de um vídeo (ver modules.video.video_palettes).
+
+    Faixa de cima: uma coluna de column_width pixels por quadro amostrado, com as cores
+    da paleta do quadro empilhadas em proporção a w.
+    Faixa de baixo (scene_height pixels, padrão height/2): a paleta de cada cena,
+    ocupando a largura dos seus quadros, com uma linha preta no início de cada cena.
+
+    Retorna uma PIL.Image.
+    """
+    if scene_height is None:
+        scene_height = height // 2
+    width = max(1, column_width * len(frames))
+    canvas = np.full((height + scene_height, width, 3), 255, dtype=np.uint8)
+
+    for i, frame in enumerate(frames):
+        draw_stacked_column(canvas, frame["palette"], i * column_width, (i + 1) * column_width, 0, height)
+
+    for scene in scenes:
+        columns = [i for i, frame in enumerate(frames) if frame["scene"] == scene["scene"]]
+        if not columns:
+            continue
+        x0, x1 = columns[0] * column_width, (columns[-1] + 1) * column_width
+        colors = [c["centroid"] for c in sorted(scene["palette"], key=lambda c: c["w"], reverse=True)]
+        if scene_height > 0 and colors:
+            draw_swatches(canvas[:, x0:x1], colors, height, scene_height)
+        if x0 > 0:
+            canvas[:, x0] = 0
+
+    return Image.fromarray(canvas, "RGB")
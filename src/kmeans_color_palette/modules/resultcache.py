@@ -0,0 +1,192 @@
+#!/usr/bin/python3
+
+import os
+import json
+import zlib
+import hashlib
+import zipfile
+import tempfile
+import threading
+
+import numpy as np
+
+import kmeans_color_palette.about as about
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"),".cache",about.__package__)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# muda quando o conteúdo ou a semântica dos resultados salvos mudar
+CACHE_FORMAT = 3
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """
+    Hash (blake2b) do conteúdo de um arquivo, lido em blocos.
+    """
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def hash_array(arr):
+    """
+    Hash (blake2b) do conteúdo e da forma de um numpy array.
+    """
+    arr = np.ascontiguousarray(arr)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(str((arr.shape, arr.dtype.str)).encode())
+    h.update(memoryview(arr).cast("B"))
+    return h.hexdigest()
+
+class ResultCache:
+    """
+    Cache em disco dos resultados do motor, endereçado pelo conteúdo da imagem
+    e pelos parâmetros (K, espaço de cor, motor, ...).
+    Cada resultado é um arquivo .npz; os menos usados recentemente são apagados
+    quando o diretório passa de max_bytes (o mtime do arquivo marca o último uso).
+    hits e misses contam os acertos e as faltas deste processo.
+    """
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._file_hashes = {} # (path, mtime_ns, size) -> hash
+        self._lock = threading.Lock()
+
+    def image_hash(self, image):
+        """
+        Hash do conteúdo de uma imagem: caminho (conteúdo do arquivo), PIL.Image ou numpy array.
+        O hash de arquivos é memorizado enquanto mtime e tamanho não mudarem.
+        """
+        if isinstance(image, (str, os.PathLike)):
+            path = os.path.abspath(image)
+            st = os.stat(path)
+            memo_key = (path, st.st_mtime_ns, st.st_size)
+            with self._lock:
+                digest = self._file_hashes.get(memo_key)
+            if digest is None:
+                digest = hash_file(path)
+                with self._lock:
+                    self._file_hashes[memo_key] = digest
+            return digest
+        return hash_array(np.asarray(image))
+
+    def make_key(self, image, params):
+        """
+        Chave do resultado: hash da imagem + parâmetros (dicionário serializável em JSON).
+        """
+        h = hashlib.blake2b(digest_size=20)
+        h.update(self.image_hash(image).encode())
+        h.update(json.dumps(params, sort_keys=True, default=str).encode())
+        h.update(str(CACHE_FORMAT).encode())
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """
+        Retorna o dicionário de arrays salvo com a chave, ou None.
+        Uma entrada ilegível (truncada, corrompida) conta como falta e é apagada,
+        para ser recalculada.
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                result = {name: data[name] for name in data.files}
+            os.utime(path) # marca como usado recentemente
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile, zlib.error):
+            with self._lock:
+                self.misses += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, result):
+        """
+        Salva um dicionário de arrays com a chave (escrita atômica) e aplica o limite de tamanho.
+        O cache é só uma otimização: se o diretório não puder ser escrito retorna False.
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return False
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez_compressed(f, **result)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+        self.evict()
+        return True
+
+    def evict(self):
+        """
+        Apaga os resultados usados há mais tempo até o diretório caber em max_bytes.
+        """
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(".npz")]
+        except FileNotFoundError:
+            return
+
+        entries = []
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def set_max_bytes(self, max_bytes):
+        self.max_bytes = max_bytes
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                os.remove(os.path.join(self.directory, name))
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+_default_cache = None
+
+def get_default_cache():
+    """
+    Cache de resultados padrão do processo (~/.cache/kmeans_color_palette).
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResultCache()
+    return _default_cache
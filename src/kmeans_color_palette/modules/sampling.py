@@ -0,0 +1,139 @@
+#!/usr/bin/python3
+
+import numpy as np
+from PIL import Image
+
+SAMPLING_METHODS = ["none", "random", "stratified", "downscale"]
+
+
+def sample_indices(n, max_pixels, method="random", seed=42):
+    """
+    Escolhe no máximo max_pixels índices entre n pixels.
+    method:
+        "random"     -> amostragem aleatória sem reposição.
+        "stratified" -> divide a imagem (em ordem raster) em max_pixels faixas
+                        iguais e sorteia um pixel em cada faixa.
+    Retorna None se não for necessário amostrar.
+    """
+    if max_pixels is None or max_pixels <= 0 or n <= max_pixels:
+        return None
+
+    rng = np.random.default_rng(seed)
+
+    if method == "random":
+        idx = rng.choice(n, size=max_pixels, replace=False)
+        idx.sort()
+        return idx
+
+    elif method == "stratified":
+        edges = np.linspace(0, n, max_pixels + 1)
+        starts = edges[:-1].astype(np.int64)
+        sizes = np.maximum(edges[1:].astype(np.int64) - starts, 1)
+        return starts + (rng.random(max_pixels) * sizes).astype(np.int64)
+
+    else:
+        raise ValueError(f"Método de amostragem '{method}' não suportado.")
+
+def sample_pixels(pixels, max_pixels, method="random", seed=42):
+    """
+    Retorna uma amostra (Mx3) de uma matriz de pixels (Nx3), com M <= max_pixels.
+    Se não for necessário amostrar, retorna a própria matriz.
+    """
+    idx = sample_indices(len(pixels), max_pixels, method=method, seed=seed)
+    if idx is None:
+        return pixels
+    return pixels[idx]
+
+def downscale_image(img, max_pixels):
+    """
+    Reduz uma imagem PIL ou numpy array HxWx3 (mantendo a proporção) para que
+    largura*altura <= max_pixels. Usa o filtro BOX, que equivale à média dos
+    pixels de cada bloco. Retorna a própria imagem se não for necessário reduzir,
+    senão uma PIL.Image.
+    """
+    if isinstance(img, np.ndarray):
+        h, w = img.shape[:2]
+    else:
+        w, h = img.size
+    if max_pixels is None or max_pixels <= 0 or w * h <= max_pixels:
+        return img
+
+    if isinstance(img, np.ndarray):
+        img = Image.fromarray(np.ascontiguousarray(img), "RGB")
+
+    factor = np.sqrt(max_pixels / float(w * h))
+    new_size = (max(1, int(w * factor)), max(1, int(h * factor)))
+    return img.resize(new_size, Image.BOX)
+
+def palette_drift(reference, centroids):
+    """
+    Compara duas paletas (Kx3) no mesmo espaço de cor.
+    Os centróides são emparelhados pela menor distância total (algoritmo húngaro).
+    Retorna um dicionário com a distância média e a máxima entre os pares.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    reference = np.asarray(reference, dtype=np.float64)
+    centroids = np.asarray(centroids, dtype=np.float64)
+
+    cost = np.linalg.norm(reference[:, None, :] - centroids[None, :, :], axis=2)
+    rows, cols = linear_sum_assignment(cost)
+    dist = cost[rows, cols]
+
+    return {
+        "mean": float(dist.mean()),
+        "max": float(dist.max()),
+        "pairs": [(int(r), int(c)) for r, c in zip(rows, cols)]
+    }
+
+def drift_report(image_path, K, analysis_type="rgb", max_pixels_list=(10000, 50000, 200000), methods=("random", "stratified", "downscale")):
+    """
+    Mede o desvio da paleta obtida com amostragem em relação ao ajuste com todos os pixels.
+    A linha "reseed" repete o ajuste completo com outra semente e serve de referência:
+    desvios dessa ordem vêm do próprio K-means e não da amostragem.
+    Retorna uma lista de dicionários com method, max_pixels, mean, max e tempo de ajuste.
+    """
+    import time
+    from kmeans_color_palette.modules.pipeline import prepare_data, prepare_fit_data, fit_kmeans
+
+    img = Image.open(image_path).convert("RGB")
+    img_np, weights = prepare_data(img, analysis_type)
+
+    t0 = time.perf_counter()
+    _, reference = fit_kmeans(img_np, img_np, K, sample_weight=weights)
+    t_full = time.perf_counter() - t0
+
+    n_pixels = img.size[0] * img.size[1]
+    report = [{"method": "none", "max_pixels": n_pixels, "mean": 0.0, "max": 0.0, "time": t_full}]
+
+    t0 = time.perf_counter()
+    _, reseed = fit_kmeans(img_np, img_np, K, sample_weight=weights, random_state=0)
+    elapsed = time.perf_counter() - t0
+    drift = palette_drift(reference, reseed)
+    report.append({"method": "reseed", "max_pixels": n_pixels,
+                   "mean": drift["mean"], "max": drift["max"], "time": elapsed})
+    for method in methods:
+        for max_pixels in max_pixels_list:
+            t0 = time.perf_counter()
+            fit_np, fit_weights = prepare_fit_data(img, img_np, weights, analysis_type, method, max_pixels)
+            _, centroids = fit_kmeans(img_np, fit_np, K, sample_weight=fit_weights)
+            elapsed = time.perf_counter() - t0
+            drift = palette_drift(reference, centroids)
+            report.append({"method": method, "max_pixels": max_pixels,
+                           "mean": drift["mean"], "max": drift["max"], "time": elapsed})
+    return report
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Uso: python3 -m kmeans_color_palette.modules.sampling IMAGEM [K] [rgb|lab|hsl]")
+        sys.exit(1)
+
+    image_path = sys.argv[1]
+    K = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    analysis_type = sys.argv[3] if len(sys.argv) > 3 else "rgb"
+
+    print(f"{'method':<12}{'max_pixels':>12}{'mean':>10}{'max':>10}{'time':>10}")
+    for row in drift_report(image_path, K, analysis_type=analysis_type):
+        print(f"{row['method']:<12}{row['max_pixels']:>12}{row['mean']:>10.3f}{row['max']:>10.3f}{row['time']:>10.3f}")
@@ -0,0 +1,74 @@
+#!/usr/bin/python3
+
+import sys
+import time
+import importlib
+import threading
+
+# Bibliotecas pesadas carregadas em segundo plano depois que a janela aparece.
+PRELOAD_MODULES = [
+    "numpy",
+    "PIL.Image",
+    "kmeans_color_palette.engine",
+    "sklearn.cluster"
+]
+
+
+class StartupProfiler:
+    """
+    Registra o tempo de cada etapa da inicialização (--profile-startup).
+    Cada marca guarda o tempo decorrido desde a marca anterior.
+    """
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.records = []  # (nome, segundos, tipo)
+        self._lock = threading.Lock()
+
+    def mark(self, name, kind="init"):
+        now = time.perf_counter()
+        with self._lock:
+            self.records.append((name, now - self.last, kind))
+            self.last = now
+
+    def record(self, name, seconds, kind):
+        with self._lock:
+            self.records.append((name, seconds, kind))
+
+    def report(self):
+        lines = ["Startup profile:"]
+        for name, seconds, kind in self.records:
+            lines.append(f"  {kind:<8} {name:<40} {1000.0 * seconds:9.1f} ms")
+        total = self.last - self.start
+        lines.append(f"  {'total':<8} {'until the window is ready':<40} {1000.0 * total:9.1f} ms")
+        return "\n".join(lines)
+
+def preload_modules(modules=PRELOAD_MODULES, profiler=None):
+    """
+    Importa os módulos pesados; se houver profiler registra o tempo de cada um.
+    Falhas são ignoradas aqui e aparecerão quando o módulo for realmente usado.
+    """
+    for name in modules:
+        already_loaded = name in sys.modules
+        t0 = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except Exception:
+            continue
+        if profiler is not None and not already_loaded:
+            profiler.record(name, time.perf_counter() - t0, "preload")
+
+def start_preload(modules=PRELOAD_MODULES, profiler=None, on_done=None):
+    """
+    Inicia preload_modules em uma thread daemon, fora da thread da GUI.
+    on_done() é chamado (nessa thread) ao terminar.
+    Retorna a thread.
+    """
+    def run():
+        preload_modules(modules, profiler)
+        if on_done is not None:
+            on_done()
+
+    thread = threading.Thread(target=run, name="preload", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,129 @@
+#!/usr/bin/python3
+
+import numpy as np
+
+from kmeans_color_palette.modules.kernels import (
+    DEFAULT_CHUNK_SIZE,
+    prepare_centers,
+    partial_sq_distances,
+    own_sq_distances,
+    row_sq_norms,
+    row_min
+)
+
+
+class ClusterStatsAccumulator:
+    """
+    Acumula as somas das estatísticas dos clusters bloco a bloco
+    (por exemplo, faixa a faixa de uma imagem lida em streaming).
+    add() recebe cada bloco; result() calcula o dicionário de cluster_statistics.
+    """
+    def __init__(self, centroids):
+        self.centroids = np.asarray(centroids, dtype=np.float64)
+        # centróides do kernel de distâncias (float32) e seus ||c||^2
+        self.kernel_centers, self.neg2_ct, self.c_sq = prepare_centers(self.centroids)
+        K = len(self.centroids)
+
+        self.sum_w = np.zeros(K)
+        self.sum_d = np.zeros(K)
+        self.sum_d2 = np.zeros(K)
+        self.sum_sil = np.zeros(K)
+        self.max_d = np.zeros(K)
+
+    def add(self, X, labels, weights=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+        """
+        Acumula um bloco: X (n,3) no espaço do agrupamento, labels (n,) e weights (n,) ou None.
+        Com labels=None cada linha vai para o centróide mais próximo, calculado na mesma
+        passada das distâncias (sem um predict separado).
+        O bloco é processado em pedaços de chunk_size linhas; progress
+        (modules.progress.Progress) avança a cada pedaço.
+        Retorna os rótulos usados.
+        """
+        X = np.asarray(X)
+        nearest = labels is None
+        labels = np.empty(len(X), dtype=np.int32) if nearest else np.asarray(labels)
+        for start in range(0, len(X), chunk_size):
+            stop = min(start + chunk_size, len(X))
+            self._add_chunk(X[start:stop], labels[start:stop],
+                            None if weights is None else weights[start:stop], nearest)
+            if progress is not None:
+                progress.update(stop, len(X))
+        return labels
+
+    def _add_chunk(self, X, lab, weights, nearest=False):
+        K = len(self.centroids)
+        X = X.astype(self.kernel_centers.dtype, copy=False)
+        wt = np.ones(len(X)) if weights is None else np.asarray(weights, dtype=np.float64)
+        rows = np.arange(len(X))
+
+        # distâncias quadradas a todos os centróides (kernels) sem o termo ||x||^2,
+        # que só é somado à menor delas
+        partial = partial_sq_distances(X, self.neg2_ct, self.c_sq)
+        if nearest:
+            lab[:] = partial.argmin(axis=1)
+
+        # distância ao próprio centróide calculada pela diferença, sem cancelamento
+        own2 = own_sq_distances(X, self.kernel_centers, lab).astype(np.float64)
+        a = np.sqrt(own2)
+
+        if K > 1:
+            # b: distância ao centróide mais próximo entre os demais
+            partial[rows, lab] = np.inf
+            second2 = row_min(partial) + row_sq_norms(X)
+            b = np.sqrt(np.maximum(second2, 0), dtype=np.float64)
+            denom = np.maximum(a, b)
+            sil = np.where(denom > 0, (b - a) / np.where(denom > 0, denom, 1.0), 0.0)
+        else:
+            sil = np.zeros(len(a))
+
+        self.sum_w += np.bincount(lab, weights=wt, minlength=K)
+        self.sum_d += np.bincount(lab, weights=wt * a, minlength=K)
+        self.sum_d2 += np.bincount(lab, weights=wt * own2, minlength=K)
+        self.sum_sil += np.bincount(lab, weights=wt * sil, minlength=K)
+        np.maximum.at(self.max_d, lab, a)
+
+    def result(self):
+        total = self.sum_w.sum()
+        filled = self.sum_w > 0
+        safe_w = np.where(filled, self.sum_w, 1.0)
+
+        w = self.sum_w / total if total > 0 else np.zeros(len(self.sum_w))
+        d = np.where(filled, self.sum_d / safe_w, 0.0)
+
+        return {
+            "w": w,
+            "d": d,
+            "score": w * 255.0 / (1.0 + d),
+            "variance": np.where(filled, self.sum_d2 / safe_w, 0.0),
+            "max_d": self.max_d.copy(),
+            "silhouette": np.where(filled, self.sum_sil / safe_w, 0.0),
+            "counts": self.sum_w.copy(),
+            "inertia": float(self.sum_d2.sum())
+        }
+
+
+def cluster_statistics(data_np, labels, centroids, weights=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Calcula as estatísticas de cada cluster em uma única passada sobre os dados.
+
+    data_np   -> matriz (N,3) no espaço de cor usado no agrupamento.
+    labels    -> array (N,) com o cluster de cada linha (None = centróide mais próximo).
+    centroids -> matriz (K,3).
+    weights   -> array (N,) com o número de pixels de cada linha (None = 1).
+    progress  -> modules.progress.Progress opcional, atualizado a cada chunk_size linhas.
+
+    Retorna um dicionário de arrays (K,):
+        w          -> fração dos pixels no cluster;
+        d          -> distância média dos pixels ao centróide;
+        score      -> w*255/(1+d);
+        variance   -> distância quadrada média ao centróide (variância total do cluster);
+        max_d      -> maior distância de um pixel ao centróide;
+        silhouette -> estimativa da silhueta média usando os centróides:
+                      (b-a)/max(a,b), com a = distância ao próprio centróide e
+                      b = distância ao centróide mais próximo entre os demais;
+        counts     -> número (ponderado) de pixels no cluster;
+    e também "inertia" (soma ponderada das distâncias quadradas).
+    """
+    accumulator = ClusterStatsAccumulator(centroids)
+    accumulator.add(data_np, labels, weights, chunk_size, progress)
+    return accumulator.result()
@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+
+import os
+import math
+import contextlib
+
+import numpy as np
+from PIL import Image
+
+from kmeans_color_palette.modules.pipeline import ProcessCanceled, convert_image, result_from_stats
+from kmeans_color_palette.modules.histogram import OnlineColorHistogram
+from kmeans_color_palette.modules.clustering import DEFAULT_BACKEND, create_backend
+from kmeans_color_palette.modules.stats import ClusterStatsAccumulator
+from kmeans_color_palette.modules.instrument import stage_context
+from kmeans_color_palette.modules.progress import Progress
+
+STREAMING_METHODS = ["histogram", "minibatch"]
+
+DEFAULT_STREAMING_MIN_MEGAPIXELS = 100       # imagens maiores são processadas em streaming
+DEFAULT_STREAMING_METHOD = "histogram"
+DEFAULT_STREAMING_BITS = 6                   # bits por canal do histograma online
+DEFAULT_STRIP_PIXELS = 1 << 20               # pixels lidos por faixa
+DEFAULT_MAX_DECODE_PIXELS = 50 * 1000 * 1000 # limite de formatos que precisam ser decodificados inteiros
+
+# modos de pixels "raw" que podem ser mapeados direto do arquivo
+RAW_RGB_MODES = {"RGB": False, "BGR": True} # rawmode -> inverter canais
+
+
+@contextlib.contextmanager
+def unlimited_pixels():
+    """
+    Desliga temporariamente a proteção do PIL contra imagens enormes ("decompression bomb"):
+    aqui a memória é controlada pela leitura em faixas, draft e reduce.
+    """
+    previous = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        yield
+    finally:
+        Image.MAX_IMAGE_PIXELS = previous
+
+def _raw_strips(img, path):
+    """
+    Se os pixels da imagem estão gravados sem compressão em faixas de largura inteira
+    (PPM, BMP e TIFF sem compressão), retorna a lista de (memmap (linhas,W,3), inverter canais).
+    Senão retorna None.
+    """
+    if img.mode != "RGB" or not img.tile:
+        return None
+
+    width = img.size[0]
+    strips = []
+    for tile in img.tile:
+        codec, extents, offset, args = tile[0], tile[1], tile[2], tile[3]
+        if codec != "raw":
+            return None
+        x0, y0, x1, y1 = extents
+        if x0 != 0 or x1 != width:
+            return None
+
+        if isinstance(args, tuple):
+            rawmode = args[0]
+            stride = args[1] if len(args) > 1 else 0
+        else:
+            rawmode, stride = args, 0
+        if rawmode not in RAW_RGB_MODES:
+            return None
+
+        stride = stride or width * 3
+        rows = y1 - y0
+        mapped = np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(rows, stride))
+        # a ordem das linhas (BMP é gravado de baixo para cima) não altera as estatísticas
+        strips.append((mapped[:, :width * 3].reshape(rows, width, 3), RAW_RGB_MODES[rawmode]))
+    return strips
+
+
+class StripReader:
+    """
+    Lê uma imagem em faixas horizontais de no máximo strip_pixels pixels, para que a
+    memória de pico dependa do tamanho da faixa e não do tamanho da imagem.
+
+    Origens aceitas, da mais econômica para a menos:
+        numpy array HxWx3 uint8, arquivo .npy (lido com memmap),
+        PPM/BMP/TIFF sem compressão (pixels mapeados direto do arquivo),
+        JPEG (decodificado reduzido com draft se passar de max_decode_pixels),
+        demais formatos (decodificados uma vez; reduzidos se passarem de max_decode_pixels).
+    kind indica qual caminho foi usado; width e height são as dimensões lidas.
+    A leitura pode ser repetida (uma passada para o ajuste e outra para as estatísticas).
+
+    Os demais formatos (PNG, TIFF comprimido, ...) não podem ser lidos em faixas: a memória
+    da decodificação depende do tamanho da imagem. Com full_decode=False, imagens nesses
+    formatos com mais de max_decode_pixels levantam ValueError em vez de serem decodificadas
+    inteiras, e a memória nunca depende do tamanho da imagem.
+    """
+    def __init__(self, source, strip_pixels=DEFAULT_STRIP_PIXELS, max_decode_pixels=DEFAULT_MAX_DECODE_PIXELS,
+                 full_decode=True):
+        self.strip_pixels = strip_pixels
+        self._strips = None
+
+        if isinstance(source, np.ndarray):
+            self._set_array(source, "array")
+            return
+
+        path = os.fspath(source)
+        if path.lower().endswith(".npy"):
+            self._set_array(np.load(path, mmap_mode="r"), "memmap")
+            return
+
+        with unlimited_pixels(), Image.open(path) as img:
+            self._strips = _raw_strips(img, path)
+            if self._strips is not None:
+                self.kind = "raw"
+                self.width = img.size[0]
+                self.height = sum(len(strip) for strip, _ in self._strips)
+                return
+
+            width, height = img.size
+            scale = math.sqrt(width * height / max_decode_pixels) if max_decode_pixels else 1.0
+            kind = "decode"
+            if scale > 1.0 and img.format == "JPEG":
+                # o decodificador JPEG reduz a imagem por 1/2, 1/4 ou 1/8 sem decodificá-la inteira
+                img.draft("RGB", (math.ceil(width / scale), math.ceil(height / scale)))
+                kind = "draft"
+            elif scale > 1.0 and not full_decode:
+                raise ValueError(f"{os.path.basename(path)}: imagens {img.format} de {width}x{height} só podem ser "
+                                 f"decodificadas inteiras (mais de {max_decode_pixels} pixels); converta para PPM, BMP "
+                                 f"ou TIFF sem compressão, ou aumente streaming_max_decode_pixels.")
+            rgb = img.convert("RGB")
+
+        factor = math.ceil(math.sqrt(rgb.size[0] * rgb.size[1] / max_decode_pixels)) if max_decode_pixels else 1
+        if factor > 1:
+            rgb = rgb.reduce(factor)
+            kind = "reduce" if kind == "decode" else kind
+        self._set_array(np.asarray(rgb), kind)
+
+    def _set_array(self, arr, kind):
+        if arr.ndim != 3 or arr.shape[2] != 3 or arr.dtype != np.uint8:
+            raise ValueError("A imagem precisa ser um array HxWx3 uint8.")
+        self._strips = [(arr, False)]
+        self.kind = kind
+        self.height, self.width = arr.shape[:2]
+
+    @property
+    def n_pixels(self):
+        return self.width * self.height
+
+    def strip_rows(self):
+        return max(1, self.strip_pixels // max(1, self.width))
+
+    def __len__(self):
+        rows = self.strip_rows()
+        return sum(math.ceil(len(strip) / rows) for strip, _ in self._strips)
+
+    def __iter__(self):
+        """
+        Gera arrays (n,3) uint8 com os pixels de cada faixa.
+        """
+        rows = self.strip_rows()
+        for strip, swap in self._strips:
+            for start in range(0, len(strip), rows):
+                block = np.asarray(strip[start:start + rows])
+                if swap:
+                    block = block[..., ::-1]
+                yield np.ascontiguousarray(block).reshape(-1, 3)
+
+
+def sample_pixels(source, sample_size, strip_pixels=DEFAULT_STRIP_PIXELS,
+                  max_decode_pixels=DEFAULT_MAX_DECODE_PIXELS, seed=42):
+    """
+    Amostra aleatória de cerca de sample_size pixels de uma imagem lida em faixas
+    (ver StripReader): cada faixa contribui com uma parte proporcional ao seu tamanho,
+    então a memória é a de uma faixa mais a amostra.
+    Retorna um array (m,3) uint8.
+    """
+    reader = StripReader(source, strip_pixels, max_decode_pixels, full_decode=False)
+    fraction = min(1.0, sample_size / max(1, reader.n_pixels))
+    rng = np.random.default_rng(seed)
+    parts = []
+    for rgb in reader:
+        m = rng.binomial(len(rgb), fraction)
+        if m > 0:
+            parts.append(rgb[np.sort(rng.choice(len(rgb), size=m, replace=False))])
+    if not parts:
+        return np.empty((0, 3), dtype=np.uint8)
+    return np.concatenate(parts)
+
+def streaming_result( source,
+                      k,
+                      analysis_type="rgb",
+                      method=DEFAULT_STREAMING_METHOD,
+                      histogram_bits=DEFAULT_STREAMING_BITS,
+                      strip_pixels=DEFAULT_STRIP_PIXELS,
+                      max_decode_pixels=DEFAULT_MAX_DECODE_PIXELS,
+                      backend=DEFAULT_BACKEND,
+                      backend_options=None,
+                      random_state=42,
+                      progress=None,
+                      is_canceled=None,
+                      instrumentation=None):
+    """
+    Agrupa uma imagem lida em faixas (ver StripReader), em duas passadas:
+
+    1. ajuste: com method="histogram" as faixas alimentam um histograma de cores online
+       (OnlineColorHistogram, histogram_bits por canal) e o K-means (backend) é ajustado
+       nas cores do histograma, ponderadas pelas contagens; com method="minibatch" cada
+       faixa, já no espaço analysis_type, é passada para MiniBatchKMeans.partial_fit.
+    2. estatísticas: cada faixa é rotulada pelo centróide mais próximo e w, d, score, ...
+       são acumulados com ClusterStatsAccumulator, sobre todos os pixels, numa única
+       passada dos kernels de distância (modules.kernels).
+
+    instrumentation (modules.instrument.Instrumentation) mede a abertura da imagem como
+    "decode", a 1ª passada como "fit" e a 2ª como "stats" (a leitura das faixas entra nas passadas).
+    progress (modules.progress.Progress) avança faixa a faixa nas duas passadas;
+    is_canceled() é consultado a cada faixa.
+
+    Retorna o mesmo dicionário de pipeline.compute_result.
+    """
+    if method not in STREAMING_METHODS:
+        raise ValueError(f"Método de streaming '{method}' não suportado.")
+
+    with stage_context(instrumentation, "decode"):
+        reader = StripReader(source, strip_pixels, max_decode_pixels, full_decode=False)
+    n_strips = len(reader)
+    if progress is None:
+        progress = Progress()
+
+    def advance(stage_progress, step):
+        if is_canceled is not None and is_canceled():
+            raise ProcessCanceled()
+        stage_progress.update(step, n_strips)
+
+    # buffer float32 de uma faixa, reutilizado em todas as conversões de cor
+    buffer = np.empty((reader.strip_rows() * reader.width, 3), dtype=np.float32)
+
+    # --- 1ª passada: ajuste ---
+    with stage_context(instrumentation, "fit"), progress.stage("fit", 0.5) as p:
+        if method == "histogram":
+            histogram = OnlineColorHistogram(histogram_bits)
+            for step, rgb in enumerate(reader, 1):
+                histogram.add(rgb)
+                advance(p, step)
+            colors, counts = histogram.result()
+            # menos cores no histograma que K: a paleta fica com menos cores
+            model = create_backend(backend, min(k, len(colors)), random_state=random_state, **(backend_options or {}))
+            model.fit(convert_image(colors, analysis_type), sample_weight=counts)
+            centroids = np.asarray(model.cluster_centers_)
+        else:
+            from sklearn.cluster import MiniBatchKMeans
+            options = backend_options or {}
+            model = MiniBatchKMeans(n_clusters=k, random_state=random_state,
+                                    batch_size=options.get("batch_size", 4096))
+            pending = None
+            for step, rgb in enumerate(reader, 1):
+                X = convert_image(rgb, analysis_type, out=buffer[:len(rgb)])
+                # partial_fit precisa de pelo menos k amostras no primeiro bloco
+                pending = X.copy() if pending is None else np.concatenate((pending, X))
+                if len(pending) >= k:
+                    model.partial_fit(pending)
+                    pending = None
+                advance(p, step)
+            if pending is not None:
+                model.partial_fit(pending)
+            centroids = np.asarray(model.cluster_centers_)
+
+    # --- 2ª passada: estatísticas sobre todos os pixels ---
+    # os rótulos saem das mesmas distâncias das estatísticas (sem um predict separado)
+    with stage_context(instrumentation, "stats"), progress.stage("stats", 0.5) as p:
+        accumulator = ClusterStatsAccumulator(centroids)
+        for step, rgb in enumerate(reader, 1):
+            X = convert_image(rgb, analysis_type, out=buffer[:len(rgb)])
+            accumulator.add(X, None)
+            advance(p, step)
+
+    return result_from_stats(accumulator.result(), centroids, analysis_type)
+
+def image_megapixels(path):
+    """
+    Número de megapixels de um arquivo de imagem, lido só do cabeçalho (ou de um .npy).
+    """
+    path = os.fspath(path)
+    if path.lower().endswith(".npy"):
+        shape = np.load(path, mmap_mode="r").shape
+        return shape[0] * shape[1] / 1e6
+    with unlimited_pixels(), Image.open(path) as img:
+        return img.size[0] * img.size[1] / 1e6
+
+def should_stream(image, min_megapixels):
+    """
+    True se image é um caminho de arquivo com pelo menos min_megapixels megapixels
+    (min_megapixels <= 0 desativa o streaming automático).
+    """
+    if not min_megapixels or min_megapixels <= 0 or not isinstance(image, (str, os.PathLike)):
+        return False
+    return image_megapixels(image) >= min_megapixels
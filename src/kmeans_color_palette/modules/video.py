@@ -0,0 +1,314 @@
+#!/usr/bin/python3
+
+import os
+import re
+import glob
+import math
+import queue
+import threading
+
+import numpy as np
+from PIL import Image
+
+from kmeans_color_palette.modules.pipeline import (
+    ProcessCanceled,
+    DEFAULT_SAMPLING_METHOD,
+    DEFAULT_MAX_PIXELS,
+    DEFAULT_AGGREGATE,
+    DEFAULT_HISTOGRAM_BITS,
+    convert_image,
+    prepare_data,
+    prepare_fit_data,
+    fit_kmeans,
+    compute_result,
+    palette_from_result
+)
+from kmeans_color_palette.modules.histogram import OnlineColorHistogram, pack_colors
+from kmeans_color_palette.modules.clustering import DEFAULT_BACKEND
+from kmeans_color_palette.modules.progress import Progress
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm", ".m4v", ".mpg", ".mpeg", ".wmv")
+SEQUENCE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+DEFAULT_SAMPLE_FPS = 2.0         # quadros analisados por segundo de vídeo (<= 0: todos)
+DEFAULT_SEQUENCE_FPS = 25.0      # taxa assumida para sequências de imagens
+DEFAULT_MAX_SIDE = 512           # quadros reduzidos até este lado maior antes do ajuste (<= 0: sem redução)
+DEFAULT_SCENE_THRESHOLD = 0.4    # distância entre histogramas de quadros vizinhos que inicia uma cena
+DEFAULT_PREFETCH = 4             # quadros decodificados à frente do agrupamento
+SIGNATURE_BITS = 4               # bits por canal do histograma usado na detecção de cenas
+SCENE_HISTOGRAM_BITS = 6         # bits por canal do histograma acumulado de cada cena
+
+
+def is_video_path(path):
+    return isinstance(path, (str, os.PathLike)) and os.fspath(path).lower().endswith(VIDEO_EXTENSIONS)
+
+def _natural_key(path):
+    # frame2.png antes de frame10.png
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", path)]
+
+def sequence_paths(source):
+    """
+    Arquivos de uma sequência de imagens: um diretório, um padrão glob ou uma lista de caminhos,
+    em ordem natural de nome.
+    """
+    if isinstance(source, (list, tuple)):
+        return [os.fspath(p) for p in source]
+    source = os.fspath(source)
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)
+                 if name.lower().endswith(SEQUENCE_EXTENSIONS)]
+    else:
+        paths = [p for p in glob.glob(source) if p.lower().endswith(SEQUENCE_EXTENSIONS)]
+    return sorted(paths, key=_natural_key)
+
+def resize_frame(rgb, max_side=DEFAULT_MAX_SIDE):
+    """
+    Reduz o quadro (HxWx3) para que o lado maior tenha no máximo max_side pixels.
+    """
+    import cv2
+    h, w = rgb.shape[:2]
+    if max_side is None or max_side <= 0 or max(h, w) <= max_side:
+        return rgb
+    scale = max_side / max(h, w)
+    size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    return cv2.resize(rgb, size, interpolation=cv2.INTER_AREA)
+
+
+class FrameSource:
+    """
+    Quadros amostrados de um vídeo (lido com cv2.VideoCapture) ou de uma sequência de imagens.
+
+    Iterar produz tuplas (index, time, rgb): índice do quadro na fonte, instante em segundos
+    e array HxWx3 uint8 RGB já reduzido para max_side.
+    Um quadro a cada fps/sample_fps é decodificado; nos vídeos os demais são só avançados
+    (grab), sem decodificar.
+    """
+    def __init__(self, source, sample_fps=DEFAULT_SAMPLE_FPS, max_side=DEFAULT_MAX_SIDE,
+                 sequence_fps=DEFAULT_SEQUENCE_FPS):
+        self.source = source
+        self.max_side = max_side
+        self.paths = None
+
+        if is_video_path(source):
+            import cv2
+            capture = cv2.VideoCapture(os.fspath(source))
+            if not capture.isOpened():
+                raise ValueError(f"Não foi possível abrir o vídeo '{os.fspath(source)}'.")
+            self.fps = capture.get(cv2.CAP_PROP_FPS) or sequence_fps
+            self.n_frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            capture.release()
+        else:
+            self.paths = sequence_paths(source)
+            if not self.paths:
+                raise ValueError("Nenhuma imagem encontrada na sequência.")
+            self.fps = sequence_fps
+            self.n_frames = len(self.paths)
+
+        self.step = 1 if not sample_fps or sample_fps <= 0 else max(1, int(round(self.fps / sample_fps)))
+
+    def __len__(self):
+        """
+        Número de quadros amostrados (estimado pelo cabeçalho nos vídeos; 0 se desconhecido).
+        """
+        return math.ceil(self.n_frames / self.step)
+
+    def __iter__(self):
+        if self.paths is not None:
+            for index in range(0, len(self.paths), self.step):
+                with Image.open(self.paths[index]) as img:
+                    rgb = np.asarray(img.convert("RGB"))
+                yield index, index / self.fps, resize_frame(rgb, self.max_side)
+            return
+
+        import cv2
+        capture = cv2.VideoCapture(os.fspath(self.source))
+        try:
+            index = 0
+            while capture.grab():
+                if index % self.step == 0:
+                    ok, bgr = capture.retrieve()
+                    if not ok:
+                        break
+                    rgb = cv2.cvtColor(resize_frame(bgr, self.max_side), cv2.COLOR_BGR2RGB)
+                    yield index, index / self.fps, rgb
+                index += 1
+        finally:
+            capture.release()
+
+
+def prefetch(iterable, depth=DEFAULT_PREFETCH):
+    """
+    Percorre iterable em uma thread produtora, mantendo até depth itens prontos numa fila:
+    a decodificação dos quadros roda em paralelo com o agrupamento (OpenCV, numpy e
+    scikit-learn liberam o GIL) e a vazão fica limitada pela mais lenta das duas.
+    Exceções da produtora são levantadas no consumidor.
+    """
+    if depth is None or depth <= 0:
+        yield from iterable
+        return
+
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        items.put(("item", item), timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                if stop.is_set():
+                    return
+            items.put(("done", None))
+        except BaseException as e:
+            items.put(("error", e))
+
+    producer = threading.Thread(target=produce, name="frame-decoder", daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, item = items.get()
+            if kind == "error":
+                raise item
+            if kind == "done":
+                return
+            yield item
+    finally:
+        # o consumidor parou antes do fim (erro, cancelamento ou break): libera a produtora
+        stop.set()
+        while producer.is_alive():
+            try:
+                items.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        producer.join()
+
+
+def frame_signature(rgb):
+    """
+    Histograma normalizado de 2**(3*SIGNATURE_BITS) bins do quadro, para detectar cortes.
+    """
+    codes = pack_colors(np.asarray(rgb).reshape(-1, 3), SIGNATURE_BITS)
+    hist = np.bincount(codes, minlength=1 << (3 * SIGNATURE_BITS)).astype(np.float32)
+    return hist / max(1.0, float(hist.sum()))
+
+def signature_distance(a, b):
+    """
+    Distância entre dois histogramas normalizados: metade da soma das diferenças (0 a 1).
+    """
+    return 0.5 * float(np.abs(a - b).sum())
+
+
+def video_palettes( source,
+                    k=5,
+                    analysis_type="rgb",
+                    sample_fps=DEFAULT_SAMPLE_FPS,
+                    max_side=DEFAULT_MAX_SIDE,
+                    scene_threshold=DEFAULT_SCENE_THRESHOLD,
+                    segment_seconds=0,
+                    warm_start=True,
+                    sampling_method=DEFAULT_SAMPLING_METHOD,
+                    max_pixels=DEFAULT_MAX_PIXELS,
+                    aggregate=DEFAULT_AGGREGATE,
+                    histogram_bits=DEFAULT_HISTOGRAM_BITS,
+                    backend=DEFAULT_BACKEND,
+                    backend_options=None,
+                    prefetch_depth=DEFAULT_PREFETCH,
+                    sequence_fps=DEFAULT_SEQUENCE_FPS,
+                    progress=None,
+                    is_canceled=None):
+    """
+    Paletas de um vídeo ou sequência de imagens (ver FrameSource), quadro a quadro e por cena.
+
+    Cada quadro amostrado é agrupado como em engine.extract_palette; com warm_start o ajuste
+    parte dos centróides do quadro anterior da mesma cena (um único refinamento em vez de
+    várias inicializações). Uma nova cena começa quando a distância entre os histogramas de
+    quadros vizinhos passa de scene_threshold (0 desativa), ou, com segment_seconds > 0,
+    a cada segment_seconds segundos. A paleta de cada cena é ajustada no histograma de cores
+    acumulado de todos os seus quadros.
+
+    A decodificação roda em uma thread produtora (ver prefetch); progress e is_canceled
+    como em engine.extract_palette.
+
+    Retorna um dicionário com:
+        fps    -> quadros por segundo da fonte;
+        frames -> lista de {index, time, scene, palette};
+        scenes -> lista de {scene, start, end, first_frame, last_frame, frames, palette}.
+    As paletas têm o formato de engine.extract_palette.
+    """
+    frames_source = FrameSource(source, sample_fps, max_side, sequence_fps)
+    total = len(frames_source)
+    if progress is None:
+        progress = Progress()
+
+    frames = []
+    scenes = []
+    scene = None
+    previous_signature = None
+    centroids = None
+
+    def close_scene():
+        colors, counts = scene["histogram"].result()
+        data_np = convert_image(colors, analysis_type)
+        K = min(k, len(colors))
+        # a cena parte dos centróides do seu último quadro
+        init = centroids if warm_start and centroids is not None and len(centroids) == K else None
+        labels, scene_centroids = fit_kmeans(data_np, data_np, K, sample_weight=counts,
+                                             backend=backend, backend_options=backend_options, init=init)
+        result = compute_result(data_np, counts, labels, scene_centroids, analysis_type)
+        scenes.append({
+            "scene": len(scenes),
+            "start": scene["start"],
+            "end": scene["end"],
+            "first_frame": scene["first_frame"],
+            "last_frame": scene["last_frame"],
+            "frames": scene["frames"],
+            "palette": palette_from_result(result)
+        })
+
+    for n, (index, time, rgb) in enumerate(prefetch(frames_source, prefetch_depth), 1):
+        if is_canceled is not None and is_canceled():
+            raise ProcessCanceled()
+
+        signature = frame_signature(rgb)
+        if scene is None:
+            new_scene = True
+        elif segment_seconds and segment_seconds > 0:
+            new_scene = time - scene["start"] >= segment_seconds
+        else:
+            new_scene = (scene_threshold and scene_threshold > 0 and
+                         signature_distance(signature, previous_signature) > scene_threshold)
+        previous_signature = signature
+
+        if new_scene:
+            if scene is not None:
+                close_scene()
+            scene = {"start": time, "first_frame": index, "frames": 0,
+                     "histogram": OnlineColorHistogram(SCENE_HISTOGRAM_BITS)}
+            centroids = None
+        scene["end"] = time
+        scene["last_frame"] = index
+        scene["frames"] += 1
+        scene["histogram"].add(rgb.reshape(-1, 3))
+
+        data_np, weights = prepare_data(rgb, analysis_type, aggregate, histogram_bits)
+        fit_np, fit_weights = prepare_fit_data(rgb, data_np, weights, analysis_type,
+                                               sampling_method, max_pixels, aggregate, histogram_bits)
+        K = min(k, len(fit_np))
+        init = centroids if warm_start and centroids is not None and len(centroids) == K else None
+        labels, centroids = fit_kmeans(data_np, fit_np, K, sample_weight=fit_weights,
+                                       backend=backend, backend_options=backend_options, init=init)
+        centroids = np.asarray(centroids)
+        result = compute_result(data_np, weights, labels, centroids, analysis_type)
+        frames.append({"index": index, "time": time, "scene": len(scenes), "palette": palette_from_result(result)})
+
+        progress.update(n, max(total, n))
+
+    if scene is None:
+        raise ValueError("Nenhum quadro lido da fonte.")
+    close_scene()
+    progress.finish()
+
+    return {"fps": frames_source.fps, "frames": frames, "scenes": scenes}
@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+
+from PyQt5.QtWidgets import QWidget, QSizePolicy
+from PyQt5.QtGui import QPainter, QPen, QColor
+from PyQt5.QtCore import QPointF, pyqtSignal
+
+class InertiaCurveWidget(QWidget):
+    """
+    Curva do cotovelo (inércia x K) da exploração de K.
+    Clicar em um ponto emite k_selected(K).
+    """
+    k_selected = pyqtSignal(int)
+
+    MARGIN = 24
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.curve = []      # [(K, inertia), ...]
+        self.current_k = None
+        self.setMinimumHeight(110)
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
+
+    def set_curve(self, curve, current_k=None):
+        self.curve = list(curve)
+        self.current_k = current_k
+        self.update()
+
+    def set_current_k(self, k):
+        self.current_k = k
+        self.update()
+
+    def _points(self):
+        """Posição (x, y) de cada ponto da curva no widget."""
+        if not self.curve:
+            return []
+        ks = [k for k, _ in self.curve]
+        values = [v for _, v in self.curve]
+        k_min, k_max = min(ks), max(ks)
+        v_min, v_max = min(values), max(values)
+        w = self.width() - 2 * self.MARGIN
+        h = self.height() - 2 * self.MARGIN
+        points = []
+        for k, v in self.curve:
+            x = self.MARGIN + (w * (k - k_min) / (k_max - k_min) if k_max > k_min else w / 2)
+            y = self.MARGIN + (h * (v_max - v) / (v_max - v_min) if v_max > v_min else h / 2)
+            points.append((k, QPointF(x, y)))
+        return points
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        points = self._points()
+        if not points:
+            return
+
+        painter.setPen(QPen(QColor(90, 90, 90), 2))
+        for (_, p0), (_, p1) in zip(points, points[1:]):
+            painter.drawLine(p0, p1)
+
+        for k, p in points:
+            color = QColor(220, 60, 30) if k == self.current_k else QColor(40, 110, 200)
+            painter.setPen(QPen(color, 1))
+            painter.setBrush(color)
+            painter.drawEllipse(p, 5, 5)
+            painter.setPen(QPen(QColor(60, 60, 60), 1))
+            painter.drawText(QPointF(p.x() - 4, self.height() - 6), str(k))
+
+    def mousePressEvent(self, event):
+        points = self._points()
+        if not points:
+            return
+        x = event.pos().x()
+        k, _ = min(points, key=lambda item: abs(item[1].x() - x))
+        self.k_selected.emit(k)
@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+
+import threading
+import traceback
+import contextlib
+import multiprocessing
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+from kmeans_color_palette.modules.instrument import stage_context
+from kmeans_color_palette.modules.progress import Progress, DEFAULT_MAXIMUM
+
+
+class WorkerSignals(QObject):
+    """
+    Sinais emitidos pelo ProcessImageWorker.
+    Os sinais são entregues na thread da GUI.
+    """
+    started = pyqtSignal(object)            # worker
+    progress = pyqtSignal(object, int, int, str) # worker, valor, máximo, etapa
+    finished = pyqtSignal(object, list)     # worker, colors_data
+    canceled = pyqtSignal(object)           # worker
+    error = pyqtSignal(object, str)         # worker, mensagem
+
+
+def signal_progress(worker):
+    """
+    Progress cujo destino é o sinal worker.signals.progress (valor de 0 a DEFAULT_MAXIMUM).
+    As emissões já chegam limitadas a poucas dezenas por segundo à thread da GUI.
+    """
+    def sink(fraction, label):
+        worker.signals.progress.emit(worker, int(round(fraction * DEFAULT_MAXIMUM)), DEFAULT_MAXIMUM, label)
+    return Progress(sink)
+
+
+class ProcessImageWorker(QRunnable):
+    """
+    Executa engine.extract_palette fora da thread da GUI.
+    Deve ser enviado a um QThreadPool.
+    """
+    def __init__(self, image_path, K, analysis_type, options=None, auto_k_options=None, instrumentation=None, keep_fit=False):
+        super().__init__()
+        self.image_path = image_path
+        self.K = K # número de clusters ou "auto"
+        self.analysis_type = analysis_type
+        self.options = options or {} # argumentos extras para extract_palette
+        self.auto_k_options = auto_k_options or {} # argumentos extras para choose_k
+        self.auto_k = None # resultado de choose_k quando K="auto"
+        self.instrumentation = instrumentation # modules.instrument.Instrumentation ou None
+        self.keep_fit = keep_fit # guarda os rótulos do ajuste para a imagem quantizada
+        self.fit = None # (data_np, labels, rgb_centroids) de extract_palette, com keep_fit
+
+        self.signals = WorkerSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_canceled(self):
+        return self._cancel_event.is_set()
+
+    def keep_fit_data(self, data_np, labels, rgb_centroids):
+        self.fit = (data_np, labels, rgb_centroids)
+
+    def run(self):
+        # o motor (numpy, sklearn, ...) só é importado quando o primeiro job roda
+        from kmeans_color_palette.engine import extract_palette, choose_k, ProcessCanceled
+
+        if self.is_canceled():
+            self.signals.canceled.emit(self)
+            return
+
+        self.signals.started.emit(self)
+        progress = signal_progress(self)
+        inst = self.instrumentation
+        try:
+            with (inst.run() if inst is not None else contextlib.nullcontext()):
+                K = self.K
+                if K == "auto":
+                    # os candidatos usam o mesmo motor e a mesma leitura (streaming) do ajuste final
+                    backend_args = {key: self.options[key] for key in ("backend", "backend_options", "streaming", "streaming_options")
+                                    if key in self.options}
+                    with stage_context(inst, "auto_k"), progress.stage("auto K", 0.4) as p:
+                        self.auto_k = choose_k(
+                            self.image_path,
+                            analysis_type=self.analysis_type,
+                            progress=p,
+                            is_canceled=self.is_canceled,
+                            **backend_args,
+                            **self.auto_k_options
+                        )
+                    K = self.auto_k["k"]
+                    if inst is not None:
+                        inst.info["k"] = K
+                    progress = progress.stage("", 0.6)
+
+                colors_data = extract_palette(
+                    self.image_path,
+                    k=K,
+                    analysis_type=self.analysis_type,
+                    progress=progress,
+                    is_canceled=self.is_canceled,
+                    instrumentation=inst,
+                    labels_callback=self.keep_fit_data if self.keep_fit else None,
+                    **self.options
+                )
+        except ProcessCanceled:
+            self.signals.canceled.emit(self)
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(self, str(e))
+        else:
+            self.signals.finished.emit(self, colors_data)
+
+
+class ExploreKWorker(QRunnable):
+    """
+    Ajusta uma lista de K com um modules.kexplore.KExplorer fora da thread da GUI.
+    Se explorer for None, um novo é criado para a imagem (os dados são preparados uma vez);
+    senão os ajustes já feitos são reaproveitados. O explorer fica em self.explorer.
+    finished emite a curva [(K, inertia), ...].
+    """
+    def __init__(self, image_path, k_values, analysis_type, options=None, explorer=None):
+        super().__init__()
+        self.image_path = image_path
+        self.k_values = list(k_values)
+        self.analysis_type = analysis_type
+        self.options = options or {} # argumentos extras para KExplorer
+        self.explorer = explorer
+
+        self.signals = WorkerSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_canceled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        from kmeans_color_palette.engine import load_image_array, ProcessCanceled
+        from kmeans_color_palette.modules.kexplore import KExplorer
+
+        if self.is_canceled():
+            self.signals.canceled.emit(self)
+            return
+
+        self.signals.started.emit(self)
+        try:
+            if self.explorer is None:
+                self.explorer = KExplorer(load_image_array(self.image_path),
+                                          analysis_type=self.analysis_type,
+                                          **self.options)
+            curve = self.explorer.fit_range(
+                self.k_values,
+                progress=signal_progress(self),
+                is_canceled=self.is_canceled
+            )
+        except ProcessCanceled:
+            self.signals.canceled.emit(self)
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(self, str(e))
+        else:
+            self.signals.finished.emit(self, curve)
+
+
+class CollectionWorker(QRunnable):
+    """
+    Executa engine.extract_collection_palette (uma paleta para várias imagens) fora da
+    thread da GUI. finished emite a paleta; o resultado completo, com a contribuição
+    de cada imagem, fica em self.result.
+    Os processos dos histogramas usam "spawn" (salvo mp_context em options): um fork do
+    processo da GUI copiaria locks do Qt e das outras threads em estado indefinido.
+    """
+    def __init__(self, image_paths, K, analysis_type, options=None, instrumentation=None):
+        super().__init__()
+        self.image_paths = list(image_paths)
+        self.image_path = None # não há uma imagem única para o color_palette.png
+        self.K = K
+        self.analysis_type = analysis_type
+        self.options = dict(options or {}) # argumentos extras para extract_collection_palette
+        self.options.setdefault("mp_context", multiprocessing.get_context("spawn"))
+        self.auto_k = None
+        self.result = None
+        self.instrumentation = instrumentation
+
+        self.signals = WorkerSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_canceled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        from kmeans_color_palette.engine import extract_collection_palette, ProcessCanceled
+
+        if self.is_canceled():
+            self.signals.canceled.emit(self)
+            return
+
+        self.signals.started.emit(self)
+        inst = self.instrumentation
+        try:
+            with (inst.run() if inst is not None else contextlib.nullcontext()):
+                with stage_context(inst, "collection"):
+                    self.result = extract_collection_palette(
+                        self.image_paths,
+                        k=self.K,
+                        analysis_type=self.analysis_type,
+                        progress=signal_progress(self),
+                        is_canceled=self.is_canceled,
+                        **self.options
+                    )
+        except ProcessCanceled:
+            self.signals.canceled.emit(self)
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(self, str(e))
+        else:
+            self.signals.finished.emit(self, self.result["palette"])
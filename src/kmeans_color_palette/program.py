@@ -12,21 +12,16 @@ from PyQt5.QtWidgets import (
     QAction, QMessageBox, QProgressBar
 )
 from PyQt5.QtGui import QDesktopServices, QIcon, QPixmap, QColor, QImage, QPainter
-from PyQt5.QtCore import Qt, QUrl
+from PyQt5.QtCore import Qt, QUrl, QThreadPool, QTimer, QMetaObject
 
-import numpy as np
-from sklearn.cluster import KMeans
-from PIL import Image
-import cv2
+# numpy, PIL, sklearn e o motor de paletas são importados sob demanda
+# (ou em segundo plano, depois que a janela aparece); ver modules/startup.py
+from kmeans_color_palette.modules.worker import ProcessImageWorker, ExploreKWorker, CollectionWorker
+from kmeans_color_palette.modules.winertia import InertiaCurveWidget
+from kmeans_color_palette.modules.startup import StartupProfiler, start_preload
+from kmeans_color_palette.modules.instrument import Instrumentation, profile_file_path
 
-# import kmeans_color_palette.modules.configure as configure 
-from kmeans_color_palette.modules.color import rgb_to_hex
-from kmeans_color_palette.modules.color import rgb_to_hsl
-from kmeans_color_palette.modules.color import hsl_to_rgb
-from kmeans_color_palette.modules.color import rgb_to_lab
-from kmeans_color_palette.modules.color import lab_to_rgb
-
-from kmeans_color_palette.desktop import create_desktop_file, create_desktop_directory, create_desktop_menu
+from kmeans_color_palette.desktop import create_desktop_file, create_desktop_directory, create_desktop_menu, desktop_integration_missing
 from kmeans_color_palette.modules.wabout  import show_about_window
 
 import kmeans_color_palette.about as about
@@ -44,55 +39,129 @@ DEFAULT_CONTENT = { "toolbar_configure": "Configure",
                     "window_width":800,
                     "window_height":700,
                     "preview_height": 300,
+                    "quantized_preview": "Quantized preview",
+                    "quantized_preview_tooltip": "Show the image redrawn with the palette colors (only the checked ones, if any); also saved as color_palette_quantized.png",
+                    "dither": "Dither",
+                    "dither_tooltip": "Floyd-Steinberg dithering in the quantized image",
                     "select_image": "1. Select Image",
                     "no_selected_image": "No selected image",
+                    "selected_images": "{} images (collection)",
                     "k_clusters": "K clusters:",
+                    "auto_k": "Auto K",
+                    "auto_k_tooltip": "Choose K automatically (see auto_k_method in the configuration)",
+                    "auto_k_status": "Auto K = {} ({}: {})",
                     "process_image": "2. Process Image",
+                    "explore_k": "Explore K",
+                    "explore_k_tooltip": "Compute the palettes of a range of K and show the elbow (inertia) curve",
+                    "cancel": "Cancel",
+                    "jobs_in_queue": "Jobs in queue: {}",
+                    "result_cache_status": "Result cache: {} hits, {} misses",
+                    "stage_timings_status": True,
+                    "instrumentation_log": "",
+                    "instrumentation_trace_memory": False,
+                    "profile_dir": "",
                     "generate_palette": "3. Generate palette",
                     "error": "Error",
+                    "image_open_error": "Could not open the image:\n{}\n\n{}",
                     "please_upload_image": "No image selected.\nPlease upload an image before initiating the process.",
                     "please_process_image": "No colors were processed.\nPlease upload and process an image before generating the palette.",
+                    "explore_k_collection": "Explore K works on a single image.\nSelect only one image to explore K.",
                     "please_select_colors": "No colors have been checked.\nPlease select some colors before generating the palette.",
                     "select_the_folder": "Select the folder to save the palette.",
-                    "color_palette_generated": "Color palette generated"
+                    "color_palette_generated": "Color palette generated",
+                    "sampling_method": "random",
+                    "max_pixels": 200000,
+                    "color_aggregation": True,
+                    "histogram_bits": 8,
+                    "clustering_backend": "kmeans",
+                    "n_init": "auto",
+                    "max_iter": 300,
+                    "tol": 0.0001,
+                    "n_threads": 0,
+                    "kmeans_algorithm": "lloyd",
+                    "minibatch_batch_size": 4096,
+                    "palette_bar_height": 50,
+                    "palette_labels": False,
+                    "palette_swatch_only": False,
+                    "palette_swatch_width": 100,
+                    "image_cache_mb": 512,
+                    "result_cache": True,
+                    "result_cache_mb": 256,
+                    "k_explore_min": 2,
+                    "k_explore_max": 10,
+                    "auto_k_method": "elbow",
+                    "auto_k_min": 2,
+                    "auto_k_max": 10,
+                    "auto_k_sample_size": 20000,
+                    "streaming_min_megapixels": 100,
+                    "streaming_method": "histogram",
+                    "streaming_histogram_bits": 6,
+                    "streaming_strip_pixels": 1048576,
+                    "streaming_max_decode_pixels": 50000000,
+                    "collection_histogram_bits": 6,
+                    "collection_max_decode_pixels": 4000000,
+                    "collection_jobs": 0
                     }
 
-configure.verify_default_config(CONFIG_PATH, default_content = DEFAULT_CONTENT)
+CONFIG = {}
 
+def init_config():
+    """
+    Cria (se preciso) e lê o config.json, preenchendo CONFIG.
+    Só faz o trabalho na primeira chamada.
+    """
+    if CONFIG:
+        return CONFIG
 
+    configure.verify_default_config(CONFIG_PATH, default_content = DEFAULT_CONTENT)
 
-CONFIG=configure.load_config(CONFIG_PATH)
+    config = configure.load_config(CONFIG_PATH)
+    CONFIG.update(configure.merge_defaults(config, DEFAULT_CONTENT))
+    return CONFIG
 
-CONFIG = configure.merge_defaults(CONFIG, DEFAULT_CONTENT)
+def configure_engine():
+    """
+    Aplica no motor as configurações que não dependem de cada job.
+    Importa o motor (numpy, PIL, ...) na primeira chamada.
+    """
+    from kmeans_color_palette.modules.imagecache import default_cache
+    default_cache.set_max_bytes(int(CONFIG["image_cache_mb"] * 1024 * 1024))
 
+    from kmeans_color_palette.modules.resultcache import get_default_cache
+    get_default_cache().set_max_bytes(int(CONFIG["result_cache_mb"] * 1024 * 1024))
 
 
-def create_color_data(centroid, w, d, score, analysis_type):
-    """
-    Converte o centróide para RGB se necessário e monta o dicionário de dados de cor.
-    """
-    if analysis_type == "rgb":
-        rgb_centroid = tuple(map(int, centroid))
-    elif analysis_type == "lab":
-        rgb_centroid = tuple(map(int, lab_to_rgb(centroid[0], centroid[1], centroid[2])))
-    elif analysis_type == "hsl":
-        rgb_centroid = tuple(map(int, hsl_to_rgb(centroid[0], centroid[1], centroid[2])))
-    else:
-        rgb_centroid = tuple(map(int, centroid))  # fallback
-
-    return {
-        "centroid": rgb_centroid,
-        "w": w,
-        "d": d,
-        "score": score,
-        "checkbox": None
-    }
+BACKEND_LABELS = {  "kmeans": "KMeans",
+                    "minibatch": "MiniBatchKMeans",
+                    "numpy": "NumPy KMeans"
+                    }
 
 class ColorPaletteGUI(QMainWindow):
     def __init__(self):
         super().__init__()
+        init_config()
+        self.engine_configured = False
         self.image_path = None
+        self.image_paths = [] # mais de uma imagem: paleta única da coleção
         self.colors_data = []  # Lista de dicts: {"centroid": (r,g,b), "w":..., "d":..., "score":...}
+        self.colors_image_path = None # imagem que gerou colors_data
+        self.colors_collection = None # resultado da coleção que gerou colors_data
+        self.colors_analysis_type = None # espaço de cor em que colors_data foi calculado
+        self.colors_fit = None # rótulos do ajuste de colors_image_path (ver ProcessImageWorker.fit)
+
+        # Preview quantizado: imagem reduzida ao tamanho do preview, preparada uma vez
+        self.preview_original = None
+        self.preview_recolorer = None
+        self.preview_recolorer_key = None
+
+        # Exploração de K: dados preparados e ajustes já feitos (ver modules/kexplore.py)
+        self.k_explorer = None
+        self.k_explorer_key = None
+        
+        # Fila de processamento: um job por vez, os demais aguardam
+        self.jobs = []
+        self.thread_pool = QThreadPool()
+        self.thread_pool.setMaxThreadCount(1)
         
         self.init_ui()
         self.create_toolbar()
@@ -136,6 +205,20 @@ class ColorPaletteGUI(QMainWindow):
         self.image_preview.setFixedHeight(CONFIG["preview_height"])  # altura fixa para pré-visualização
         self.image_preview.setStyleSheet("border: 1px solid gray;")
         main_layout.addWidget(self.image_preview)
+
+        # --- Preview quantizado com as cores da paleta ---
+        preview_layout = QHBoxLayout()
+        self.check_quantized = QCheckBox(CONFIG["quantized_preview"])
+        self.check_quantized.setToolTip(CONFIG["quantized_preview_tooltip"])
+        self.check_quantized.toggled.connect(self.update_preview)
+        preview_layout.addWidget(self.check_quantized)
+
+        self.check_dither = QCheckBox(CONFIG["dither"])
+        self.check_dither.setToolTip(CONFIG["dither_tooltip"])
+        self.check_dither.toggled.connect(self.update_preview)
+        preview_layout.addWidget(self.check_dither)
+        preview_layout.addStretch()
+        main_layout.addLayout(preview_layout)
         
         
         # --- Seleção de arquivo e K ---
@@ -149,12 +232,26 @@ class ColorPaletteGUI(QMainWindow):
         self.spin_k = QSpinBox()
         self.spin_k.setMinimum(1)
         self.spin_k.setValue(5)
+        self.spin_k.valueChanged.connect(self.on_k_changed)
         kmeans_layout.addWidget(self.spin_k)
+
+        # K automático
+        self.check_auto_k = QCheckBox(CONFIG["auto_k"])
+        self.check_auto_k.setToolTip(CONFIG["auto_k_tooltip"])
+        self.check_auto_k.toggled.connect(lambda checked: self.spin_k.setEnabled(not checked))
+        kmeans_layout.addWidget(self.check_auto_k)
         
         # Novo combobox para escolher tipo de análise
         self.combo_analysis = QComboBox()
-        self.combo_analysis.addItems(["RGB", "LAB", "HSL"])  # opções
+        self.combo_analysis.addItems(["RGB", "LAB", "HSL", "OKLAB", "LUV"])  # opções
         kmeans_layout.addWidget(self.combo_analysis)
+        
+        # Combobox para escolher o motor de agrupamento
+        self.combo_backend = QComboBox()
+        for name in BACKEND_LABELS:
+            self.combo_backend.addItem(BACKEND_LABELS[name], name)
+        self.combo_backend.setCurrentIndex(max(0, self.combo_backend.findData(CONFIG["clustering_backend"])))
+        kmeans_layout.addWidget(self.combo_backend)
 
         main_layout.addLayout(kmeans_layout)
 
@@ -164,7 +261,30 @@ class ColorPaletteGUI(QMainWindow):
         self.btn_process = QPushButton(CONFIG["process_image"])
         self.btn_process.setIcon(QIcon.fromTheme("system-run"))
         self.btn_process.clicked.connect(self.process_image)
-        main_layout.addWidget(self.btn_process)
+        
+        # --- Botão cancelar ---
+        self.btn_cancel = QPushButton(CONFIG["cancel"])
+        self.btn_cancel.setIcon(QIcon.fromTheme("process-stop"))
+        self.btn_cancel.setEnabled(False)
+        self.btn_cancel.clicked.connect(self.cancel_jobs)
+        
+        # --- Botão explorar K ---
+        self.btn_explore = QPushButton(CONFIG["explore_k"])
+        self.btn_explore.setIcon(QIcon.fromTheme("view-statistics"))
+        self.btn_explore.setToolTip(CONFIG["explore_k_tooltip"])
+        self.btn_explore.clicked.connect(self.explore_k)
+        
+        process_layout = QHBoxLayout()
+        process_layout.addWidget(self.btn_process)
+        process_layout.addWidget(self.btn_explore)
+        process_layout.addWidget(self.btn_cancel)
+        main_layout.addLayout(process_layout)
+
+        # --- Curva do cotovelo (exploração de K) ---
+        self.inertia_curve = InertiaCurveWidget()
+        self.inertia_curve.k_selected.connect(self.spin_k.setValue)
+        self.inertia_curve.hide()
+        main_layout.addWidget(self.inertia_curve)
 
         # --- Área de cores ---
         self.scroll_area = QScrollArea()
@@ -245,58 +365,98 @@ class ColorPaletteGUI(QMainWindow):
         show_about_window(data,self.icon_path)
 
     def select_file(self):
-        path, _ = QFileDialog.getOpenFileName(self, CONFIG["select_image"], "", "Images (*.png *.jpg *.jpeg)")
-        if path:
+        paths, _ = QFileDialog.getOpenFileNames(self, CONFIG["select_image"], "", "Images (*.png *.jpg *.jpeg)")
+        if paths:
+            # várias imagens formam uma coleção; o preview mostra a primeira
+            path = paths[0]
+
+            # Preview da imagem (decodificada uma única vez, via cache); arquivo corrompido
+            # ou que não é imagem: avisa e mantém a seleção anterior
+            from PIL import UnidentifiedImageError
+            try:
+                preview = self.preview_pixmap(path)
+            except (OSError, UnidentifiedImageError) as e:
+                QMessageBox.warning(self, CONFIG["error"], CONFIG["image_open_error"].format(path, e))
+                return
+
             self.image_path = path
-            self.file_label.setText(path.split("/")[-1])
+            self.image_paths = paths
+            if len(paths) > 1:
+                self.file_label.setText(CONFIG["selected_images"].format(len(paths)))
+            else:
+                self.file_label.setText(path.split("/")[-1])
 
-            # Mostrar preview da imagem
-            pixmap = QPixmap(self.image_path)
-            pixmap = pixmap.scaled( self.image_preview.width(), 
-                                    self.image_preview.height(), 
-                                    Qt.KeepAspectRatio, 
-                                    Qt.SmoothTransformation)
-            self.image_preview.setPixmap(pixmap)
+            # a exploração de K anterior era de outra imagem
+            self.k_explorer = None
+            self.k_explorer_key = None
+            self.inertia_curve.hide()
 
-    def convert_image(self, img, analysis_type="rgb"):
+            self.preview_original = preview
+            self.update_preview()
+
+    def preview_pixmap(self, path):
+        """
+        Cria o pixmap de preview a partir do array do cache de imagens.
+        O QImage aponta diretamente para o buffer do array, sem cópia.
         """
-        Converte uma imagem PIL ou numpy array para o espaço de cor desejado.
-        Retorna uma matriz Nx3 para clustering.
+        self.ensure_engine()
+        from kmeans_color_palette.modules.imagecache import default_cache
+
+        arr = default_cache.get(path)
+        h, w = arr.shape[:2]
+        qimage = QImage(arr.data, w, h, arr.strides[0], QImage.Format_RGB888)
+        pixmap = QPixmap.fromImage(qimage)
+        return pixmap.scaled(   self.image_preview.width(), 
+                                self.image_preview.height(), 
+                                Qt.KeepAspectRatio, 
+                                Qt.SmoothTransformation)
+
+    def update_preview(self):
         """
-        img_np = np.array(img)
+        Mostra a imagem original ou, com "Quantized preview" marcado e uma paleta calculada,
+        a imagem re-renderizada com as cores marcadas (todas, se nenhuma estiver marcada).
+        Chamado a cada cor marcada/desmarcada: só a imagem reduzida do preview é re-renderizada.
+        """
+        if self.preview_original is None:
+            return
 
-        if analysis_type == "rgb":
-            return img_np.reshape(-1, 3)
+        colors = self.preview_colors()
+        if not self.check_quantized.isChecked() or not colors:
+            self.image_preview.setPixmap(self.preview_original)
+            return
 
-        elif analysis_type == "lab":
-            lab_img = cv2.cvtColor(img_np, cv2.COLOR_RGB2LAB)
-            return lab_img.reshape(-1, 3)
+        arr = self.get_preview_recolorer().render(colors, dither=self.check_dither.isChecked())
+        h, w = arr.shape[:2]
+        qimage = QImage(arr.data, w, h, arr.strides[0], QImage.Format_RGB888)
+        self.image_preview.setPixmap(QPixmap.fromImage(qimage))
 
-        elif analysis_type == "hsl":
-            # converter pixel a pixel
-            hsl_pixels = []
-            
-            total_pixels = img_np.shape[0] * img_np.shape[1]   # largura * altura
-            self.progress.setMaximum(total_pixels)
-            
-            for i,pixel in enumerate(img_np.reshape(-1, 3)):
-                r, g, b = pixel
-                h, s, l = rgb_to_hsl(r, g, b)
-                hsl_pixels.append([h, s, l])
-                self.progress.setValue(i+1)
-            return np.array(hsl_pixels)
+    def preview_colors(self):
+        """
+        Cores (r,g,b) do preview quantizado: as marcadas ou, sem nenhuma marcada, a paleta inteira.
+        """
+        checked = [c["centroid"] for c in self.colors_data if "checkbox" in c and c["checkbox"].isChecked()]
+        return checked or [c["centroid"] for c in self.colors_data]
 
-        else:
-            raise ValueError(f"Espaço de cor '{analysis_type}' não suportado.")
+    def get_preview_recolorer(self):
+        """
+        modules.recolor.Recolorer da imagem reduzida ao tamanho do pixmap de preview,
+        criado uma vez por imagem, espaço de cor e tamanho.
+        """
+        analysis_type = self.colors_analysis_type or self.combo_analysis.currentText().lower()
+        size = (self.preview_original.width(), self.preview_original.height())
+        key = (self.image_path, analysis_type, size)
+        if self.preview_recolorer_key != key:
+            from PIL import Image
+            from kmeans_color_palette.modules.imagecache import default_cache
+            from kmeans_color_palette.modules.recolor import Recolorer
+
+            small = Image.fromarray(default_cache.get(self.image_path)).resize(size, Image.BOX)
+            self.preview_recolorer = Recolorer(small, analysis_type)
+            self.preview_recolorer_key = key
+        return self.preview_recolorer
 
     def process_image(self):
-        self.setEnabled(False)
-        self.progress.setValue(0)
-        
-        QApplication.processEvents()
-        
         if not self.image_path:
-            self.setEnabled(True)
             QMessageBox.warning(
                 self,
                 CONFIG["error"],
@@ -304,51 +464,261 @@ class ColorPaletteGUI(QMainWindow):
             )
             return
 
-        K = self.spin_k.value()
-        img = Image.open(self.image_path).convert("RGB")
-        
+        self.ensure_engine()
+
+        if len(self.image_paths) > 1:
+            self.process_collection()
+            return
+
+        K = "auto" if self.check_auto_k.isChecked() else self.spin_k.value()
         analysis_type = self.combo_analysis.currentText().lower()
-        
-        img_np = self.convert_image(img, analysis_type=analysis_type)
 
-        
-        # --- K-means ---
-        self.progress.setMaximum(K)
-        kmeans = KMeans(n_clusters=K, random_state=42).fit(img_np)
-        labels = kmeans.labels_
-        centroids = kmeans.cluster_centers_
-        self.progress.setValue(K)
-
-        # --- Calcular w, d, score ---
-        w = []
-        d = []
-        score = []
-        self.progress.setMaximum(K)
-        for i in range(K):
-            mask = labels == i
-            wi = mask.sum() / len(labels)
-            di = np.linalg.norm(img_np[mask] - centroids[i], axis=1).mean() if mask.sum() > 0 else 0
-            score_i = wi*255.0 / (1 + di)
-            w.append(wi)
-            d.append(di)
-            score.append(score_i)
-            self.progress.setValue(i+1)
-        
-        # --- Salvar dados ---
-        self.colors_data = []
-        for i in range(K):
-            self.colors_data.append(
-                create_color_data(centroids[i], w[i], d[i], score[i], analysis_type)
+        # Com uma exploração de K da mesma imagem e configuração, K parte dos ajustes já feitos
+        if K != "auto" and self.k_explorer is not None and self.k_explorer_key == self.explorer_key():
+            self.start_explore([K])
+            return
+
+        # O pipeline roda em uma thread de trabalho; a GUI continua respondendo
+        options = self.engine_options()
+        options["result_cache"] = True if CONFIG["result_cache"] else None
+
+        # imagens enormes são lidas em faixas, com memória limitada pelo tamanho da faixa
+        from kmeans_color_palette.modules.streaming import should_stream
+        if should_stream(self.image_path, CONFIG["streaming_min_megapixels"]):
+            options["streaming"] = True
+            options["streaming_options"] = {
+                "method": CONFIG["streaming_method"],
+                "histogram_bits": CONFIG["streaming_histogram_bits"],
+                "strip_pixels": CONFIG["streaming_strip_pixels"],
+                "max_decode_pixels": CONFIG["streaming_max_decode_pixels"]
+            }
+        auto_k_options = {
+            "k_values": range(max(1, CONFIG["auto_k_min"]), CONFIG["auto_k_max"] + 1),
+            "method": CONFIG["auto_k_method"],
+            "sample_size": CONFIG["auto_k_sample_size"]
+        }
+        instrumentation = self.make_instrumentation("process_image", {
+            "image": self.image_path,
+            "k": K,
+            "analysis_type": analysis_type,
+            "streaming": options.get("streaming", False)
+        })
+        # com as cores únicas como dados, os rótulos do ajuste servem à imagem quantizada
+        keep_fit = bool(CONFIG["color_aggregation"]) and CONFIG["histogram_bits"] == 8
+        worker = ProcessImageWorker(self.image_path, K, analysis_type, options=options,
+                                    auto_k_options=auto_k_options, instrumentation=instrumentation,
+                                    keep_fit=keep_fit)
+        self.start_worker(worker, self.on_worker_finished)
+
+    def process_collection(self):
+        """
+        Uma paleta para todas as imagens selecionadas: os histogramas das imagens são
+        calculados em paralelo, somados e agrupados uma vez (Auto K não se aplica).
+        """
+        analysis_type = self.combo_analysis.currentText().lower()
+        options = self.engine_options()
+        del options["aggregate"] # as cores já chegam agregadas nos histogramas
+        options["histogram_bits"] = CONFIG["collection_histogram_bits"]
+        options["max_decode_pixels"] = CONFIG["collection_max_decode_pixels"]
+        options["n_jobs"] = CONFIG["collection_jobs"]
+
+        instrumentation = self.make_instrumentation("process_collection", {
+            "images": len(self.image_paths),
+            "k": self.spin_k.value(),
+            "analysis_type": analysis_type
+        })
+        worker = CollectionWorker(self.image_paths, self.spin_k.value(), analysis_type,
+                                  options=options, instrumentation=instrumentation)
+        self.start_worker(worker, self.on_worker_finished)
+
+    def make_instrumentation(self, name, info):
+        """
+        Instrumentação de um job (tempo, CPU e memória por etapa), com o log JSON
+        e o perfil do cProfile quando instrumentation_log e profile_dir estão configurados.
+        """
+        log_path = CONFIG["instrumentation_log"]
+        profile_dir = CONFIG["profile_dir"]
+        return Instrumentation(
+            name,
+            info=info,
+            trace_memory=bool(CONFIG["instrumentation_trace_memory"]),
+            profile_path=profile_file_path(os.path.expanduser(profile_dir), name) if profile_dir else None,
+            log_path=os.path.expanduser(log_path) if log_path else None
+        )
+
+    def explore_k(self):
+        if not self.image_path:
+            QMessageBox.warning(
+                self,
+                CONFIG["error"],
+                CONFIG["please_upload_image"]
             )
-            self.progress.setValue(i+1)
-        
+            return
+
+        if len(self.image_paths) > 1:
+            QMessageBox.warning(self, CONFIG["error"], CONFIG["explore_k_collection"])
+            return
+
+        self.ensure_engine()
+
+        k_values = set(range(max(1, CONFIG["k_explore_min"]), CONFIG["k_explore_max"] + 1))
+        k_values.add(self.spin_k.value())
+        self.start_explore(sorted(k_values))
+
+    def engine_options(self):
+        """
+        Parâmetros do motor vindos do config.json e dos comboboxes.
+        """
+        from kmeans_color_palette.modules.clustering import backend_options_from_config
+        return {
+            "sampling_method": CONFIG["sampling_method"],
+            "max_pixels": CONFIG["max_pixels"],
+            "aggregate": CONFIG["color_aggregation"],
+            "histogram_bits": CONFIG["histogram_bits"],
+            "backend": self.combo_backend.currentData(),
+            "backend_options": backend_options_from_config(CONFIG)
+        }
+
+    def explorer_key(self):
+        """
+        Identifica a imagem e a configuração de uma exploração de K.
+        """
+        analysis_type = self.combo_analysis.currentText().lower()
+        return (self.image_path, analysis_type, json.dumps(self.engine_options(), sort_keys=True))
+
+    def start_explore(self, k_values):
+        """
+        Ajusta k_values reaproveitando a exploração atual se ela for da mesma imagem e configuração.
+        """
+        key = self.explorer_key()
+        explorer = self.k_explorer if self.k_explorer_key == key else None
+        analysis_type = self.combo_analysis.currentText().lower()
+
+        worker = ExploreKWorker(self.image_path, k_values, analysis_type, options=self.engine_options(), explorer=explorer)
+        worker.explorer_key = key
+        self.start_worker(worker, self.on_explore_finished)
+
+    def start_worker(self, worker, on_finished):
+        worker.setAutoDelete(False)
+        worker.signals.started.connect(self.on_worker_started)
+        worker.signals.progress.connect(self.on_worker_progress)
+        worker.signals.finished.connect(on_finished)
+        worker.signals.canceled.connect(self.on_worker_done)
+        worker.signals.error.connect(self.on_worker_error)
+
+        self.jobs.append(worker)
+        self.thread_pool.start(worker)
+        self.update_jobs_status()
+
+    def ensure_engine(self):
+        """
+        Garante que o motor foi importado e configurado (normalmente já feito pelo preload).
+        """
+        if not self.engine_configured:
+            configure_engine()
+            self.engine_configured = True
+
+    def cancel_jobs(self):
+        for worker in self.jobs:
+            worker.cancel()
+
+    def is_busy(self):
+        return len(self.jobs) > 0
+
+    def update_jobs_status(self):
+        self.btn_cancel.setEnabled(self.is_busy())
+        if self.is_busy():
+            self.statusBar().showMessage(CONFIG["jobs_in_queue"].format(len(self.jobs)))
+        else:
+            self.statusBar().clearMessage()
+
+    def on_worker_started(self, worker):
+        self.progress.setValue(0)
+
+    def on_worker_progress(self, worker, value, maximum, stage):
+        self.progress.setMaximum(maximum)
+        self.progress.setValue(value)
+        self.progress.setFormat(f"{stage} %p%" if stage else "%p%")
+
+    def on_worker_finished(self, worker, colors_data):
+        if worker.auto_k is not None:
+            self.spin_k.setValue(worker.auto_k["k"])
+
+        # --- Salvar dados ---
+        self.colors_data = colors_data
+        self.colors_image_path = worker.image_path
+        self.colors_collection = getattr(worker, "result", None)
+        self.colors_analysis_type = worker.analysis_type
+        self.colors_fit = getattr(worker, "fit", None)
+
         # --- Atualizar GUI ---
         self.update_colors_gui()
-        
+        self.on_worker_done(worker)
+
+        if self.is_busy():
+            return
+
+        messages = []
+        if worker.auto_k is not None:
+            # mostra o K escolhido e a pontuação que justificou a escolha
+            auto_k = worker.auto_k
+            method = auto_k["method"]
+            values = auto_k["inertia" if method == "elbow" else method]
+            value = values[auto_k["k_values"].index(auto_k["k"])]
+            messages.append(CONFIG["auto_k_status"].format(auto_k["k"], method, f"{value:.4g}"))
+        elif CONFIG["result_cache"] and self.colors_collection is None:
+            from kmeans_color_palette.modules.resultcache import get_default_cache
+            stats = get_default_cache().stats()
+            messages.append(CONFIG["result_cache_status"].format(stats["hits"], stats["misses"]))
+
+        # onde o job gastou o tempo: decode, convert, fit, stats, ...
+        if worker.instrumentation is not None and CONFIG["stage_timings_status"]:
+            messages.append(worker.instrumentation.summary())
+
+        if messages:
+            self.statusBar().showMessage(" | ".join(messages))
+
+    def on_explore_finished(self, worker, curve):
+        self.k_explorer = worker.explorer
+        self.k_explorer_key = worker.explorer_key
+
+        self.inertia_curve.set_curve(curve, self.spin_k.value())
+        self.inertia_curve.show()
+        self.show_explored_palette(self.spin_k.value())
+        self.on_worker_done(worker)
+
+    def on_k_changed(self, k):
+        # K já ajustado na exploração: mostra a paleta sem rodar um novo job
+        if self.k_explorer is not None and self.k_explorer_key == self.explorer_key():
+            self.inertia_curve.set_current_k(k)
+            self.show_explored_palette(k)
+
+    def show_explored_palette(self, k):
+        # só K já ajustados: palette(k) não espera o lock de um ajuste em andamento.
+        # Os demais K são ajustados num ExploreKWorker (Process Image)
+        if not self.k_explorer.has(k):
+            return
+        self.colors_data = self.k_explorer.palette(k)
+        self.colors_image_path = self.k_explorer_key[0]
+        self.colors_collection = None
+        self.colors_analysis_type = self.k_explorer_key[1]
+        self.colors_fit = None
+        self.update_colors_gui()
+
+    def on_worker_error(self, worker, message):
+        self.on_worker_done(worker)
+        QMessageBox.warning(self, CONFIG["error"], message)
+
+    def on_worker_done(self, worker):
+        if worker in self.jobs:
+            self.jobs.remove(worker)
         self.progress.setValue(0)
-        self.setEnabled(True)
+        self.progress.setFormat("%p%")
+        self.update_jobs_status()
 
     def update_colors_gui(self):
+        from kmeans_color_palette.modules.color import rgb_to_hex
+
         self.colors_data.sort(key=lambda c: c['w'], reverse=True)
         
         # Limpar layout anterior
@@ -396,17 +766,26 @@ class ColorPaletteGUI(QMainWindow):
             """)
 
             cdata["checkbox"] = chk
+            chk.toggled.connect(self.on_color_toggled)
             layout.addWidget(chk)
 
             # Informações w, d, score
             info_label = QLabel(f"w: {100.0*cdata['w']:.2f}%\nd: {cdata['d']:.2f}\nscore: {cdata['score']:.4f}")
             info_label.setAlignment(Qt.AlignCenter)
             info_label.setTextInteractionFlags(Qt.TextSelectableByMouse | Qt.TextSelectableByKeyboard)
+            if "variance" in cdata:
+                info_label.setToolTip(f"variance: {cdata['variance']:.2f}\nmax d: {cdata['max_d']:.2f}\nsilhouette: {cdata['silhouette']:.4f}")
             
             layout.addWidget(info_label)
 
             self.color_layout.addWidget(color_box)
 
+        self.update_preview()
+
+    def on_color_toggled(self, checked):
+        if self.check_quantized.isChecked():
+            self.update_preview()
+
     def generate_palette(self):
         if not self.colors_data:
             QMessageBox.warning(
@@ -431,43 +810,51 @@ class ColorPaletteGUI(QMainWindow):
         if not save_dir:
             return  # usuário cancelou
 
-        # --- Salvar JSON ---
-        json_path = os.path.join(save_dir,"color_palette.json")
-        with open(json_path, "w") as f:
-            json.dump([{"r": r, "g": g, "b": b} for r, g, b in selected_colors], f, indent=2)
-
-        # --- Salvar PNG ---
-        img = Image.open(self.image_path).convert("RGB")
-        w, h = img.size
-        bar_height = 50
-        new_img = Image.new("RGB", (w, h + bar_height), color=(255, 255, 255))
-        new_img.paste(img, (0, 0))
-
-        # Desenhar barra de cores
-        step = w / len(selected_colors)
-        for i, c in enumerate(selected_colors):
-            x0 = int(i * step)
-            x1 = int((i + 1) * step)
-            for xi in range(x0, x1):
-                for yi in range(bar_height):
-                    new_img.putpixel((xi, h + yi), c)
-
-        png_path = os.path.join(save_dir,"color_palette.png")
-        new_img.save(png_path)
+        self.ensure_engine()
+        from kmeans_color_palette.engine import save_palette_json, save_palette_png, save_collection_json, save_quantized_png
+
+        instrumentation = self.make_instrumentation("generate_palette", {
+            "image": self.colors_image_path,
+            "colors": len(selected_colors)
+        })
+        paths = []
+        with instrumentation.run():
+            # --- Salvar JSON ---
+            with instrumentation.stage("save"):
+                paths.append(save_palette_json(save_dir, selected_colors))
+                # paleta de uma coleção: contribuição de cada imagem em collection.json
+                if self.colors_collection is not None:
+                    paths.append(save_collection_json(save_dir, self.colors_collection))
+
+            # --- Salvar PNG (coleções não têm uma imagem única: só a barra de cores) ---
+            with instrumentation.stage("render"):
+                paths.append(save_palette_png(save_dir, self.colors_image_path, selected_colors,
+                                              bar_height=CONFIG["palette_bar_height"],
+                                              labels=CONFIG["palette_labels"],
+                                              swatch_only=CONFIG["palette_swatch_only"] or self.colors_image_path is None,
+                                              swatch_width=CONFIG["palette_swatch_width"]))
+                # imagem re-renderizada com as cores escolhidas, como no preview
+                if self.check_quantized.isChecked() and self.colors_image_path is not None:
+                    paths.append(save_quantized_png(save_dir, self.colors_image_path, selected_colors,
+                                                    self.colors_analysis_type,
+                                                    dither=self.check_dither.isChecked(),
+                                                    fit=self.colors_fit))
+
+        if CONFIG["stage_timings_status"]:
+            self.statusBar().showMessage(instrumentation.summary())
 
         QMessageBox.information(
             self,
             CONFIG["color_palette_generated"],
-            f"{json_path}\n{png_path}"
+            "\n".join(paths)
         )
         
 
-def main():
+def main(profiler=None):
     signal.signal(signal.SIGINT, signal.SIG_DFL)
     
-    create_desktop_directory()    
-    create_desktop_menu()
-    create_desktop_file(os.path.join("~",".local","share","applications"))
+    if profiler is None and "--profile-startup" in sys.argv:
+        profiler = StartupProfiler()
     
     for n in range(len(sys.argv)):
         if sys.argv[n] == "--autostart":
@@ -481,12 +868,42 @@ def main():
             create_desktop_file(os.path.join("~",".local","share","applications"), overwrite=True)
             return
     
+    # Integração com o desktop apenas quando algum arquivo estiver faltando
+    applications_path = os.path.join("~",".local","share","applications")
+    if desktop_integration_missing(applications_path):
+        create_desktop_directory()    
+        create_desktop_menu()
+        create_desktop_file(applications_path)
+    if profiler: profiler.mark("desktop integration")
+    
+    init_config()
+    if profiler: profiler.mark("load config")
+    
     app = QApplication(sys.argv)
     app.setApplicationName(about.__package__) 
+    if profiler: profiler.mark("QApplication")
     
     window = ColorPaletteGUI()
     window.show()
-    sys.exit(app.exec_())
+    if profiler: profiler.mark("create and show window")
+    
+    def on_preload_done():
+        if profiler:
+            print(profiler.report(), file=sys.stderr)
+            # encerra pelo loop de eventos (chamado fora da thread da GUI)
+            QMetaObject.invokeMethod(app, "quit", Qt.QueuedConnection)
+    
+    def after_window_shown():
+        if profiler: profiler.mark("first event loop iteration")
+        # bibliotecas pesadas carregam em segundo plano, com a janela já visível
+        start_preload(profiler=profiler, on_done=on_preload_done)
+    
+    QTimer.singleShot(0, after_window_shown)
+    
+    exit_code = app.exec_()
+    window.cancel_jobs()
+    window.thread_pool.waitForDone()
+    sys.exit(exit_code)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,619 @@
+#!/usr/bin/python3
+
+import io
+import os
+import sys
+import json
+import stat
+import time
+import queue
+import socket
+import signal
+import argparse
+import threading
+import http.client
+import http.server
+import socketserver
+import urllib.parse
+from concurrent.futures import Future, ProcessPoolExecutor
+# até o Python 3.10 é outra classe, não o TimeoutError embutido
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+# Este módulo não pode importar PyQt5: roda em servidores sem display.
+import numpy as np
+from PIL import Image
+
+from kmeans_color_palette import engine
+from kmeans_color_palette import batch
+from kmeans_color_palette.modules.clustering import BACKENDS
+from kmeans_color_palette.modules.sampling import SAMPLING_METHODS
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_MAX_PENDING = 32            # pedidos aceitos (na fila ou rodando); acima disso, 503
+DEFAULT_MAX_UPLOAD_MB = 64
+DEFAULT_BATCH_SIZE = 8              # pedidos pequenos enviados juntos a um processo
+DEFAULT_BATCH_WAIT_MS = 10          # espera por outros pedidos pequenos antes de enviar o lote
+DEFAULT_SMALL_PIXELS = 1000000      # imagens até este número de pixels entram em lotes
+DEFAULT_REQUEST_TIMEOUT = 300       # segundos; acima disso, 504
+
+# Parâmetros aceitos em cada pedido (query string ou JSON) e a chave correspondente das opções do batch.
+REQUEST_PARAMS = {
+    "k": "k",
+    "space": "analysis_type",
+    "top": "top",
+    "select_by": "select_by"
+}
+
+
+class ServiceBusy(Exception):
+    """Levantada quando o servidor já tem max_pending pedidos (HTTP 503)."""
+    pass
+
+class ServiceError(Exception):
+    """
+    Resposta de erro do servidor, vista pelo cliente (request_palette).
+    status é o código HTTP (503 = ocupado, tente de novo).
+    """
+    def __init__(self, status, message):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+################################################################################
+# Processos do pool
+################################################################################
+
+_worker_options = None
+
+def _init_worker(options):
+    """
+    Inicializa um processo do pool: guarda as opções e roda um ajuste mínimo,
+    para que numpy, scikit-learn e os caches já estejam carregados no primeiro pedido.
+    """
+    global _worker_options
+    _worker_options = options
+    # Ctrl+C chega a todo o grupo de processos; quem encerra o pool é o servidor
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    engine.extract_palette(np.zeros((8, 8, 3), dtype=np.uint8), k=1, cache=None)
+
+def _warm():
+    return os.getpid()
+
+def run_job(job):
+    """
+    Processa um pedido em um processo do pool.
+    job tem "path" (arquivo lido pelo servidor) ou "data" (bytes enviados), e "params".
+    Retorna o dicionário de batch.process_one, ou {"error": mensagem}.
+    """
+    options = dict(_worker_options)
+    for name, key in REQUEST_PARAMS.items():
+        if name in job["params"]:
+            options[key] = job["params"][name]
+    try:
+        if "data" in job:
+            with Image.open(io.BytesIO(job["data"])) as img:
+                image = np.asarray(img.convert("RGB"))
+        else:
+            image = job["path"]
+        result = batch.process_one(image, options)
+    except Image.UnidentifiedImageError:
+        return {"error": "unsupported image format"}
+    except Exception as e:
+        return {"error": str(e) or type(e).__name__}
+    result["image"] = job.get("path", "upload")
+    return result
+
+def run_batch(jobs):
+    """
+    Processa um lote de pedidos pequenos no mesmo processo (uma única ida e volta ao pool).
+    """
+    return [run_job(job) for job in jobs]
+
+
+################################################################################
+# Serviço
+################################################################################
+
+class PaletteService:
+    """
+    Pool de processos aquecidos que extrai paletas para o servidor HTTP.
+
+    submit(job) devolve um concurrent.futures.Future com o resultado de run_job.
+    Pedidos de imagens pequenas (até small_pixels) são agrupados em lotes de até
+    batch_size pedidos, esperando no máximo batch_wait segundos pelo lote encher;
+    os demais vão direto ao pool. Com max_pending pedidos em andamento, submit
+    levanta ServiceBusy (o servidor responde 503).
+
+    Se um processo do pool morrer (falta de memória, kill, ...), o ProcessPoolExecutor fica
+    quebrado e recusa todas as tarefas: o pool é recriado e cada tarefa perdida é enviada
+    mais uma vez. Uma segunda falha é repassada ao pedido (o servidor responde 500).
+    """
+    def __init__(self, options, workers=0,
+                 max_pending=DEFAULT_MAX_PENDING,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 batch_wait=DEFAULT_BATCH_WAIT_MS / 1000.0,
+                 small_pixels=DEFAULT_SMALL_PIXELS):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.max_pending = max_pending
+        self.batch_size = max(1, batch_size)
+        self.batch_wait = batch_wait
+        self.small_pixels = small_pixels
+
+        self.options = options
+        self.executor = self._new_executor()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._served = 0
+        self._batches = 0
+        self._restarts = 0
+        self._tasks = set() # tarefas enviadas ao pool e ainda não concluídas
+        self._pool_ok = True
+        self._closed = False
+        self._queue = queue.Queue()
+        self._batcher = threading.Thread(target=self._batch_loop, name="palette-batcher", daemon=True)
+        self._batcher.start()
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers,
+                                   initializer=_init_worker, initargs=(self.options,))
+
+    def _rebuild(self, broken):
+        """
+        Troca o pool quebrado broken por um novo. Várias tarefas veem o mesmo pool quebrado:
+        só a primeira o recria. Retorna False se o serviço já foi encerrado.
+        """
+        with self._lock:
+            if self._closed:
+                return False
+            if self.executor is broken:
+                # as tarefas de um pool quebrado já terminaram com BrokenProcessPool
+                broken.shutdown(wait=False)
+                self.executor = self._new_executor()
+                self._restarts += 1
+            return True
+
+    def warm_up(self):
+        """
+        Inicia todos os processos do pool e espera o aquecimento (ver _init_worker).
+        """
+        futures = [self.executor.submit(_warm) for _ in range(self.workers)]
+        for future in futures:
+            future.result()
+
+    def is_small(self, job):
+        """
+        True se a imagem do pedido tem até small_pixels pixels (lido só do cabeçalho).
+        """
+        try:
+            source = io.BytesIO(job["data"]) if "data" in job else job["path"]
+            with Image.open(source) as img:
+                return img.size[0] * img.size[1] <= self.small_pixels
+        except Exception:
+            # erros de leitura são relatados pelo processo que roda o pedido
+            return False
+
+    def submit(self, job):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise ServiceBusy()
+            self._pending += 1
+
+        future = Future()
+        future.add_done_callback(self._release)
+        if self.batch_size > 1 and self.is_small(job):
+            self._queue.put((job, future))
+        else:
+            self._send(run_job, job, [future], single=True)
+        return future
+
+    def _release(self, future):
+        with self._lock:
+            self._pending -= 1
+            self._served += 1
+
+    def _send(self, fn, arg, futures, single=False, retry=True):
+        """
+        Envia fn(arg) ao pool e repassa o resultado aos futures dos pedidos.
+        Com o pool quebrado (BrokenProcessPool), recria o pool e envia mais uma vez (retry).
+        """
+        def fail(e):
+            if retry and isinstance(e, BrokenProcessPool) and self._rebuild(executor):
+                self._send(fn, arg, futures, single, retry=False)
+                return
+            if isinstance(e, BrokenProcessPool):
+                with self._lock:
+                    self._pool_ok = False
+            for future in futures:
+                future.set_exception(e)
+
+        def done(f):
+            with self._lock:
+                self._tasks.discard(f)
+            try:
+                results = f.result()
+            except Exception as e:
+                fail(e)
+                return
+            with self._lock:
+                self._pool_ok = True
+            for future, result in zip(futures, [results] if single else results):
+                future.set_result(result)
+
+        executor = self.executor
+        try:
+            pool_future = executor.submit(fn, arg)
+        except RuntimeError as e: # pool quebrado ou já encerrado
+            fail(e)
+            return
+        with self._lock:
+            self._tasks.add(pool_future)
+        pool_future.add_done_callback(done)
+
+    def _batch_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            items = [item]
+            deadline = time.monotonic() + self.batch_wait
+            try:
+                while len(items) < self.batch_size:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    if item is None:
+                        self._queue.put(None)
+                        break
+                    items.append(item)
+            except queue.Empty:
+                pass
+            with self._lock:
+                self._batches += 1
+            self._send(run_batch, [job for job, _ in items], [future for _, future in items])
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "served": self._served,
+                "batches": self._batches,
+                "pool": "ok" if self._pool_ok else "broken",
+                "pool_restarts": self._restarts
+            }
+
+    def close(self):
+        self._queue.put(None)
+        self._batcher.join()
+        with self._lock:
+            self._closed = True
+            tasks = list(self._tasks)
+        # as tarefas ainda na fila não rodam (cancel_futures do shutdown só existe no Python 3.9+)
+        for task in tasks:
+            task.cancel()
+        self.executor.shutdown(wait=True)
+
+
+################################################################################
+# HTTP
+################################################################################
+
+def parse_params(values):
+    """
+    Valida os parâmetros de um pedido (dicionário nome -> valor, já sem listas).
+    Retorna o dicionário convertido; levanta ValueError com a mensagem para o cliente.
+    """
+    params = {}
+    for name, value in values.items():
+        if name not in REQUEST_PARAMS:
+            raise ValueError(f"unknown parameter '{name}'")
+        if name == "k":
+            # k_value levanta argparse.ArgumentTypeError, que não é um ValueError
+            try:
+                value = batch.k_value(str(value))
+            except argparse.ArgumentTypeError as e:
+                raise ValueError(f"k {e}") from None
+            if value != "auto" and value < 1:
+                raise ValueError("k must be at least 1")
+        elif name == "space":
+            if value not in engine.ANALYSIS_TYPES:
+                raise ValueError(f"space must be one of {', '.join(engine.ANALYSIS_TYPES)}")
+        elif name == "top":
+            # no JSON top pode ser null, uma lista, ...: int levanta TypeError
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError("top must be an integer") from None
+        elif name == "select_by":
+            if value not in batch.SELECT_KEYS:
+                raise ValueError(f"select_by must be one of {', '.join(batch.SELECT_KEYS)}")
+        params[name] = value
+    return params
+
+class PaletteRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    GET  /health  -> estado do serviço (workers, pedidos em andamento, ...).
+    POST /palette -> corpo com os bytes de uma imagem (parâmetros na query string)
+                     ou JSON {"path": ..., "k": ..., "space": ..., "top": ..., "select_by": ...}.
+    """
+    server_version = "kmeans-color-palette"
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        # em sockets Unix client_address é vazio
+        return self.client_address[0] if self.client_address else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urllib.parse.urlsplit(self.path).path == "/health":
+            stats = self.server.service.stats()
+            if stats["pool"] == "ok":
+                self.send_json(200, dict(status="ok", **stats))
+            else:
+                self.send_json(503, dict(status="broken", **stats))
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != "/palette":
+            self.send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self.send_json(400, {"error": "invalid Content-Length"})
+            self.close_connection = True # o corpo não pode ser separado do próximo pedido
+            return
+        if length <= 0:
+            self.send_json(411, {"error": "Content-Length required"})
+            return
+        if length > self.server.max_upload_bytes:
+            self.send_json(413, {"error": f"upload larger than {self.server.max_upload_bytes} bytes"})
+            self.close_connection = True
+            return
+        body = self.rfile.read(length)
+
+        try:
+            values = {name: v[-1] for name, v in urllib.parse.parse_qs(url.query).items()}
+            if self.headers.get("Content-Type", "").split(";")[0].strip() == "application/json":
+                request = json.loads(body)
+                if not isinstance(request, dict) or not isinstance(request.get("path"), str):
+                    raise ValueError("JSON requests need a \"path\"")
+                path = request.pop("path")
+                values.update(request)
+                job = {"path": os.path.abspath(path), "params": parse_params(values)}
+            else:
+                job = {"data": body, "params": parse_params(values)}
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        try:
+            future = self.server.service.submit(job)
+        except ServiceBusy:
+            self.send_json(503, {"error": "busy"}, headers={"Retry-After": "1"})
+            return
+
+        try:
+            result = future.result(timeout=self.server.request_timeout)
+        except FutureTimeoutError:
+            self.send_json(504, {"error": "timeout"})
+            return
+        except Exception as e:
+            self.send_json(500, {"error": str(e) or type(e).__name__})
+            return
+
+        if "error" in result:
+            self.send_json(422, result)
+        else:
+            self.send_json(200, result)
+
+class PaletteHTTPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128 # conexões à espera de accept; o limite de pedidos é max_pending
+
+class PaletteUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+def remove_socket(path):
+    """
+    Apaga o socket Unix path, se existir. Levanta FileExistsError se path existe e não é
+    um socket (um caminho errado em --socket não pode apagar um arquivo comum).
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    os.remove(path)
+
+def make_server(service, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None,
+                max_upload_bytes=DEFAULT_MAX_UPLOAD_MB * 1024 * 1024,
+                request_timeout=DEFAULT_REQUEST_TIMEOUT, verbose=False):
+    """
+    Cria o servidor HTTP (TCP em host:port, ou no socket Unix socket_path) do serviço.
+    """
+    if socket_path:
+        remove_socket(socket_path)
+        server = PaletteUnixServer(socket_path, PaletteRequestHandler)
+    else:
+        server = PaletteHTTPServer((host, port), PaletteRequestHandler)
+    server.service = service
+    server.max_upload_bytes = max_upload_bytes
+    server.request_timeout = request_timeout
+    server.verbose = verbose
+    return server
+
+
+################################################################################
+# Cliente
+################################################################################
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def _request(method, url, body=None, headers=None, host=DEFAULT_HOST, port=DEFAULT_PORT,
+             socket_path=None, timeout=DEFAULT_REQUEST_TIMEOUT):
+    if socket_path:
+        conn = UnixHTTPConnection(socket_path, timeout=timeout)
+    else:
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+    try:
+        conn.request(method, url, body=body, headers=headers or {})
+        response = conn.getresponse()
+        data = json.loads(response.read() or b"{}")
+    finally:
+        conn.close()
+    if response.status != 200:
+        raise ServiceError(response.status, data.get("error", response.reason))
+    return data
+
+def request_palette(image, upload=True, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None,
+                    timeout=DEFAULT_REQUEST_TIMEOUT, **params):
+    """
+    Pede a paleta de uma imagem a um servidor "kmeans-color-palette serve".
+
+    image  -> caminho de arquivo ou bytes de uma imagem codificada (PNG, JPEG, ...).
+    upload -> com True o arquivo é enviado; com False só o caminho é enviado e o
+              servidor lê o arquivo (precisa estar na mesma máquina).
+    params -> k, space, top e select_by (padrão: os do servidor).
+
+    Retorna o dicionário do servidor: "selected" é o conteúdo de color_palette.json e
+    "colors" traz w, d e score de cada cor. Levanta ServiceError se o servidor
+    responder com erro (status 503: ocupado, tente de novo mais tarde).
+    """
+    options = dict(host=host, port=port, socket_path=socket_path, timeout=timeout)
+    params = {name: value for name, value in params.items() if value is not None}
+
+    if isinstance(image, (bytes, bytearray)) or upload:
+        if not isinstance(image, (bytes, bytearray)):
+            with open(image, "rb") as f:
+                image = f.read()
+        url = "/palette?" + urllib.parse.urlencode(params) if params else "/palette"
+        return _request("POST", url, body=bytes(image),
+                        headers={"Content-Type": "application/octet-stream"}, **options)
+
+    body = json.dumps(dict(params, path=os.path.abspath(image))).encode("utf-8")
+    return _request("POST", "/palette", body=body, headers={"Content-Type": "application/json"}, **options)
+
+def service_health(host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None, timeout=10):
+    """
+    Estado do servidor (GET /health).
+    """
+    return _request("GET", "/health", host=host, port=port, socket_path=socket_path, timeout=timeout)
+
+
+################################################################################
+# Linha de comando
+################################################################################
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="kmeans-color-palette serve",
+        description="Serve palettes over local HTTP, with a pool of warm worker processes."
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"TCP port (default: {DEFAULT_PORT})")
+    parser.add_argument("--socket", default=None, metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("-j", "--workers", type=int, default=0, help="number of worker processes, 0 = number of CPUs (default: 0)")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING, help=f"requests queued or running before answering 503 (default: {DEFAULT_MAX_PENDING})")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"small requests sent together to a worker, 1 = no batching (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--batch-wait", type=float, default=DEFAULT_BATCH_WAIT_MS, metavar="MS", help=f"time waiting for a batch to fill, in milliseconds (default: {DEFAULT_BATCH_WAIT_MS})")
+    parser.add_argument("--small-pixels", type=int, default=DEFAULT_SMALL_PIXELS, help=f"images up to this number of pixels are batched (default: {DEFAULT_SMALL_PIXELS})")
+    parser.add_argument("--max-upload-mb", type=float, default=DEFAULT_MAX_UPLOAD_MB, help=f"largest accepted upload (default: {DEFAULT_MAX_UPLOAD_MB})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_REQUEST_TIMEOUT, help=f"seconds before answering 504 (default: {DEFAULT_REQUEST_TIMEOUT})")
+    parser.add_argument("-k", "--k", type=batch.k_value, default=5, help="default number of clusters or 'auto' (default: 5)")
+    parser.add_argument("-s", "--space", default="rgb", choices=engine.ANALYSIS_TYPES, help="default color space (default: rgb)")
+    parser.add_argument("--backend", default=None, choices=BACKENDS, help="clustering backend (default: config.json or kmeans)")
+    parser.add_argument("--top", type=int, default=0, help="default number of selected colors, 0 = all (default: 0)")
+    parser.add_argument("--select-by", default="w", choices=batch.SELECT_KEYS, help="default rule used to choose the top colors (default: w)")
+    parser.add_argument("--sampling", default=None, choices=SAMPLING_METHODS, help="pixel sampling before the fit (default: config.json or random)")
+    parser.add_argument("--max-pixels", type=int, default=None, help="maximum number of pixels used in the fit")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the result cache (~/.cache/kmeans_color_palette)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every request on stderr")
+    return parser
+
+def options_from_args(args):
+    """
+    Opções de batch.process_one (config.json + argumentos), sem arquivos de saída.
+    """
+    batch_args = batch.build_parser().parse_args(["--jsonl", "-", "-"])
+    for name in ("k", "space", "backend", "top", "select_by", "sampling", "max_pixels", "no_cache"):
+        setattr(batch_args, name, getattr(args, name))
+    options = batch.options_from_args(batch_args)
+    options["auto_k"]["n_jobs"] = 1 # os pedidos já são processados em paralelo
+    return options
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.k != "auto" and args.k < 1:
+        parser.error("-k must be at least 1")
+
+    service = PaletteService(options_from_args(args),
+                             workers=args.workers,
+                             max_pending=args.max_pending,
+                             batch_size=args.batch_size,
+                             batch_wait=args.batch_wait / 1000.0,
+                             small_pixels=args.small_pixels)
+    try:
+        service.warm_up()
+        server = make_server(service, args.host, args.port, args.socket,
+                             max_upload_bytes=int(args.max_upload_mb * 1024 * 1024),
+                             request_timeout=args.timeout, verbose=args.verbose)
+    except FileExistsError as e:
+        service.close()
+        parser.error(f"--socket: {e}")
+    except BaseException:
+        service.close()
+        raise
+
+    # SIGTERM encerra como Ctrl+C: fecha o servidor e o pool
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    where = args.socket if args.socket else f"http://{args.host}:{server.server_address[1]}"
+    print(f"Serving palettes on {where} ({service.workers} workers)", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if args.socket:
+            try:
+                remove_socket(args.socket)
+            except OSError:
+                pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+
+import sys
+import argparse
+
+# Este módulo não pode importar PyQt5: roda em servidores sem display.
+import kmeans_color_palette.modules.configure as configure
+from kmeans_color_palette import engine
+from kmeans_color_palette.batch import CONFIG_PATH
+from kmeans_color_palette.modules.clustering import BACKENDS, DEFAULT_BACKEND, backend_options_from_config
+from kmeans_color_palette.modules.sampling import SAMPLING_METHODS
+from kmeans_color_palette.modules.progress import Progress, console_sink
+from kmeans_color_palette.modules import video
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="kmeans-color-palette video",
+        description="Extract per-scene palettes and a palette timeline from a video or an image sequence."
+    )
+    parser.add_argument("source", nargs="+", help="video file, directory of frames, glob pattern or list of frame files")
+    parser.add_argument("-o", "--output-dir", required=True, help="write video_palette.json and video_timeline.png in OUTPUT_DIR")
+    parser.add_argument("-k", "--k", type=int, default=5, help="number of clusters (default: 5)")
+    parser.add_argument("-s", "--space", default="rgb", choices=engine.ANALYSIS_TYPES, help="color space used in the clustering (default: rgb)")
+    parser.add_argument("--fps", type=float, default=video.DEFAULT_SAMPLE_FPS, help=f"frames analyzed per second of video, 0 = all (default: {video.DEFAULT_SAMPLE_FPS:g})")
+    parser.add_argument("--sequence-fps", type=float, default=video.DEFAULT_SEQUENCE_FPS, help=f"frame rate of image sequences (default: {video.DEFAULT_SEQUENCE_FPS:g})")
+    parser.add_argument("--max-side", type=int, default=video.DEFAULT_MAX_SIDE, help=f"frames are reduced to this longest side before the fit, 0 = full size (default: {video.DEFAULT_MAX_SIDE})")
+    parser.add_argument("--scene-threshold", type=float, default=video.DEFAULT_SCENE_THRESHOLD, help=f"histogram change between frames that starts a scene, 0-1, 0 = one scene (default: {video.DEFAULT_SCENE_THRESHOLD:g})")
+    parser.add_argument("--segment", type=float, default=0, metavar="SECONDS", help="fixed-length segments instead of scene detection")
+    parser.add_argument("--no-warm-start", action="store_true", help="fit every frame from scratch instead of starting from the previous frame")
+    parser.add_argument("--backend", default=None, choices=BACKENDS, help="clustering backend (default: config.json or kmeans)")
+    parser.add_argument("--sampling", default=None, choices=SAMPLING_METHODS, help="pixel sampling before the fit (default: config.json or random)")
+    parser.add_argument("--column-width", type=int, default=engine.DEFAULT_COLUMN_WIDTH, help=f"width of each frame in video_timeline.png (default: {engine.DEFAULT_COLUMN_WIDTH})")
+    parser.add_argument("--timeline-height", type=int, default=engine.DEFAULT_TIMELINE_HEIGHT, help=f"height of the frame band of video_timeline.png (default: {engine.DEFAULT_TIMELINE_HEIGHT})")
+    parser.add_argument("--no-png", action="store_true", help="do not write video_timeline.png")
+    parser.add_argument("--progress", action="store_true", help="show a progress bar on stderr")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.k < 1:
+        parser.error("-k must be at least 1")
+
+    config = configure.load_config(CONFIG_PATH)
+    source = args.source[0] if len(args.source) == 1 else args.source
+
+    try:
+        result = engine.extract_video_palettes(
+            source,
+            k=args.k,
+            analysis_type=args.space,
+            sample_fps=args.fps,
+            max_side=args.max_side,
+            scene_threshold=args.scene_threshold,
+            segment_seconds=args.segment,
+            warm_start=not args.no_warm_start,
+            sequence_fps=args.sequence_fps,
+            sampling_method=args.sampling or config.get("sampling_method", engine.DEFAULT_SAMPLING_METHOD),
+            max_pixels=config.get("max_pixels", engine.DEFAULT_MAX_PIXELS),
+            aggregate=config.get("color_aggregation", engine.DEFAULT_AGGREGATE),
+            histogram_bits=config.get("histogram_bits", engine.DEFAULT_HISTOGRAM_BITS),
+            backend=args.backend or config.get("clustering_backend", DEFAULT_BACKEND),
+            backend_options=backend_options_from_config(config),
+            progress=Progress(console_sink()) if args.progress else None
+        )
+    except ValueError as e:
+        print(f"ERROR: {e}", file=sys.stderr)
+        return 1
+
+    json_path, png_path = engine.save_video_palettes(args.output_dir, result, timeline=not args.no_png,
+                                                     height=args.timeline_height, column_width=args.column_width)
+
+    for scene in result["scenes"]:
+        colors = " ".join(c["hex"] for c in scene["palette"])
+        print(f"scene {scene['scene']}: {scene['start']:.2f}-{scene['end']:.2f} s, {scene['frames']} frames: {colors}")
+    print(f"{len(result['frames'])} frames, {len(result['scenes'])} scenes -> {json_path}" +
+          (f", {png_path}" if png_path else ""), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())